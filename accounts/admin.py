@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, EstablishmentOwner, ArtistEntrepreneur
+from .models import CustomUser, EstablishmentOwner, ArtistEntrepreneur, MediaJob
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'user_type', 'is_active', 'date_joined')
@@ -16,12 +16,19 @@ class EstablishmentOwnerAdmin(admin.ModelAdmin):
     list_display = ('business_name', 'business_type', 'user', 'capacity')
     search_fields = ('business_name', 'business_type', 'user__username')
     list_filter = ('business_type',)
+    list_select_related = ('user',)
 
 @admin.register(ArtistEntrepreneur)
 class ArtistEntrepreneurAdmin(admin.ModelAdmin):
     list_display = ('stage_name', 'category', 'user', 'experience_years')
     search_fields = ('stage_name', 'user__username')
     list_filter = ('category',)
+    list_select_related = ('user',)
+
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status', 'kind')
 
 admin.site.register(CustomUser, CustomUserAdmin)
 
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
-    verbose_name = 'Gestión de Usuarios'
\ No newline at end of file
+    verbose_name = 'Gestión de Usuarios'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registra los receivers)
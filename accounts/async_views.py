@@ -0,0 +1,259 @@
+from functools import wraps
+
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import login as auth_login
+from django.contrib.auth.views import redirect_to_login
+from django.contrib.messages import get_messages
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import redirect, resolve_url
+from django.template.loader import render_to_string
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.safestring import mark_safe
+
+from . import messaging, profile_cache, throttling
+from .forms import AsyncAuthenticationForm, CustomUserRegistrationForm, SearchForm
+from .models import CustomUser
+from .search import asearch_profiles, wants_distance
+from .views import (
+    LOGIN_THROTTLED, buscar_origen, buscar_resultados_context, perfil_publico_card, ver_perfil_context,
+)
+
+
+# -------------------------
+# Vistas async (ASGI)
+# -------------------------
+# Versiones async de las vistas de lectura, activas con ASYNC_VIEWS
+# (accounts/urls.py). Bajo ASGI una vista sync ocupa un thread durante todo
+# el request; estas solo salen del event loop para las consultas (ORM async),
+# la caché y el render (los templates consultan variantes de imágenes con
+# {% picture %}, así que se renderizan con sync_to_async).
+#
+# Las páginas con una parte que depende de consultas se mandan en streaming:
+# primero el <head> y el menú (el navegador ya pide el CSS), después el
+# fragmento cuando terminan sus consultas.
+SLOT = '<!--redshow:slot-->'
+
+arender_to_string = sync_to_async(render_to_string)
+
+
+async def auser(request):
+    """request.user resuelto fuera del event loop (Django 4.2 no tiene request.auser())."""
+    def resolve():
+        request.user.is_authenticated  # evalúa el SimpleLazyObject
+        return request.user
+    return await sync_to_async(resolve)()
+
+
+def alogin_required(view):
+    """login_required para vistas async (el de Django 4.2 solo envuelve vistas sync)."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await auser(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def stream_page(request, template_name, context, slot, render_fragment, on_complete=None):
+    """
+    Renderiza `template_name` con un marcador en la variable `slot` y
+    devuelve un StreamingHttpResponse: sale primero lo anterior al marcador,
+    después el HTML de `await render_fragment()` y al final el resto.
+    `on_complete(html)` recibe la página completa al terminar.
+    """
+    page = await arender_to_string(template_name, {**context, slot: mark_safe(SLOT)}, request)
+    head, _, tail = page.partition(SLOT)
+
+    async def chunks():
+        yield head
+        fragment = await render_fragment()
+        yield fragment
+        yield tail
+        if on_complete is not None:
+            await on_complete(head + fragment + tail)
+
+    return StreamingHttpResponse(chunks(), content_type='text/html; charset=utf-8')
+
+
+# -------------------------
+# Login y registro
+# -------------------------
+# Mismo límite de intentos que ThrottledLoginView, pero el hash de la
+# contraseña corre en el pool de procesos de accounts/hashers.py.
+def login_redirect_url(request):
+    """El `next` del formulario si es de este sitio (como LoginView), si no LOGIN_REDIRECT_URL."""
+    next_url = request.POST.get('next', request.GET.get('next', ''))
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        return next_url
+    return resolve_url(settings.LOGIN_REDIRECT_URL)
+
+
+async def login(request):
+    status = 200
+    context = {}
+    if request.method == 'POST':
+        username = request.POST.get('username', '')
+        allowed, retry_after = await sync_to_async(throttling.check_login)(request, username)
+        if allowed:
+            form = AsyncAuthenticationForm(request, data=request.POST)
+            if form.is_valid() and await form.aauthenticate():
+                await sync_to_async(throttling.login_succeeded)(request, username)
+                await sync_to_async(auth_login)(request, form.get_user())
+                return HttpResponseRedirect(login_redirect_url(request))
+        else:
+            form = AsyncAuthenticationForm(request, initial={'username': username})
+            context['throttle_error'] = LOGIN_THROTTLED
+            status = 429
+    else:
+        form = AsyncAuthenticationForm(request)
+
+    response = HttpResponse(await arender_to_string('accounts/login.html', {**context, 'form': form}, request), status=status)
+    if status == 429:
+        response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+async def register(request):
+    if request.method == 'POST':
+        form = CustomUserRegistrationForm(request.POST)
+        # is_valid() consulta si el usuario ya existe
+        if await sync_to_async(form.is_valid)():
+            await form.asave()
+            if form.cleaned_data['user_type'] == 'owner':
+                return redirect('complete_owner_profile')
+            return redirect('complete_artist_profile')
+    else:
+        form = CustomUserRegistrationForm()
+    return HttpResponse(await arender_to_string('accounts/register.html', {'form': form}, request))
+
+
+# -------------------------
+# Perfil propio y dashboard
+# -------------------------
+@alogin_required
+async def ver_perfil(request):
+    # Usuario y perfil vienen de la caché de accounts/user_cache.py
+    context = ver_perfil_context(request)
+
+    async def medios():
+        media = [m async for m in request.user.media.prefetch_related('variants')]
+        return await arender_to_string('accounts/ver_perfil_medios.html', {'media': media}, request)
+
+    return await stream_page(request, 'accounts/ver_perfil.html', context, 'medios', medios)
+
+
+@alogin_required
+async def dashboard(request):
+    html = await arender_to_string('dashboard.html', {
+        'user': request.user,
+        'profile': request.role_profile.profile,
+        'perfil_completo': request.role_profile.complete,
+    }, request)
+    return HttpResponse(html)
+
+
+# -------------------------
+# Perfil público
+# -------------------------
+async def perfil_publico(request, username):
+    """Igual que views.perfil_publico, con la tarjeta en streaming si no está en caché."""
+    user = await auser(request)
+    anonymous = not user.is_authenticated and not get_messages(request)
+    user_id = await sync_to_async(profile_cache.cached_user_id)(username)
+    # Antes de leer la base (ver accounts/profile_cache.py)
+    seen = await sync_to_async(profile_cache.version)(user_id) if user_id else None
+    card = await sync_to_async(profile_cache.get_fragment)(user_id, 'card', seen) if user_id else None
+    if card is not None and card['username'] != username:
+        await sync_to_async(profile_cache.forget_user_id)(username)
+        card = None
+
+    if card is not None and anonymous:
+        page = await sync_to_async(profile_cache.get_fragment)(user_id, 'page', seen)
+        if page is not None:
+            return HttpResponse(page)
+
+    context = {'perfil_username': username}
+    on_complete = None
+    if anonymous and seen is not None:
+        async def on_complete(html):
+            await sync_to_async(profile_cache.set_fragment)(user_id, 'page', html.encode(), seen)
+
+    if card is not None:
+        html = await arender_to_string('accounts/perfil_publico.html', {**context, 'card': mark_safe(card['html'])}, request)
+        if on_complete is not None:
+            await on_complete(html)
+        return HttpResponse(html)
+
+    # El 404 tiene que resolverse antes de empezar a mandar la página
+    try:
+        perfil_user = await CustomUser.objects.select_related('owner_profile', 'artist_profile').aget(username=username)
+    except CustomUser.DoesNotExist:
+        raise Http404("No existe ese perfil.")
+    if perfil_user.pk != user_id:
+        # Sin el id no se pudo leer la versión antes: se cachea en el próximo request
+        await sync_to_async(profile_cache.remember_user_id)(username, perfil_user.pk)
+        on_complete = None
+
+    async def tarjeta():
+        media = [m async for m in perfil_user.media.prefetch_related('variants')]
+        html = await sync_to_async(perfil_publico_card)(perfil_user, media)
+        if perfil_user.pk == user_id:
+            card = {'username': perfil_user.username, 'html': html}
+            await sync_to_async(profile_cache.set_fragment)(user_id, 'card', card, seen)
+        return html
+
+    return await stream_page(request, 'accounts/perfil_publico.html', context, 'card', tarjeta, on_complete)
+
+
+# -------------------------
+# Buscador
+# -------------------------
+async def buscar(request):
+    form = SearchForm(request.GET or None)
+    valid = form.is_valid()
+    kind = form.cleaned_data['kind'] if valid else 'artist'
+
+    async def resultados():
+        page = None
+        if valid:
+            filters = form.cleaned_data
+            if wants_distance(filters):
+                # El perfil propio puede salir de la base
+                filters = await sync_to_async(buscar_origen)(request, filters)
+            page = await asearch_profiles(kind, filters, cursor=filters.get('cursor'))
+        return await arender_to_string(
+            'accounts/buscar_resultados.html', buscar_resultados_context(request, kind, page, form), request
+        )
+
+    return await stream_page(request, 'accounts/buscar.html', {'form': form, 'kind': kind}, 'resultados', resultados)
+
+
+# -------------------------
+# Mensajería: eventos en vivo
+# -------------------------
+# Bajo WSGI cada conexión abierta ocuparía un thread del servidor: ahí se
+# manda el estado actual y el navegador vuelve a preguntar a los
+# WSGI_RETRY_MS (EventSource reconecta solo).
+WSGI_RETRY_MS = 15_000
+
+
+@alogin_required
+async def mensajes_eventos(request):
+    user = await auser(request)
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(messaging.inbox_events(user.pk), content_type='text/event-stream')
+    else:
+        state = await sync_to_async(messaging.inbox_state)(user.pk)
+        response = HttpResponse(
+            f"retry: {WSGI_RETRY_MS}\n\n" + messaging.sse_event('inbox', state),
+            content_type='text/event-stream'
+        )
+    response['Cache-Control'] = 'no-cache'
+    # nginx: no juntar los eventos en el buffer del proxy
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,125 @@
+from django.db.models import Q
+
+from .models import AvailabilitySlot
+
+
+# -------------------------
+# Índice de disponibilidad
+# -------------------------
+DAYS_OF_WEEK = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+DAY_INDEX = {day: idx for idx, day in enumerate(DAYS_OF_WEEK)}
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value):
+    """'21:30' (o un datetime.time, o 1290) -> 1290. Devuelve None si no es válido."""
+    if value is None or value == '':
+        return None
+    if hasattr(value, 'hour'):
+        return value.hour * 60 + value.minute
+    if isinstance(value, int):
+        return value if 0 <= value <= MINUTES_PER_DAY else None
+    try:
+        hours, minutes = (int(part) for part in str(value).split(':')[:2])
+    except ValueError:
+        return None
+    total = hours * 60 + minutes
+    return total if 0 <= minutes < 60 and 0 <= total <= MINUTES_PER_DAY else None
+
+
+def split_range(day, start, end):
+    """
+    Parte un rango (día, desde, hasta) en segmentos que no cruzan la
+    medianoche. Si hasta <= desde el rango termina al día siguiente
+    (Viernes 21:00 a 02:00); si son iguales se toma como 24 horas.
+    """
+    if end > start:
+        return [(day, start, end)]
+    segments = [(day, start, MINUTES_PER_DAY)]
+    if end > 0:
+        segments.append(((day + 1) % 7, 0, end))
+    return segments
+
+
+def schedule_to_slots(schedule):
+    """
+    Convierte el JSON de parse_schedule_from_post
+    ({"Viernes": {"from": "21:00", "to": "02:00"}, ...})
+    en tuplas (día, minuto_desde, minuto_hasta).
+    """
+    if not isinstance(schedule, dict):
+        return []
+    slots = []
+    for day_name, times in schedule.items():
+        day = DAY_INDEX.get(day_name)
+        if day is None or not isinstance(times, dict):
+            continue
+        start = to_minutes(times.get('from'))
+        end = to_minutes(times.get('to'))
+        if start is None or end is None:
+            continue
+        slots.extend(split_range(day, start % MINUTES_PER_DAY, end % MINUTES_PER_DAY))
+    return slots
+
+
+def profile_schedule(profile):
+    if hasattr(profile, 'availability'):
+        return 'artist', profile.availability
+    return 'owner', profile.schedule
+
+
+def build_slots(profile):
+    kind, schedule = profile_schedule(profile)
+    return [
+        AvailabilitySlot(user_id=profile.user_id, kind=kind, day=day, start_minute=start, end_minute=end)
+        for day, start, end in schedule_to_slots(schedule)
+    ]
+
+
+def sync_profiles(profiles):
+    """Regenera las filas de disponibilidad de un lote de perfiles."""
+    profiles = list(profiles)
+    slots = [slot for profile in profiles for slot in build_slots(profile)]
+    AvailabilitySlot.objects.filter(user_id__in=[p.user_id for p in profiles]).delete()
+    AvailabilitySlot.objects.bulk_create(slots)
+    return len(slots)
+
+
+# -------------------------
+# Consultas
+# -------------------------
+def segment_q(day, start, end, cover=False):
+    if cover:
+        return Q(day=day, start_minute__lte=start, end_minute__gte=end)
+    return Q(day=day, start_minute__lt=end, end_minute__gt=start)
+
+
+def free_user_ids(kind, day, start, end, cover=False):
+    """
+    Queryset con los user_id de `kind` libres en el rango pedido, resuelto
+    desde el índice (kind, day, start_minute, end_minute).
+
+    `day` es el índice o el nombre del día, `start`/`end` minutos o 'HH:MM'.
+    Por defecto alcanza con que el horario se superponga con el rango; con
+    cover=True el horario tiene que cubrirlo completo. Un día u horario
+    inválido (los filtros vienen del GET) no encuentra a nadie.
+    """
+    if isinstance(day, str):
+        day = int(day) if day.isdigit() else DAY_INDEX.get(day)
+    start, end = to_minutes(start), to_minutes(end)
+    if day not in range(7) or start is None or end is None:
+        return AvailabilitySlot.objects.none().values_list('user_id', flat=True)
+    segments = split_range(day, start % MINUTES_PER_DAY, end % MINUTES_PER_DAY)
+    slots = AvailabilitySlot.objects.filter(kind=kind)
+
+    if not cover:
+        condition = Q()
+        for segment in segments:
+            condition |= segment_q(*segment)
+        return slots.filter(condition).values_list('user_id', flat=True).distinct()
+
+    # Cobertura: cada segmento tiene que estar contenido en alguna fila
+    user_ids = slots.filter(segment_q(*segments[0], cover=True)).values_list('user_id', flat=True)
+    for segment in segments[1:]:
+        user_ids = slots.filter(segment_q(*segment, cover=True), user_id__in=user_ids).values_list('user_id', flat=True)
+    return user_ids.distinct()
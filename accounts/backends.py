@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import Lower
+
+from . import hashers, user_cache
+
+
+# -------------------------
+# Login con usuario o email
+# -------------------------
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Acepta el username o el email, sin distinguir mayúsculas, en una sola
+    consulta: WHERE LOWER(username) = LOWER(%s) OR LOWER(email) = LOWER(%s),
+    que usa los índices funcionales user_username_lower_idx y
+    user_email_lower_idx (el motor combina ambos índices para el OR).
+    El LOWER() de los dos lados lo hace la base, así la comparación es la
+    misma que la del índice.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        user = self.pick_user(list(self.candidates(username)), username.strip())
+        if user is None:
+            # Mismo costo que una contraseña incorrecta, para no revelar qué
+            # usuarios existen (igual que ModelBackend)
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None):
+        """
+        authenticate() para las vistas async: el hash corre en el pool de
+        procesos de accounts/hashers.py, no en el event loop.
+        """
+        if username is None or password is None:
+            return None
+        user = self.pick_user([u async for u in self.candidates(username)], username.strip())
+        if user is None:
+            await hashers.amake_password(password)
+            return None
+        if await hashers.acheck_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    @staticmethod
+    def candidates(username):
+        # La coincidencia por username va primero: con el LIMIT, varias
+        # cuentas con ese email no la pueden dejar afuera (el orden del OR
+        # depende del plan de cada motor)
+        identifier = Lower(Value(username.strip()))
+        return (
+            get_user_model()._default_manager
+            .alias(username_lower=Lower('username'), email_lower=Lower('email'))
+            .filter(Q(username_lower=identifier) | Q(email_lower=identifier))
+            .order_by(Case(When(username_lower=identifier, then=Value(0)), default=Value(1)), 'pk')[:3]
+        )
+
+    @staticmethod
+    def pick_user(candidates, identifier):
+        """
+        Gana la coincidencia por username. Por email solo si es una sola
+        cuenta (el email no es único en CustomUser).
+        """
+        folded = identifier.casefold()
+        by_username = [u for u in candidates if u.username.casefold() == folded]
+        if by_username:
+            return by_username[0]
+        return candidates[0] if len(candidates) == 1 else None
+
+    def get_user(self, user_id):
+        # request.user en cada request autenticado: desde la caché del proceso
+        user = user_cache.get_user(user_id)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,470 @@
+import asyncio
+import importlib
+import itertools
+import json
+import random
+import resource
+import statistics
+import time
+import urllib.parse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+
+from . import messaging, seeding
+from .middleware import QueryRecorder
+from .models import CustomUser
+
+
+# -------------------------
+# Benchmarks de los caminos más usados
+# -------------------------
+# Cada escenario es una función (contexto, i) -> response que hace un request
+# con el Client de Django. Se mide latencia por request, throughput y
+# consultas SQL. Lo usa el comando `medir_rendimiento`, que corre todo contra
+# una base de test.
+DAYS = seeding.DAYS
+CLIENT_POOL = 20
+
+
+class BenchContext:
+    """Usuarios sembrados y clientes ya logueados, compartidos entre escenarios."""
+
+    def __init__(self, users, rng):
+        self.rng = rng
+        # Los usernames sembrados son bench_0000000 ... bench_{users - 1}
+        self.usernames = [f'bench_{i:07d}' for i in rng.sample(range(users), min(users, 1000))]
+        self.clients = {}
+        for user_type in ('owner', 'artist'):
+            pool = CustomUser.objects.filter(username__startswith='bench_', user_type=user_type)[:CLIENT_POOL]
+            self.clients[user_type] = []
+            for user in pool:
+                client = Client()
+                client.force_login(user)
+                self.clients[user_type].append((client, user))
+        self.staff = Client()
+        self.staff.force_login(CustomUser.objects.create_superuser('bench_admin', 'admin@example.com', 'x'))
+        self.anonymous = Client()
+        self.image = seeding.sample_image()
+        self.counter = itertools.count()
+
+    def logged_in(self, user_type=None):
+        user_type = user_type or self.rng.choice(('owner', 'artist'))
+        return self.rng.choice(self.clients[user_type])
+
+
+# -------------------------
+# Escenarios
+# -------------------------
+def registro(ctx, i):
+    n = next(ctx.counter)
+    return Client().post('/accounts/register/', {
+        'username': f'nuevo_{n}', 'email': f'nuevo_{n}@example.com',
+        'confirm_email': f'nuevo_{n}@example.com', 'first_name': 'Nuevo',
+        'last_name': 'Usuario', 'birth_date': '1990-05-01', 'phone': '+5493511234567',
+        'user_type': ctx.rng.choice(('owner', 'artist')), 'accept_terms': 'on',
+        'password1': 'Clave-Segura-123', 'password2': 'Clave-Segura-123',
+    })
+
+
+def login(ctx, i):
+    return Client().post('/accounts/login/', {
+        'username': ctx.rng.choice(ctx.usernames), 'password': seeding.DEFAULT_PASSWORD,
+    })
+
+
+def ver_perfil(ctx, i):
+    client, _ = ctx.logged_in()
+    return client.get('/accounts/perfil/')
+
+
+def schedule_post(prefix, rng):
+    data = {}
+    for day in rng.sample(DAYS, 3):
+        data[f'{prefix}_{day}'] = 'on'
+        data[f'from_{day}'] = '20:00'
+        data[f'to_{day}'] = '23:30'
+    return data
+
+
+def editar_perfil(ctx, i):
+    client, user = ctx.logged_in()
+    data = {
+        'first_name': 'Usuario', 'last_name': user.last_name, 'email': user.email,
+        'phone': '+5493511234567', 'birth_date': '1990-05-01', 'dni': '',
+        'file': SimpleUploadedFile(f'foto_{i}.jpg', ctx.image, content_type='image/jpeg'),
+        'media_type': 'image',
+    }
+    if user.user_type == 'owner':
+        data.update({
+            'business_name': f'Espacio {user.last_name}', 'business_type': 'Bar',
+            'address': 'Calle 123', 'city': 'Córdoba', 'province': 'Córdoba',
+            'capacity': 120, 'services_list': '["Sonido", "Luces"]',
+        })
+        data.update(schedule_post('days', ctx.rng))
+    else:
+        data.update({
+            'stage_name': f'Artista {user.last_name}', 'category': 'band',
+            'experience_years': 5, 'location': 'Córdoba', 'availability_json': '{}',
+        })
+        data.update(schedule_post('day', ctx.rng))
+    return client.post('/accounts/perfil/editar/', data)
+
+
+def perfil_publico(ctx, i):
+    return ctx.anonymous.get(f'/accounts/publico/{ctx.rng.choice(ctx.usernames)}/')
+
+
+def admin_usuarios(ctx, i):
+    return ctx.staff.get('/admin/accounts/customuser/')
+
+
+def admin_duenos(ctx, i):
+    return ctx.staff.get('/admin/accounts/establishmentowner/')
+
+
+def admin_artistas(ctx, i):
+    return ctx.staff.get('/admin/accounts/artistentrepreneur/')
+
+
+SCENARIOS = {
+    'registro': registro,
+    'login': login,
+    'ver_perfil': ver_perfil,
+    'editar_perfil': editar_perfil,
+    'perfil_publico': perfil_publico,
+    'admin_usuarios': admin_usuarios,
+    'admin_duenos': admin_duenos,
+    'admin_artistas': admin_artistas,
+}
+
+
+# -------------------------
+# Medición
+# -------------------------
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(ctx, scenario, requests, warmup=3):
+    for i in range(warmup):
+        scenario(ctx, i)
+
+    latencies = []
+    statuses = Counter()
+    queries = 0
+    started = time.perf_counter()
+    for i in range(requests):
+        recorder = QueryRecorder()
+        t0 = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = scenario(ctx, i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        statuses[response.status_code] += 1
+        queries += recorder.count
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 3),
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p90': round(percentile(latencies, 0.90), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(latencies[-1], 3),
+        },
+        'queries_per_request': round(queries / requests, 2),
+        'status': {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def run(users, requests, scenarios=None, media_per_user=1, seed=0):
+    """Siembra la base actual y corre los escenarios. Devuelve un dict serializable."""
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    seeding.seed_users(users, media_per_user=media_per_user, seed=seed)
+    seed_seconds = time.perf_counter() - t0
+
+    ctx = BenchContext(users, rng)
+    results = {}
+    for name in scenarios or SCENARIOS:
+        results[name] = measure(ctx, SCENARIOS[name], requests)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'users': users,
+            'media_per_user': media_per_user,
+            'requests_per_scenario': requests,
+            'seed': seed,
+            'database': connection.vendor,
+            'django': django.get_version(),
+        },
+        'seed_seconds': round(seed_seconds, 3),
+        'scenarios': results,
+    }
+
+
+def dumps(results):
+    return json.dumps(results, indent=2, ensure_ascii=False)
+
+
+# -------------------------
+# Carga concurrente: WSGI contra ASGI
+# -------------------------
+# Los mismos requests con las vistas sync en un pool de `threads` (como un
+# servidor WSGI con threads) y con las vistas async en un event loop con
+# `concurrency` requests en vuelo (como uvicorn). Todo en el proceso, sin
+# red: se compara lo que cada modelo deja hacer en paralelo con el mismo
+# hardware. `db_latency_ms` simula una base en otra máquina.
+LOAD_SCENARIOS = ('perfil_publico', 'ver_perfil', 'buscar', 'dashboard')
+
+
+def load_url(scenario, ctx, i):
+    if scenario == 'perfil_publico':
+        return f"/accounts/publico/{ctx.usernames[i % len(ctx.usernames)]}/"
+    if scenario == 'buscar':
+        city = seeding.CITIES[i % len(seeding.CITIES)][0]
+        return f"/accounts/buscar/?{urllib.parse.urlencode({'kind': 'artist', 'city': city})}"
+    if scenario == 'ver_perfil':
+        return '/accounts/perfil/'
+    return '/dashboard/'
+
+
+@contextmanager
+def read_views(use_async):
+    """Vuelve a armar las URLs con las vistas sync o async (ASYNC_VIEWS)."""
+    import accounts.urls
+    import redshow.urls
+
+    def rebuild():
+        importlib.reload(accounts.urls)
+        importlib.reload(redshow.urls)
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=use_async):
+            rebuild()
+            yield
+    finally:
+        rebuild()
+
+
+@contextmanager
+def db_latency(ms):
+    """Agrega `ms` de espera a cada consulta, en todas las conexiones nuevas."""
+    def delay(execute, sql, params, many, context):
+        time.sleep(ms / 1000)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    if ms:
+        connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+
+
+def load_summary(latencies, statuses, elapsed):
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p90': round(percentile(latencies, 0.90), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+        },
+        'status': {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def load_wsgi(ctx, scenario, requests, threads):
+    clients = [ctx.logged_in('owner')[0] if scenario != 'perfil_publico' else Client() for _ in range(threads)]
+    latencies, statuses = [], Counter()
+
+    def worker(n):
+        client = clients[n]
+        for i in range(n, requests, threads):
+            t0 = time.perf_counter()
+            response = client.get(load_url(scenario, ctx, i))
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses[response.status_code] += 1
+        connection.close()
+
+    started = time.perf_counter()
+    with read_views(False), ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, range(threads)))
+    return load_summary(latencies, statuses, time.perf_counter() - started)
+
+
+def load_asgi(ctx, scenario, requests, concurrency):
+    async def main():
+        clients = []
+        for _ in range(concurrency):
+            client = AsyncClient()
+            if scenario != 'perfil_publico':
+                client.cookies = ctx.logged_in('owner')[0].cookies
+            clients.append(client)
+        latencies, statuses = [], Counter()
+
+        async def worker(n):
+            client = clients[n]
+            for i in range(n, requests, concurrency):
+                t0 = time.perf_counter()
+                response = await client.get(load_url(scenario, ctx, i))
+                if response.streaming:
+                    [chunk async for chunk in response]
+                latencies.append((time.perf_counter() - t0) * 1000)
+                statuses[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        return load_summary(latencies, statuses, time.perf_counter() - started)
+
+    with read_views(True):
+        return asyncio.run(main())
+
+
+def run_load(users, requests, scenarios=None, threads=8, concurrency=64, db_latency_ms=0, seed=0):
+    """Siembra la base actual y corre cada escenario con WSGI y con ASGI."""
+    rng = random.Random(seed)
+    seeding.seed_users(users, media_per_user=1, seed=seed)
+    ctx = BenchContext(users, rng)
+
+    results = {}
+    with db_latency(db_latency_ms):
+        for name in scenarios or LOAD_SCENARIOS:
+            # Calentamiento: cachés de perfiles y de usuarios
+            load_wsgi(ctx, name, threads, threads)
+            results[name] = {
+                'wsgi': load_wsgi(ctx, name, requests, threads),
+                'asgi': load_asgi(ctx, name, requests, concurrency),
+            }
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'users': users,
+            'requests_per_mode': requests,
+            'wsgi_threads': threads,
+            'asgi_concurrency': concurrency,
+            'db_latency_ms': db_latency_ms,
+            'seed': seed,
+            'database': connection.vendor,
+            'django': django.get_version(),
+        },
+        'scenarios': results,
+    }
+
+
+# -------------------------
+# Mensajería: bandejas abiertas
+# -------------------------
+# Abre `connections` streams de eventos (accounts/messaging.py) en un event
+# loop, como las bandejas abiertas en un servidor ASGI, y manda `messages`
+# mensajes a usuarios al azar. Mide cuánto tarda en abrirse todo, la
+# memoria, la latencia de entrega y las consultas con las conexiones quietas.
+def run_inbox_fanout(users, connections, messages, idle_seconds=3.0, seed=0):
+    rng = random.Random(seed)
+    seeding.seed_users(users, media_per_user=0, seed=seed)
+    user_ids = list(CustomUser.objects.order_by('id').values_list('id', flat=True)[:users])
+    senders = {user.pk: user for user in CustomUser.objects.filter(pk__in=user_ids[:10])}
+    recipients = {user.pk: user for user in CustomUser.objects.filter(pk__in=user_ids[10:])}
+
+    async def main():
+        opened = asyncio.Event()
+        ready = Counter()
+        sent_at, delivery = {}, []
+
+        async def inbox(user_id, stop):
+            first = True
+            async for chunk in messaging.inbox_events(user_id, seconds=3600):
+                if not chunk.startswith('event: inbox'):
+                    continue
+                if first:
+                    first = False
+                    ready['open'] += 1
+                    if ready['open'] == connections:
+                        opened.set()
+                elif user_id in sent_at:
+                    delivery.append((time.perf_counter() - sent_at[user_id]) * 1000)
+                if stop.is_set():
+                    return
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        stop = asyncio.Event()
+        targets = [user_ids[10 + i % (len(user_ids) - 10)] for i in range(connections)]
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(inbox(user_id, stop)) for user_id in targets]
+        await opened.wait()
+        open_seconds = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # Las consultas del ORM async corren todas en el mismo thread
+        idle = Counter()
+
+        def count(execute, sql, params, many, context):
+            idle['queries'] += 1
+            return execute(sql, params, many, context)
+
+        await sync_to_async(lambda: connection.execute_wrappers.append(count))()
+        await asyncio.sleep(idle_seconds)
+        await sync_to_async(lambda: connection.execute_wrappers.remove(count))()
+
+        send = sync_to_async(messaging.send_message)
+        for i in range(messages):
+            recipient = recipients[rng.choice(targets)]
+            sent_at[recipient.pk] = time.perf_counter()
+            await send(rng.choice(list(senders.values())), recipient, f"mensaje {i}")
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.5)
+
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        delivery.sort()
+        return {
+            'connections': connections,
+            'open_seconds': round(open_seconds, 3),
+            'rss_delta_mb': round((rss_after - rss_before) / 1024, 1),
+            'idle_queries_per_second': round(idle['queries'] / idle_seconds, 2),
+            'messages': messages,
+            'deliveries': len(delivery),
+            'delivery_ms': {
+                'p50': round(percentile(delivery, 0.50), 3) if delivery else None,
+                'p99': round(percentile(delivery, 0.99), 3) if delivery else None,
+            },
+        }
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'users': users,
+            'seed': seed,
+            'database': connection.vendor,
+            'django': django.get_version(),
+        },
+        'fanout': asyncio.run(main()),
+    }
@@ -0,0 +1,181 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import availability
+from .models import ArtistEntrepreneur, AvailabilitySlot, ContractRequest, EstablishmentOwner
+from .search import make_page, paginate
+
+
+# -------------------------
+# Solicitudes de contratación
+# -------------------------
+# Quién puede pasar una solicitud de un estado a otro: la contraparte
+# (quien la recibió) acepta o rechaza, quien la hizo la puede retirar
+# mientras está pendiente y una aceptada la cancela cualquiera de los dos.
+TRANSITIONS = {
+    ('pending', 'accepted'): 'counterpart',
+    ('pending', 'rejected'): 'counterpart',
+    ('pending', 'cancelled'): 'requester',
+    ('accepted', 'cancelled'): 'party',
+}
+# Acota el rango de starts_at al buscar superposiciones (ver overlapping)
+MAX_DURATION = timedelta(hours=24)
+
+
+class ContractError(Exception):
+    pass
+
+
+class StaleContract(ContractError):
+    """La solicitud cambió desde que se leyó (ganó otra decisión)."""
+
+
+class SlotTaken(ContractError):
+    """Ya hay una fecha aceptada que se superpone."""
+
+
+def actor_role(contract, user):
+    if user.pk == contract.requested_by_id:
+        return 'requester'
+    if user.pk in (contract.venue.user_id, contract.artist.user_id):
+        return 'counterpart'
+    return None
+
+
+def can_transition(contract, user, status):
+    rule = TRANSITIONS.get((contract.status, status))
+    role = actor_role(contract, user)
+    if rule is None or role is None:
+        return False
+    return rule == 'party' or rule == role
+
+
+def allowed_transitions(contract, user):
+    return [status for (current, status) in TRANSITIONS if current == contract.status
+            and can_transition(contract, user, status)]
+
+
+def overlapping(queryset, starts_at, ends_at, status='accepted'):
+    """
+    Solicitudes de `queryset` en `status` que se superponen con el rango.
+    Como ninguna dura más de MAX_DURATION, starts_at queda acotado por los
+    dos lados y la consulta es un rango corto del índice (…, status, starts_at).
+    """
+    return queryset.filter(
+        status=status,
+        starts_at__gt=starts_at - MAX_DURATION,
+        starts_at__lt=ends_at,
+        ends_at__gt=starts_at,
+    )
+
+
+def venue_open(venue, starts_at, ends_at):
+    """El rango cae dentro del horario del espacio (si cargó horarios)."""
+    if not AvailabilitySlot.objects.filter(user_id=venue.user_id).exists():
+        return True
+    start, end = timezone.localtime(starts_at), timezone.localtime(ends_at)
+    return availability.free_user_ids(
+        'owner', start.weekday(), start.time(), end.time(), cover=True
+    ).filter(user_id=venue.user_id).exists()
+
+
+def create_request(requested_by, venue, artist, starts_at, ends_at, service_type, message=''):
+    if requested_by.pk not in (venue.user_id, artist.user_id):
+        raise ContractError("Solo el espacio o el artista pueden pedir la fecha.")
+    if ends_at <= starts_at:
+        raise ContractError("El horario de fin tiene que ser posterior al de inicio.")
+    if ends_at - starts_at > MAX_DURATION:
+        raise ContractError("Una fecha no puede durar más de 24 horas.")
+    if starts_at <= timezone.now():
+        raise ContractError("La fecha ya pasó.")
+    if not venue_open(venue, starts_at, ends_at):
+        raise ContractError("El espacio no abre en ese horario.")
+    # Aviso temprano, sin lock: la verificación que vale es la de accept()
+    if overlapping(venue.contract_requests.all(), starts_at, ends_at).exists():
+        raise SlotTaken("El espacio ya tiene una fecha aceptada en ese horario.")
+
+    return ContractRequest.objects.create(
+        venue=venue,
+        artist=artist,
+        requested_by=requested_by,
+        starts_at=starts_at,
+        ends_at=ends_at,
+        service_type=service_type,
+        message=message,
+    )
+
+
+def lock_calendars(contract):
+    """
+    Bloquea las filas del espacio y del artista hasta el COMMIT, siempre en
+    ese orden para que dos aceptaciones cruzadas no se traben entre sí. En
+    Postgres es SELECT … FOR UPDATE: las aceptaciones de un mismo espacio
+    pasan de a una y las de espacios distintos en paralelo. SQLite ignora
+    FOR UPDATE, pero las transacciones son IMMEDIATE (redshow/database) y
+    toman el lock de escritura de toda la base al empezar.
+    """
+    list(EstablishmentOwner.objects.select_for_update().filter(pk=contract.venue_id).values_list('pk'))
+    list(ArtistEntrepreneur.objects.select_for_update().filter(pk=contract.artist_id).values_list('pk'))
+
+
+def transition(contract, user, status, version=None, note=''):
+    """
+    Pasa `contract` a `status` en nombre de `user`. `version` es la que vio
+    el usuario (el formulario la manda oculta): si la solicitud cambió desde
+    entonces el UPDATE no encuentra la fila y se levanta StaleContract.
+    Aceptar verifica superposiciones con los calendarios bloqueados y
+    rechaza las pendientes que quedaron imposibles.
+    """
+    if not can_transition(contract, user, status):
+        raise ContractError("No podés hacer ese cambio en esta solicitud.")
+    expected = contract.version if version is None else version
+    now = timezone.now()
+
+    with transaction.atomic():
+        if status == 'accepted':
+            lock_calendars(contract)
+            others = ContractRequest.objects.exclude(pk=contract.pk)
+            if overlapping(others.filter(venue_id=contract.venue_id), contract.starts_at, contract.ends_at).exists():
+                raise SlotTaken("El espacio ya tiene una fecha aceptada en ese horario.")
+            if overlapping(others.filter(artist_id=contract.artist_id), contract.starts_at, contract.ends_at).exists():
+                raise SlotTaken("El artista ya tiene una fecha aceptada en ese horario.")
+
+        updated = ContractRequest.objects.filter(
+            pk=contract.pk, status=contract.status, version=expected
+        ).update(status=status, status_note=note, version=F('version') + 1, updated_at=now)
+        if not updated:
+            raise StaleContract("La solicitud cambió mientras la mirabas. Volvé a cargarla.")
+
+        if status == 'accepted':
+            reject_overlapping(contract, now)
+
+    contract.refresh_from_db(fields=['status', 'status_note', 'version', 'updated_at'])
+    return contract
+
+
+def reject_overlapping(contract, now):
+    others = ContractRequest.objects.exclude(pk=contract.pk)
+    for field, note in (
+        ('venue_id', "Horario ocupado: el espacio aceptó otra fecha."),
+        ('artist_id', "Horario ocupado: el artista aceptó otra fecha."),
+    ):
+        pending = overlapping(
+            others.filter(**{field: getattr(contract, field)}), contract.starts_at, contract.ends_at, 'pending'
+        )
+        pending.update(status='rejected', status_note=note, version=F('version') + 1, updated_at=now)
+
+
+def requests_for(profile, status, cursor=None):
+    """Solicitudes del espacio o del artista en `status`, las más nuevas primero."""
+    side = 'venue' if isinstance(profile, EstablishmentOwner) else 'artist'
+    queryset = (
+        ContractRequest.objects
+        .filter(**{side: profile, 'status': status})
+        .select_related('venue__user', 'artist__user')
+        .order_by('-id')
+    )
+    queryset, limit = paginate(queryset, cursor)
+    return make_page(queryset, limit)
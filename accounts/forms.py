@@ -1,8 +1,15 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib.auth import authenticate
-from .models import CustomUser, EstablishmentOwner, ArtistEntrepreneur, ProfileMedia
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from .models import CustomUser, EstablishmentOwner, ArtistEntrepreneur, ProfileMedia, Message, Review
+from .availability import DAYS_OF_WEEK
+from .geo import resolve_place
+from .backends import EmailOrUsernameBackend
+from . import hashers
 import json
+from datetime import datetime, timedelta
 
 # -------------------------
 # Registro de Usuario
@@ -46,6 +53,39 @@ class CustomUserRegistrationForm(UserCreationForm):
             self.add_error("confirm_email", "Los correos electrónicos no coinciden.")
         return cleaned_data
 
+    async def asave(self):
+        """save() para la vista async: el hash corre en el pool de procesos."""
+        user = self.instance
+        user.password = await hashers.amake_password(self.cleaned_data['password1'])
+        await user.asave()
+        return user
+
+
+# -------------------------
+# Login async
+# -------------------------
+class AsyncAuthenticationForm(AuthenticationForm):
+    """
+    AuthenticationForm de la vista async: is_valid() solo valida los campos
+    y la contraseña se verifica con `await form.aauthenticate()`.
+    """
+
+    def clean(self):
+        return self.cleaned_data
+
+    async def aauthenticate(self):
+        self.user_cache = await EmailOrUsernameBackend().aauthenticate(
+            self.request, self.cleaned_data['username'], self.cleaned_data['password']
+        )
+        try:
+            if self.user_cache is None:
+                raise self.get_invalid_login_error()
+            self.confirm_login_allowed(self.user_cache)
+        except ValidationError as error:
+            self.add_error(None, error)
+            return False
+        return True
+
 
 # -------------------------
 # Actualización Usuario
@@ -60,6 +100,13 @@ class CustomUserUpdateForm(forms.ModelForm):
         for field in self.fields:
             self.fields[field].widget.attrs['class'] = 'form-control'
 
+    def save(self, commit=True):
+        # Solo las columnas del formulario: el resto (password, is_active...) no se pisa
+        user = super().save(commit=False)
+        if commit:
+            user.save(update_fields=self._meta.fields)
+        return user
+
 
 # -------------------------
 # Dueño de Establecimiento
@@ -161,5 +208,145 @@ class ProfileMediaForm(forms.ModelForm):
         self.fields['media_type'].widget.attrs.update({'class': 'form-select'})
 
 
+# -------------------------
+# Buscador
+# -------------------------
+class SearchForm(forms.Form):
+    KIND_CHOICES = [
+        ('artist', 'Artistas / Emprendedores'),
+        ('owner', 'Espacios'),
+    ]
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES, required=False, label="Buscar")
+    q = forms.CharField(
+        max_length=200,
+        required=False,
+        label="Palabras clave",
+        widget=forms.TextInput(attrs={'placeholder': 'Ej: jazz trío palermo'})
+    )
+    city = forms.CharField(max_length=100, required=False, label="Ciudad")
+    province = forms.CharField(max_length=100, required=False, label="Provincia")
+    neighborhood = forms.CharField(max_length=100, required=False, label="Barrio")
+    category = forms.ChoiceField(
+        choices=[('', 'Todas')] + ArtistEntrepreneur.CATEGORY_CHOICES,
+        required=False,
+        label="Categoría"
+    )
+    business_type = forms.CharField(max_length=100, required=False, label="Tipo de Negocio")
+    capacity = forms.IntegerField(min_value=0, required=False, label="Capacidad mínima")
+    day = forms.TypedChoiceField(
+        choices=[('', 'Cualquier día')] + list(enumerate(DAYS_OF_WEEK)),
+        coerce=int,
+        empty_value=None,
+        required=False,
+        label="Día"
+    )
+    start = forms.TimeField(required=False, label="Desde", widget=forms.TimeInput(attrs={'type': 'time'}))
+    end = forms.TimeField(required=False, label="Hasta", widget=forms.TimeInput(attrs={'type': 'time'}))
+    near = forms.CharField(
+        max_length=200,
+        required=False,
+        label="Cerca de",
+        widget=forms.TextInput(attrs={'placeholder': 'Ej: Palermo, Rosario'})
+    )
+    radius = forms.IntegerField(min_value=1, max_value=500, required=False, label="Radio (km)")
+    order = forms.ChoiceField(
+        choices=[('', 'Más recientes'), ('rating', 'Mejor calificados'), ('distance', 'Más cercanos')],
+        required=False,
+        label="Ordenar por"
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields:
+            self.fields[field].widget.attrs['class'] = 'form-control'
+        self.fields['kind'].widget.attrs['class'] = 'form-select'
+        self.fields['order'].widget.attrs['class'] = 'form-select'
+        self.fields['category'].widget.attrs['class'] = 'form-select'
+        self.fields['day'].widget.attrs['class'] = 'form-select'
+
+    def clean_kind(self):
+        return self.cleaned_data.get('kind') or 'artist'
 
+    def clean(self):
+        cleaned_data = super().clean()
+        # 'near' -> (lat, lon) con el nomenclador; vacío, la vista puede
+        # usar el punto del perfil propio
+        cleaned_data['origin'] = None
+        near = cleaned_data.get('near')
+        if near:
+            place = resolve_place(near)
+            if place is None:
+                self.add_error('near', "No encontramos esa localidad.")
+            else:
+                cleaned_data['origin'] = (place.lat, place.lon)
+        return cleaned_data
 
+
+# -------------------------
+# Mensajes
+# -------------------------
+class MessageForm(forms.ModelForm):
+    class Meta:
+        model = Message
+        fields = ['body']
+        labels = {'body': "Mensaje"}
+        widgets = {
+            'body': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Escribí tu mensaje...'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['body'].widget.attrs['class'] = 'form-control'
+
+
+# -------------------------
+# Solicitud de contratación
+# -------------------------
+class ContractRequestForm(forms.Form):
+    date = forms.DateField(label="Fecha", widget=forms.DateInput(attrs={'type': 'date'}))
+    start = forms.TimeField(label="Desde", widget=forms.TimeInput(attrs={'type': 'time'}))
+    end = forms.TimeField(label="Hasta", widget=forms.TimeInput(attrs={'type': 'time'}))
+    service_type = forms.CharField(
+        max_length=100,
+        label="Tipo de Servicio",
+        widget=forms.TextInput(attrs={'placeholder': 'Ej: show en vivo, DJ set, catering'})
+    )
+    message = forms.CharField(required=False, label="Mensaje", widget=forms.Textarea(attrs={'rows': 3}))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields:
+            self.fields[field].widget.attrs['class'] = 'form-control'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date, start, end = cleaned_data.get('date'), cleaned_data.get('start'), cleaned_data.get('end')
+        if date and start and end:
+            starts_at = timezone.make_aware(datetime.combine(date, start))
+            ends_at = timezone.make_aware(datetime.combine(date, end))
+            # Si termina antes de empezar, termina al día siguiente (21:00 a 02:00)
+            if ends_at <= starts_at:
+                ends_at += timedelta(days=1)
+            cleaned_data['starts_at'] = starts_at
+            cleaned_data['ends_at'] = ends_at
+        return cleaned_data
+
+
+# -------------------------
+# Reseñas
+# -------------------------
+class ReviewForm(forms.ModelForm):
+    class Meta:
+        model = Review
+        fields = ['rating', 'comment']
+        widgets = {
+            'rating': forms.RadioSelect,
+            'comment': forms.Textarea(attrs={'rows': 4, 'placeholder': 'Contá cómo fue tu experiencia'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['rating'].widget.attrs['class'] = 'form-check-input'
+        self.fields['comment'].widget.attrs['class'] = 'form-control'
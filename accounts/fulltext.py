@@ -0,0 +1,169 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.db import connection
+
+from .models import ProfileSearchDocument
+
+
+# -------------------------
+# Índice de texto completo
+# -------------------------
+# Un documento por perfil (ProfileSearchDocument) con el texto ya plegado.
+# En SQLite se indexa con una tabla virtual FTS5 sobre la columna `stems`;
+# en Postgres con un índice GIN sobre to_tsvector('spanish', content).
+# Ver migración 0004_profilesearchdocument.
+FTS_TABLE = 'accounts_profilesearchdocument_fts'
+
+TOKEN_RE = re.compile(r'\w+')
+
+STOPWORDS = frozenset("""
+    a al con de del el en es la las lo los o para por que se sin su sus un una
+    unos unas y
+""".split())
+
+# Sufijos ordenados de más largo a más corto. Es un stemmer liviano (no
+# Snowball completo): lo importante es que indexación y consulta usen el
+# mismo, así "bandas" y "banda" o "musicos" y "musica" comparten raíz.
+SUFFIXES = (
+    'amientos', 'imientos', 'amiento', 'imiento', 'aciones', 'uciones',
+    'ancias', 'encias', 'mente', 'acion', 'ucion', 'ancia', 'encia',
+    'idades', 'idad', 'istas', 'ista', 'ando', 'iendo', 'ados', 'idos',
+    'adas', 'idas', 'ado', 'ido', 'ada', 'ida', 'eros', 'eras', 'ero', 'era',
+    'ces', 'es', 'os', 'as', 'ar', 'er', 'ir', 'o', 'a', 'e', 's',
+)
+MIN_STEM = 3
+
+
+def fold(text):
+    """Minúsculas y sin acentos: 'Música en Córdoba' -> 'musica en cordoba'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+@lru_cache(maxsize=65536)  # el vocabulario es chico: indexar en lote repite palabras
+def stem(word):
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Tokens plegados, sin stopwords."""
+    return [t for t in TOKEN_RE.findall(fold(text)) if t not in STOPWORDS]
+
+
+def stems_for(text):
+    return ' '.join(stem(t) for t in tokenize(text))
+
+
+# -------------------------
+# Documentos
+# -------------------------
+def profile_text(profile):
+    """Texto buscable de un perfil de dueño o artista."""
+    if hasattr(profile, 'stage_name'):
+        parts = [
+            profile.stage_name, profile.get_category_display(), profile.bio,
+            profile.location, profile.neighborhood,
+        ]
+    else:
+        parts = [
+            profile.business_name, profile.business_type, profile.description,
+            profile.city, profile.province,
+        ]
+        parts.extend(str(s) for s in (profile.additional_services or []))
+    return ' '.join(p for p in parts if p)
+
+
+def build_document(profile):
+    text = fold(profile_text(profile))
+    kind = 'artist' if hasattr(profile, 'stage_name') else 'owner'
+    return ProfileSearchDocument(
+        user_id=profile.user_id,
+        kind=kind,
+        content=text,
+        stems=stems_for(text),
+    )
+
+
+def index_profile(profile):
+    """Crea o actualiza el documento del perfil (lo llaman las señales)."""
+    doc = build_document(profile)
+    ProfileSearchDocument.objects.update_or_create(
+        user_id=doc.user_id,
+        defaults={'kind': doc.kind, 'content': doc.content, 'stems': doc.stems},
+    )
+
+
+def index_profiles(profiles):
+    """Reindexa un lote de perfiles con dos consultas (borrado + inserción)."""
+    docs = [build_document(p) for p in profiles]
+    if not docs:
+        return 0
+    ProfileSearchDocument.objects.filter(user_id__in=[d.user_id for d in docs]).delete()
+    ProfileSearchDocument.objects.bulk_create(docs)
+    return len(docs)
+
+
+def remove_profile(user_id):
+    ProfileSearchDocument.objects.filter(user_id=user_id).delete()
+
+
+# -------------------------
+# Consultas
+# -------------------------
+def match_expression(query):
+    """Consulta FTS5: todas las raíces, con prefijo ("jazz"* "trio"* ...)."""
+    return ' '.join(f'"{stem(t)}"*' for t in tokenize(query))
+
+
+def ranked_user_ids(query, kind, within=None, offset=0, limit=None):
+    """
+    Ids de usuario que coinciden con `query`, ordenados por relevancia.
+    Se resuelve completamente en el índice del motor de base de datos.
+    `within` (un queryset con user_id, el del buscador con sus filtros) se
+    aplica en la misma consulta, antes del orden y del LIMIT: un perfil que
+    cumple los filtros aparece aunque quede lejos en el ranking general.
+    `offset` y `limit` recortan el ranking ya filtrado (sin `limit`, todo
+    el ranking).
+    """
+    if not tokenize(query):
+        return []
+
+    restrict, restrict_params = '', []
+    if within is not None:
+        subquery, restrict_params = within.order_by().values('user_id').query.sql_with_params()
+        restrict = f'AND d.user_id IN ({subquery})'
+    page = 'LIMIT %s OFFSET %s' if limit is not None else ''  # offset solo con limit
+    page_params = [limit, offset] if limit is not None else []
+
+    if connection.vendor == 'postgresql':
+        sql = f"""
+            SELECT d.user_id
+            FROM accounts_profilesearchdocument d
+            WHERE d.kind = %s
+              AND to_tsvector('spanish', d.content) @@ plainto_tsquery('spanish', %s)
+              {restrict}
+            ORDER BY ts_rank(to_tsvector('spanish', d.content),
+                             plainto_tsquery('spanish', %s)) DESC, d.user_id
+            {page}
+        """
+        params = [kind, fold(query), *restrict_params, fold(query), *page_params]
+    else:
+        sql = f"""
+            SELECT d.user_id
+            FROM {FTS_TABLE} f
+            JOIN accounts_profilesearchdocument d ON d.id = f.rowid
+            WHERE {FTS_TABLE} MATCH %s AND d.kind = %s
+              {restrict}
+            ORDER BY bm25({FTS_TABLE}), d.user_id
+            {page}
+        """
+        params = [match_expression(query), kind, *restrict_params, *page_params]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
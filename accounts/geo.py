@@ -0,0 +1,356 @@
+import csv
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Q
+
+from .fulltext import fold
+from .models import ArtistEntrepreneur, EstablishmentOwner
+
+
+# -------------------------
+# Nomenclador de localidades
+# -------------------------
+# Ciudad, provincia, barrio y dirección de los perfiles son texto libre. Se
+# ubican contra un nomenclador que viene con la app (data/localidades.csv),
+# sin llamadas a servicios externos: la coordenada es la del barrio o, si no
+# se encuentra, la de la ciudad. No hay altura de calle, así que los perfiles
+# de un mismo barrio comparten punto.
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'localidades.csv'
+KEY_RE = re.compile(r'[^a-z0-9]+')
+POINT_FIELDS = ['latitude', 'longitude', 'geohash']
+
+
+class Place(NamedTuple):
+    kind: str  # 'ciudad' o 'barrio'
+    name: str
+    city: str
+    province: str
+    lat: float
+    lon: float
+
+
+class Gazetteer(NamedTuple):
+    provinces: dict  # clave -> nombre de la provincia
+    cities: dict  # clave -> [Place], en el orden del archivo
+    barrios: dict  # (clave de la ciudad, clave del barrio) -> Place
+    barrio_names: dict  # clave del barrio -> [Place]
+
+
+def place_key(text):
+    """'Bs. As.' -> 'bs as', ' Núñez' -> 'nunez'."""
+    return KEY_RE.sub(' ', fold((text or '').replace('.', ''))).strip()
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer(path=GAZETTEER_PATH):
+    gazetteer = Gazetteer({}, {}, {}, {})
+    with open(path, encoding='utf-8', newline='') as fh:
+        for row in csv.DictReader(line for line in fh if not line.startswith('#')):
+            names = [row['nombre']] + [alias for alias in row['alias'].split('|') if alias]
+            if row['tipo'] == 'provincia':
+                for name in names:
+                    gazetteer.provinces.setdefault(place_key(name), row['nombre'])
+                continue
+            place = Place(
+                row['tipo'], row['nombre'], row['ciudad'] or row['nombre'], row['provincia'],
+                float(row['lat']), float(row['lon'])
+            )
+            for name in map(place_key, names):
+                if place.kind == 'barrio':
+                    gazetteer.barrios.setdefault((place_key(place.city), name), place)
+                    gazetteer.barrio_names.setdefault(name, []).append(place)
+                else:
+                    gazetteer.cities.setdefault(name, []).append(place)
+    return gazetteer
+
+
+def pick(candidates, province=''):
+    """El candidato de `province` si hay uno; si no, el primero del archivo."""
+    if province and candidates:
+        wanted = load_gazetteer().provinces.get(place_key(province))
+        for place in candidates:
+            if place.province == wanted:
+                return place
+    return candidates[0] if candidates else None
+
+
+def find_city(name, province=''):
+    return pick(load_gazetteer().cities.get(place_key(name), []), province)
+
+
+def geocode(city='', province='', neighborhood='', address=''):
+    """
+    Ubica un perfil por sus campos de texto. Se prueba el barrio y lo que
+    viene después de la calle en la dirección ('Av. Corrientes 1234,
+    Almagro') como barrio de la ciudad o como otra localidad de la misma
+    provincia ('Godoy Cruz' cargado como barrio de Mendoza); si nada
+    coincide queda el centro de la ciudad. Devuelve un Place o None.
+    """
+    gazetteer = load_gazetteer()
+    city_place = find_city(city, province) if place_key(city) else None
+    hints = [place_key(hint) for hint in [neighborhood, *address.split(',')[1:]]]
+    for hint in filter(None, hints):
+        if city_place is not None:
+            place = gazetteer.barrios.get((place_key(city_place.city), hint))
+            nearby = find_city(hint, city_place.province)
+            if place is None and nearby is not None and nearby.province == city_place.province:
+                place = nearby
+        else:
+            place = pick(gazetteer.barrio_names.get(hint, []), province) or find_city(hint, province)
+        if place is not None:
+            return place
+    return city_place
+
+
+def resolve_place(text):
+    """
+    Lo que se escribe en el buscador: 'Palermo', 'Rosario', 'Alberdi,
+    Rosario' o 'San Martín, Mendoza'. Devuelve un Place o None.
+    """
+    parts = [key for key in map(place_key, (text or '').split(',')) if key]
+    if not parts:
+        return None
+    first, rest = parts[0], parts[1:]
+    gazetteer = load_gazetteer()
+    if rest:
+        city = find_city(rest[0], rest[-1])
+        place = gazetteer.barrios.get((place_key(city.city), first)) if city else None
+        if place is None and first in gazetteer.cities:
+            place = find_city(first, rest[-1])
+        if place is not None:
+            return place
+    return find_city(first) or pick(gazetteer.barrio_names.get(first, []))
+
+
+def profile_place(profile):
+    # Sirve para los dos tipos de perfil (y para los modelos históricos de
+    # las migraciones): cada uno tiene solo algunos de estos campos
+    return geocode(
+        city=getattr(profile, 'city', '') or getattr(profile, 'location', ''),
+        province=getattr(profile, 'province', ''),
+        neighborhood=getattr(profile, 'neighborhood', ''),
+        address=getattr(profile, 'address', ''),
+    )
+
+
+def set_point(profile, lat, lon):
+    """Guarda el punto (o lo borra con None) en el perfil. Devuelve si cambió."""
+    geohash = encode(lat, lon) if lat is not None else ''
+    changed = (profile.latitude, profile.longitude, profile.geohash) != (lat, lon, geohash)
+    profile.latitude, profile.longitude, profile.geohash = lat, lon, geohash
+    return changed
+
+
+def locate_profile(profile):
+    place = profile_place(profile)
+    return set_point(profile, place.lat, place.lon) if place else set_point(profile, None, None)
+
+
+class LocateReport(NamedTuple):
+    updated: int
+    located: int
+    missing: Counter  # (ciudad, provincia) sin ubicar -> perfiles
+
+
+def locate_all(batch_size=1000):
+    """
+    Vuelve a ubicar todos los perfiles (después de cambiar el nomenclador).
+    Devuelve cuántos cambiaron, cuántos quedaron ubicados y qué localidades
+    no se encontraron, para completar el archivo.
+    """
+    updated = located = 0
+    missing = Counter()
+    for model in (EstablishmentOwner, ArtistEntrepreneur):
+        last_id = 0
+        while True:
+            batch = list(model.objects.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            changed = [profile for profile in batch if locate_profile(profile)]
+            with transaction.atomic():
+                model.objects.bulk_update(changed, POINT_FIELDS)
+            updated += len(changed)
+            for profile in batch:
+                if profile.geohash:
+                    located += 1
+                else:
+                    missing[(
+                        getattr(profile, 'city', '') or getattr(profile, 'location', ''),
+                        getattr(profile, 'province', ''),
+                    )] += 1
+    return LocateReport(updated, located, missing)
+
+
+# -------------------------
+# Geohash
+# -------------------------
+# La grilla se parte en 32 celdas por cada carácter del hash (un bit de
+# longitud, uno de latitud, alternados). Los puntos de una celda comparten
+# prefijo y, como el alfabeto está en orden ASCII, una celda es el rango
+# [prefijo, prefijo siguiente) del índice sobre `geohash`. Se consulta con
+# >= y <, no con LIKE 'x%': los dos motores resuelven rangos con el B-tree
+# sin importar la collation.
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # celdas de ~5 m
+MAX_CELLS = 16  # celdas por búsqueda (se juntan en rangos)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def grid_bits(precision):
+    """Bits de (longitud, latitud); la longitud lleva el primero."""
+    bits = 5 * precision
+    return (bits + 1) // 2, bits // 2
+
+
+def grid_index(lat, lon, precision):
+    lon_bits, lat_bits = grid_bits(precision)
+    i = int((lon + 180) / 360 * (1 << lon_bits))
+    j = int((lat + 90) / 180 * (1 << lat_bits))
+    return min(max(i, 0), (1 << lon_bits) - 1), min(max(j, 0), (1 << lat_bits) - 1)
+
+
+def cell_value(i, j, precision):
+    """Intercala los bits de la columna `i` y la fila `j`: el hash como entero."""
+    lon_bits, lat_bits = grid_bits(precision)
+    value = 0
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            lon_bits -= 1
+            value = value << 1 | (i >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            value = value << 1 | (j >> lat_bits) & 1
+    return value
+
+
+def to_base32(value, precision):
+    return ''.join(BASE32[value >> 5 * k & 31] for k in reversed(range(precision)))
+
+
+def encode(lat, lon, precision=GEOHASH_PRECISION):
+    return to_base32(cell_value(*grid_index(lat, lon, precision), precision), precision)
+
+
+def bounding_boxes(lat, lon, km):
+    """
+    Cuadrados (lat_min, lon_min, lat_max, lon_max) que contienen el círculo.
+    Si cruza el antimeridiano son dos, uno de cada lado; si toca un polo,
+    todas las longitudes.
+    """
+    dlat = km / KM_PER_DEGREE
+    dlon = km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    lat_min, lat_max = max(lat - dlat, -90), min(lat + dlat, 90)
+    west, east = lon - dlon, lon + dlon
+    if dlon >= 180 or lat_min == -90 or lat_max == 90:
+        return [(lat_min, -180, lat_max, 180)]
+    if west < -180:
+        return [(lat_min, west + 360, lat_max, 180), (lat_min, -180, lat_max, east)]
+    if east > 180:
+        return [(lat_min, west, lat_max, 180), (lat_min, -180, lat_max, east - 360)]
+    return [(lat_min, west, lat_max, east)]
+
+
+def cover(box, max_cells=MAX_CELLS):
+    """
+    Rangos [desde, hasta) de geohash que cubren `box`, con la precisión más
+    fina que no pasa de `max_cells` celdas. Las celdas consecutivas en el
+    orden del hash van en un mismo rango; `hasta` es None al final de todo.
+    """
+    min_lat, min_lon, max_lat, max_lon = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        (i0, j0), (i1, j1) = grid_index(min_lat, min_lon, precision), grid_index(max_lat, max_lon, precision)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) <= max_cells:
+            break
+    ranges = []
+    for value in sorted(cell_value(i, j, precision) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)):
+        if ranges and ranges[-1][1] == value:
+            ranges[-1][1] = value + 1
+        else:
+            ranges.append([value, value + 1])
+    end = 1 << 5 * precision
+    return [(to_base32(low, precision), to_base32(high, precision) if high < end else None) for low, high in ranges]
+
+
+def cover_q(ranges, field='geohash'):
+    condition = Q()
+    for low, high in ranges:
+        cell = Q(**{f'{field}__gte': low})
+        if high is not None:
+            cell &= Q(**{f'{field}__lt': high})
+        condition |= cell
+    return condition
+
+
+# -------------------------
+# Búsquedas por distancia
+# -------------------------
+# La base devuelve los candidatos (celdas que cubren el cuadrado alrededor
+# del círculo, recortadas al cuadrado) y la distancia exacta se calcula acá:
+# sin funciones trigonométricas en SQL, igual en SQLite que en Postgres.
+NEAREST_START_KM = 5
+NEAREST_GROWTH = 8  # sin ningún candidato
+MAX_SEARCH_KM = 5000  # La Quiaca - Ushuaia son ~3.700 km
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def candidates(queryset, lat, lon, km, key='id'):
+    """(key, latitud, longitud) de las filas de `queryset` que pueden estar a menos de `km`."""
+    condition = Q()
+    for box in bounding_boxes(lat, lon, km):
+        condition |= cover_q(cover(box)) & Q(latitude__range=(box[0], box[2]), longitude__range=(box[1], box[3]))
+    return (
+        queryset
+        .filter(condition)
+        .order_by()
+        .values_list(key, 'latitude', 'longitude')
+    )
+
+
+def within_radius(queryset, lat, lon, km, key='id'):
+    """[(distancia en km, key)] de las filas a menos de `km`, de la más cercana a la más lejana."""
+    hits = []
+    for value, row_lat, row_lon in candidates(queryset, lat, lon, km, key):
+        distance = haversine_km(lat, lon, row_lat, row_lon)
+        if distance <= km:
+            hits.append((distance, value))
+    hits.sort()
+    return hits
+
+
+def nearest(queryset, lat, lon, k, key='id', max_km=MAX_SEARCH_KM):
+    """
+    Las `k` filas más cercanas, como within_radius. Se busca en un radio que
+    crece hasta tener `k` filas adentro del círculo (lo de afuera no puede
+    estar más cerca). Si en el cuadrado ya había `k` candidatos, la k-ésima
+    distancia entre ellos alcanza como radio: una consulta más y listo.
+    """
+    km = NEAREST_START_KM
+    while True:
+        hits = sorted(
+            (haversine_km(lat, lon, row_lat, row_lon), value)
+            for value, row_lat, row_lon in candidates(queryset, lat, lon, km, key)
+        )
+        inside = [hit for hit in hits if hit[0] <= km]
+        if len(inside) >= k or km >= max_km:
+            return inside[:k]
+        if len(hits) >= k:
+            km = hits[k - 1][0]
+        elif hits:
+            # Con densidad pareja, k filas entran en un radio sqrt(k / n) veces mayor
+            km *= max(2.0, 1.5 * math.sqrt(k / len(hits)))
+        else:
+            km *= NEAREST_GROWTH
+        km = min(km, max_km)
@@ -0,0 +1,97 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from .worker import init_worker
+
+
+# -------------------------
+# Hashers con parámetros configurables
+# -------------------------
+# Mismo `algorithm` que los de Django, así los hashes existentes se siguen
+# verificando. Si cambian los parámetros, must_update() devuelve True y
+# Django vuelve a hashear la contraseña en el próximo login correcto
+# (check_password con setter, lo hace ModelBackend).
+class TunedScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT['work_factor']
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT['block_size']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT['parallelism']
+
+
+class TunedArgon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2['time_cost']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2['memory_cost']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2['parallelism']
+
+
+# -------------------------
+# Hash fuera del event loop
+# -------------------------
+# Un hash lento dentro de una vista async frena a todos los requests del
+# worker. Estas funciones lo corren en un pool de procesos (no de threads:
+# PBKDF2 sostiene el GIL). Las usan el login y el registro async
+# (EmailOrUsernameBackend.aauthenticate, CustomUserRegistrationForm.asave).
+_pool = None
+
+
+def hash_pool():
+    global _pool
+    if _pool is None:
+        processes = getattr(settings, 'PASSWORD_HASH_PROCESSES', None) or os.cpu_count() or 1
+        context = multiprocessing.get_context('spawn')
+        _pool = ProcessPoolExecutor(processes, mp_context=context, initializer=init_worker)
+    return _pool
+
+
+def shutdown_pool():
+    """Cierra el pool; el próximo hash_pool() arma uno nuevo con los settings de ese momento."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def verify(password, encoded):
+    """(válida, hay que rehashear). Corre en el proceso hijo."""
+    outdated = []
+    # check_password llama al setter solo si es válida y el hash está desactualizado
+    valid = hashers.check_password(password, encoded, setter=outdated.append)
+    return valid, bool(outdated)
+
+
+async def amake_password(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_pool(), hashers.make_password, password)
+
+
+async def acheck_password(user, password):
+    """
+    Versión async de user.check_password(): verifica en el pool y, si el
+    hash usa parámetros viejos, guarda el nuevo.
+    """
+    loop = asyncio.get_running_loop()
+    valid, must_update = await loop.run_in_executor(hash_pool(), verify, password, user.password)
+    if must_update:
+        user.password = await amake_password(password)
+        await user.asave(update_fields=['password'])
+    return valid
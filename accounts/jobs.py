@@ -0,0 +1,121 @@
+import traceback
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from . import profile_cache, thumbnails
+from .models import CustomUser, MediaJob, ProfileMedia
+
+
+# -------------------------
+# Cola de trabajos de medios
+# -------------------------
+# Los trabajos se encolan como filas de MediaJob y los ejecuta el comando
+# `procesar_medios` en un pool de procesos, fuera del request.
+RETRY_BASE_SECONDS = 30
+STALE_AFTER = timedelta(minutes=15)
+
+
+def enqueue(kind, object_id, max_attempts=3):
+    return MediaJob.objects.create(kind=kind, object_id=object_id, max_attempts=max_attempts)
+
+
+# -------------------------
+# Handlers (corren en los procesos del pool)
+# -------------------------
+def process_media_variants(media_id):
+    media = ProfileMedia.objects.filter(pk=media_id).first()
+    if media is None:  # se borró antes de procesarse
+        return
+    variants = thumbnails.generate_variants(media.file, media.user_id, media)
+    # Un archivo que Pillow no puede abrir no se arregla reintentando
+    status = 'ready' if variants else 'failed'
+    ProfileMedia.objects.filter(pk=media_id).update(status=status)
+    # bulk_create y update() no disparan señales
+    profile_cache.invalidate(media.user_id)
+
+
+def process_profile_image(user_id):
+    user = CustomUser.objects.filter(pk=user_id).first()
+    if user is None or not user.profile_image:
+        return
+    if not thumbnails.profile_image_is_current(user):
+        thumbnails.generate_variants(user.profile_image, user.pk)
+        profile_cache.invalidate(user.pk)
+
+
+HANDLERS = {
+    'media_variants': process_media_variants,
+    'profile_image': process_profile_image,
+}
+
+
+def run_job(kind, object_id):
+    """Punto de entrada en el proceso hijo. Devuelve None o el traceback."""
+    try:
+        HANDLERS[kind](object_id)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+# -------------------------
+# Reclamar y cerrar trabajos (proceso principal)
+# -------------------------
+def claim_jobs(limit):
+    """
+    Marca como 'running' hasta `limit` trabajos pendientes y los devuelve.
+    El UPDATE condicionado a status='pending' hace que dos workers nunca
+    tomen el mismo trabajo, tanto en SQLite como en Postgres.
+    """
+    now = timezone.now()
+    candidates = (
+        MediaJob.objects
+        .filter(status='pending', run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidates:
+        updated = MediaJob.objects.filter(id=job_id, status='pending').update(
+            status='running', attempts=F('attempts') + 1, updated_at=now
+        )
+        if updated:
+            claimed.append(MediaJob.objects.get(id=job_id))
+    return claimed
+
+
+def finish_job(job, error=None):
+    """Cierra el trabajo o lo reprograma con espera exponencial."""
+    now = timezone.now()
+    if error is None:
+        MediaJob.objects.filter(id=job.id).update(status='done', last_error='', updated_at=now)
+        return
+
+    if job.attempts < job.max_attempts:
+        delay = timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+        MediaJob.objects.filter(id=job.id).update(
+            status='pending', run_after=now + delay, last_error=error, updated_at=now
+        )
+        return
+
+    MediaJob.objects.filter(id=job.id).update(status='failed', last_error=error, updated_at=now)
+    if job.kind == 'media_variants':
+        ProfileMedia.objects.filter(pk=job.object_id).update(status='failed')
+
+
+def release_job(job):
+    """Devuelve a la cola un trabajo reclamado que no llegó a terminar, sin contarle el intento."""
+    now = timezone.now()
+    MediaJob.objects.filter(id=job.id, status='running').update(
+        status='pending', attempts=F('attempts') - 1, run_after=now, updated_at=now
+    )
+
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """Devuelve a la cola los trabajos que quedaron 'running' (worker caído)."""
+    limit = timezone.now() - stale_after
+    return MediaJob.objects.filter(status='running', updated_at__lt=limit).update(
+        status='pending', updated_at=timezone.now()
+    )
@@ -0,0 +1,83 @@
+import os
+from collections import defaultdict
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import MediaVariant, StoredBlob
+from accounts.storage import media_storage, recount, reference_fields
+
+RECOUNT_BATCH = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa los archivos subidos antes del storage por contenido a blobs "
+        "deduplicados. Correrlo sin subidas en curso: el refcount de cada blob "
+        "se recalcula contando las referencias en las tablas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Solo cuenta los archivos a migrar y los bytes que se liberarían."
+        )
+        parser.add_argument(
+            '--recontar', action='store_true',
+            help="Además recalcula el refcount de todos los blobs desde las referencias."
+        )
+
+    def handle(self, *args, **options):
+        # Nombre viejo -> filas que lo usan: las que comparten archivo se migran juntas
+        references = defaultdict(list)
+        for model, field in reference_fields():
+            rows = (
+                model.objects.exclude(**{field: ''})
+                .values_list('pk', field)
+                .order_by('pk')
+            )
+            for pk, name in rows.iterator():
+                references[name].append((model, field, pk))
+        blobs = set(StoredBlob.objects.values_list('name', flat=True))
+
+        migrated = duplicates = freed = 0
+        seen = {}
+        for name, rows in references.items():
+            if name in blobs:
+                continue
+            if not media_storage.exists(name):
+                self.stderr.write(f"No existe: {name}")
+                continue
+
+            digest, size = media_storage.hash_file(media_storage.path(name))
+            if digest in seen:
+                duplicates += 1
+                freed += size
+            seen.setdefault(digest, name)
+            migrated += 1
+            if options['dry_run']:
+                continue
+
+            # Si algo falla se deshace también el refcount que sumó save()
+            with transaction.atomic():
+                with media_storage.open(name) as fh:
+                    new_name = media_storage.save(os.path.basename(name), File(fh))
+                for model, field, pk in rows:
+                    # update() en vez de save(): no dispara señales ni regenera variantes
+                    model.objects.filter(pk=pk).update(**{field: new_name})
+                MediaVariant.objects.filter(source=name).update(source=new_name)
+                recount([new_name])
+            media_storage.delete(name)
+
+        verb = "a migrar" if options['dry_run'] else "migrados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{migrated} archivos {verb}, {duplicates} duplicados ({freed} bytes)."
+        ))
+
+        if options['recontar'] and not options['dry_run']:
+            fixed = 0
+            names = list(StoredBlob.objects.order_by('pk').values_list('name', flat=True))
+            for start in range(0, len(names), RECOUNT_BATCH):
+                fixed += recount(names[start:start + RECOUNT_BATCH])
+            self.stdout.write(self.style.SUCCESS(f"{fixed} blobs con refcount corregido."))
@@ -0,0 +1,45 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.matching import DEFAULT_TOP, rank_artists_for_venues
+from accounts.models import ArtistEntrepreneur, EstablishmentOwner
+
+
+class Command(BaseCommand):
+    help = "Propone artistas para cada espacio según disponibilidad, localidad y categoría."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="Candidatos por espacio.")
+        parser.add_argument(
+            '--category', action='append', dest='categories',
+            choices=[c for c, _ in ArtistEntrepreneur.CATEGORY_CHOICES],
+            help="Categoría de artista (se puede repetir)."
+        )
+        parser.add_argument('--city', help="Solo espacios de esta ciudad.")
+        parser.add_argument('--venue', action='append', type=int, dest='venues', help="user_id del espacio.")
+        parser.add_argument('--output', help="Archivo JSON de salida (por defecto, stdout).")
+
+    def handle(self, *args, **options):
+        venues = EstablishmentOwner.objects.all()
+        if options['city']:
+            venues = venues.filter(city=options['city'])
+        if options['venues']:
+            venues = venues.filter(user_id__in=options['venues'])
+
+        started = time.perf_counter()
+        matches = rank_artists_for_venues(venues, top_k=options['top'], categories=options['categories'])
+        elapsed = time.perf_counter() - started
+
+        payload = {
+            str(venue_id): [{'artist': artist_id, 'minutes': minutes} for artist_id, minutes in candidates]
+            for venue_id, candidates in matches.items()
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(payload, fh)
+        else:
+            self.stdout.write(json.dumps(payload, indent=2))
+
+        self.stderr.write(f"{len(matches)} espacios emparejados en {elapsed:.2f}s")
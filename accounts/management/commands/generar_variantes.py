@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from accounts import thumbnails
+from accounts.models import CustomUser, MediaVariant, ProfileMedia
+
+
+class Command(BaseCommand):
+    help = "Genera las variantes (thumb, card, full) de imágenes ya subidas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing-only', action='store_true',
+            help="Solo imágenes que todavía no tienen variantes."
+        )
+
+    def handle(self, *args, **options):
+        media = ProfileMedia.objects.filter(media_type='image').order_by('id')
+        users = CustomUser.objects.exclude(profile_image='').order_by('id')
+        if options['missing_only']:
+            media = media.filter(variants__isnull=True)
+            # Los que ya tienen variantes de la foto de perfil (media en null)
+            users = users.exclude(
+                pk__in=MediaVariant.objects.filter(media__isnull=True).values('user_id')
+            )
+
+        total = 0
+        for item in media.iterator():
+            total += bool(thumbnails.generate_variants(item.file, item.user_id, item))
+        for user in users.distinct().iterator():
+            total += bool(thumbnails.generate_variants(user.profile_image, user.pk))
+
+        self.stdout.write(self.style.SUCCESS(f"{total} imágenes procesadas."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from accounts import geo
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a ubicar todos los perfiles con el nomenclador de "
+        "accounts/data/localidades.csv y lista las localidades que no encontró."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--top', type=int, default=20, help="Localidades sin ubicar a mostrar.")
+
+    def handle(self, *args, **options):
+        report = geo.locate_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.updated} perfiles actualizados, {report.located} ubicados, "
+            f"{sum(report.missing.values())} sin ubicar."
+        ))
+        for (city, province), count in report.missing.most_common(options['top']):
+            self.stdout.write(f"  {count:>6}  {city or '(sin ciudad)'}, {province or '(sin provincia)'}")
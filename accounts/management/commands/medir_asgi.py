@@ -0,0 +1,63 @@
+import json
+import logging
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from accounts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara throughput y latencia de las vistas de lectura con WSGI "
+        "(vistas sync en threads) y con ASGI (vistas async) sobre una base de test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help="Usuarios a sembrar.")
+        parser.add_argument('--requests', type=int, default=400, help="Requests por escenario y modo.")
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios', choices=benchmarks.LOAD_SCENARIOS,
+            help="Escenario a correr (se puede repetir; por defecto, todos)."
+        )
+        parser.add_argument('--threads', type=int, default=8, help="Threads del servidor WSGI simulado.")
+        parser.add_argument('--concurrency', type=int, default=64, help="Requests en vuelo con ASGI.")
+        parser.add_argument('--db-latency', type=float, default=0.0,
+                            help="Milisegundos agregados a cada consulta (base remota).")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Archivo JSON de salida.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        query_logger = logging.getLogger('accounts.queries')
+        previous_level = query_logger.level
+        query_logger.setLevel(logging.ERROR)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            ):
+                results = benchmarks.run_load(
+                    options['users'], options['requests'], options['scenarios'],
+                    threads=options['threads'], concurrency=options['concurrency'],
+                    db_latency_ms=options['db_latency'], seed=options['seed'],
+                )
+        finally:
+            query_logger.setLevel(previous_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, modes in results['scenarios'].items():
+            for mode, result in modes.items():
+                latency = result['latency_ms']
+                self.stdout.write(
+                    f"{name:15} {mode:5} {result['throughput_rps']:>9} req/s  p50 {latency['p50']:>8} ms  "
+                    f"p99 {latency['p99']:>8} ms  {result['status']}"
+                )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {options['output']}"))
@@ -0,0 +1,102 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from accounts import geo, search, seeding
+from accounts.benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga perfiles sintéticos y mide la búsqueda por radio y por los k "
+        "más cercanos con el índice de geohash contra recorrer la tabla "
+        "entera; verifica que den los mismos resultados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=20, help="Vecinos de la búsqueda de los más cercanos.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Archivo JSON de salida.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seeding.seed_users(options['users'], media_per_user=0, seed=options['seed'])
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            style = self.style.SUCCESS if result['mismatches'] == 0 else self.style.ERROR
+            self.stdout.write(
+                f"{name:16} índice p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+                f"tabla entera p50 {result['scan_p50_ms']} ms  consultas {result['queries_per_search']}  "
+                f"filas/búsqueda {result['rows_per_search']}  " + style(f"distintos={result['mismatches']}")
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2)
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        places = [place for candidates in geo.load_gazetteer().cities.values() for place in candidates]
+        queryset = search.build_queryset('artist', {})
+        everything = list(queryset.exclude(geohash='').order_by().values_list('id', 'latitude', 'longitude'))
+
+        def scan(lat, lon, km=None, k=None):
+            """Lo mismo sin índice: distancia a todas las filas."""
+            rows = list(queryset.exclude(geohash='').order_by().values_list('id', 'latitude', 'longitude'))
+            hits = sorted((geo.haversine_km(lat, lon, row_lat, row_lon), pk) for pk, row_lat, row_lon in rows)
+            return [hit for hit in hits if hit[0] <= km] if km is not None else hits[:k]
+
+        searches = {
+            'radio': lambda lat, lon, km: geo.within_radius(queryset, lat, lon, km),
+            'más cercanos': lambda lat, lon, km: geo.nearest(queryset, lat, lon, options['k']),
+        }
+        results = {}
+        for name, run_search in searches.items():
+            timings, scan_timings, queries, rows, mismatches = [], [], [], [], 0
+            for _ in range(options['queries']):
+                # La mitad desde una localidad del nomenclador, la mitad desde un perfil
+                if rng.random() < 0.5:
+                    place = rng.choice(places)
+                    lat, lon = place.lat, place.lon
+                else:
+                    _, lat, lon = rng.choice(everything)
+                km = rng.choice([2, 5, 10, 25, 50])
+
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    hits = run_search(lat, lon, km)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+                rows.append(len(hits))
+
+                started = time.perf_counter()
+                expected = scan(lat, lon, km=km) if name == 'radio' else scan(lat, lon, k=options['k'])
+                scan_timings.append((time.perf_counter() - started) * 1000)
+                # Los empates de distancia pueden salir en otro orden
+                if [round(d, 9) for d, _ in hits] != [round(d, 9) for d, _ in expected]:
+                    mismatches += 1
+
+            timings.sort()
+            scan_timings.sort()
+            results[name] = {
+                'profiles': len(everything),
+                'queries': options['queries'],
+                'p50_ms': round(percentile(timings, 0.50), 3),
+                'p99_ms': round(percentile(timings, 0.99), 3),
+                'scan_p50_ms': round(percentile(scan_timings, 0.50), 3),
+                'queries_per_search': round(sum(queries) / len(queries), 2),
+                'rows_per_search': round(sum(rows) / len(rows), 1),
+                'mismatches': mismatches,
+            }
+        return results
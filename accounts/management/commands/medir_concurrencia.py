@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from redshow.database import apply_pragmas, sqlite_pragmas
+
+
+# Lo que hace ver_perfil (leer usuario y perfil) y editar_perfil (leer y
+# actualizar en la misma transacción)
+READ_SQL = (
+    'SELECT u.*, o.* FROM accounts_customuser u '
+    'LEFT JOIN accounts_establishmentowner o ON o.user_id = u.id WHERE u.id = ?'
+)
+WRITE_SELECT_SQL = 'SELECT first_name FROM accounts_customuser WHERE id = ?'
+WRITE_UPDATE_SQL = 'UPDATE accounts_customuser SET first_name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?'
+
+# SQLite sin ajustar: journal DELETE, fsync en cada commit, BEGIN DEFERRED y
+# el timeout por defecto del módulo sqlite3 (5 s)
+BASELINE = {'pragmas': {'journal_mode': 'delete', 'synchronous': 'full'}, 'timeout': 5.0, 'begin': 'BEGIN'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide lecturas y escrituras concurrentes sobre una copia de la base "
+        "con SQLite sin ajustar y con SQLITE_PRAGMAS y BEGIN IMMEDIATE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0, help="Segundos por configuración.")
+        parser.add_argument('--mode', choices=['both', 'baseline', 'tuned'], default='both')
+        parser.add_argument('--output', help="Archivo JSON de salida.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("medir_concurrencia compara configuraciones de SQLite.")
+        modes = ['baseline', 'tuned'] if options['mode'] == 'both' else [options['mode']]
+        options_dict = connection.settings_dict['OPTIONS']
+        configs = {
+            'baseline': BASELINE,
+            'tuned': {
+                'pragmas': sqlite_pragmas(),
+                'timeout': options_dict.get('timeout', 5.0),
+                'begin': f"BEGIN {options_dict.get('transaction_mode') or ''}".strip(),
+            },
+        }
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode in modes:
+                # Una copia nueva por configuración: el journal_mode queda en el archivo
+                path = os.path.join(tmp, f'{mode}.db')
+                self.copy_database(path)
+                results[mode] = self.run(path, configs[mode], options)
+                self.report(mode, results[mode])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2)
+
+    def copy_database(self, path):
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+
+    def run(self, path, config, options):
+        pragmas = dict(config['pragmas'])
+        # El journal_mode queda en el archivo: se cambia una vez, sin otras conexiones abiertas
+        conn = sqlite3.connect(path)
+        try:
+            apply_pragmas(conn, {'journal_mode': pragmas.pop('journal_mode', 'delete')})
+            user_ids = [row[0] for row in conn.execute('SELECT id FROM accounts_customuser LIMIT 10000')]
+        finally:
+            conn.close()
+        if not user_ids:
+            raise CommandError("La base no tiene usuarios (ver sembrar_datos).")
+
+        deadline = time.perf_counter() + options['duration']
+        stats = {'read': [], 'write': [], 'locked': 0}
+        lock = threading.Lock()
+
+        def worker(kind, seed):
+            rng = random.Random(seed)
+            conn = sqlite3.connect(path, timeout=config['timeout'], isolation_level=None)
+            apply_pragmas(conn, pragmas)
+            latencies, locked = [], 0
+            while time.perf_counter() < deadline:
+                user_id = rng.choice(user_ids)
+                started = time.perf_counter()
+                try:
+                    if kind == 'read':
+                        conn.execute(READ_SQL, (user_id,)).fetchall()
+                    else:
+                        # Como editar_perfil: lee y después escribe en la misma transacción
+                        conn.execute(config['begin'])
+                        conn.execute(WRITE_SELECT_SQL, (user_id,)).fetchone()
+                        conn.execute(WRITE_UPDATE_SQL, (f'bench{rng.randrange(1000)}', user_id))
+                        conn.execute('COMMIT')
+                except sqlite3.OperationalError as exc:
+                    if 'locked' not in str(exc) and 'busy' not in str(exc):
+                        raise
+                    locked += 1
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    continue
+                latencies.append(time.perf_counter() - started)
+            conn.close()
+            with lock:
+                stats[kind].extend(latencies)
+                stats['locked'] += locked
+
+        threads = [threading.Thread(target=worker, args=('read', i)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=('write', 1000 + i)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        duration = options['duration']
+        return {
+            'pragmas': config['pragmas'],
+            'begin': config['begin'],
+            'readers': options['readers'],
+            'writers': options['writers'],
+            'reads_per_second': round(len(stats['read']) / duration, 1),
+            'writes_per_second': round(len(stats['write']) / duration, 1),
+            'read_p95_ms': self.percentile_ms(stats['read'], 95),
+            'write_p95_ms': self.percentile_ms(stats['write'], 95),
+            'locked_errors': stats['locked'],
+        }
+
+    @staticmethod
+    def percentile_ms(values, percent):
+        if len(values) < 2:
+            return None
+        return round(statistics.quantiles(values, n=100)[percent - 1] * 1000, 2)
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f"{mode:9} lecturas/s={result['reads_per_second']:>9} p95={result['read_p95_ms']} ms  "
+            f"escrituras/s={result['writes_per_second']:>7} p95={result['write_p95_ms']} ms  "
+            f"bloqueos={result['locked_errors']}"
+        )
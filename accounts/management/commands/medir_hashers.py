@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+from accounts import hashers
+
+
+class Command(BaseCommand):
+    help = "Mide el costo de cada hasher de contraseñas: logins por segundo por núcleo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Verificaciones por hasher.")
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help="Procesos para medir acheck_password en paralelo (0 = no medir).")
+        parser.add_argument('--output', help="Archivo JSON de salida.")
+
+    def handle(self, *args, **options):
+        results = {}
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode('clave-de-prueba', hasher.salt())
+            except (ValueError, ImportError) as exc:  # falta la librería (argon2, bcrypt)
+                self.stdout.write(f"{hasher.algorithm:14} no disponible ({exc})")
+                continue
+            results[path] = self.measure(hasher, encoded, options)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2)
+
+    def measure(self, hasher, encoded, options):
+        iterations = options['iterations']
+        started = time.perf_counter()
+        for _ in range(iterations):
+            hasher.verify('clave-de-prueba', encoded)
+        verify_ms = (time.perf_counter() - started) * 1000 / iterations
+        result = {
+            'algorithm': hasher.algorithm,
+            'verify_ms': round(verify_ms, 2),
+            'logins_per_second_per_core': round(1000 / verify_ms, 1),
+        }
+
+        processes = options['processes']
+        if processes:
+            # verify() usa el hasher que indica el prefijo del hash
+            with override_settings(PASSWORD_HASH_PROCESSES=processes):
+                result['pool'] = asyncio.run(self.measure_pool(encoded, iterations * processes, processes))
+
+        line = f"{hasher.algorithm:14} {result['verify_ms']:>8} ms  {result['logins_per_second_per_core']:>7} logins/s/núcleo"
+        if 'pool' in result:
+            line += f"  {result['pool']['logins_per_second']:>7} logins/s con {processes} procesos"
+        self.stdout.write(line)
+        return result
+
+    async def measure_pool(self, encoded, total, processes):
+        hashers.shutdown_pool()  # un pool nuevo con estos settings
+        pool = hashers.hash_pool()
+        loop = asyncio.get_running_loop()
+        try:
+            # Calentamiento: arrancar los procesos no cuenta
+            await asyncio.gather(*(
+                loop.run_in_executor(pool, hashers.verify, 'clave-de-prueba', encoded)
+                for _ in range(processes)
+            ))
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                loop.run_in_executor(pool, hashers.verify, 'clave-de-prueba', encoded)
+                for _ in range(total)
+            ))
+            elapsed = time.perf_counter() - started
+        finally:
+            hashers.shutdown_pool()
+        return {
+            'processes': processes,
+            'logins_per_second': round(total / elapsed, 1),
+            'logins_per_second_per_core': round(total / elapsed / processes, 1),
+        }
@@ -0,0 +1,52 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from accounts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Abre muchas bandejas con eventos en vivo en un event loop sobre una "
+        "base de test y mide memoria, latencia de entrega y consultas en reposo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help="Usuarios a sembrar.")
+        parser.add_argument('--connections', type=int, default=10_000, help="Bandejas abiertas.")
+        parser.add_argument('--messages', type=int, default=200, help="Mensajes a enviar.")
+        parser.add_argument('--idle-seconds', type=float, default=3.0)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Archivo JSON de salida.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        query_logger = logging.getLogger('accounts.queries')
+        previous_level = query_logger.level
+        query_logger.setLevel(logging.ERROR)
+        try:
+            results = benchmarks.run_inbox_fanout(
+                options['users'], options['connections'], options['messages'],
+                idle_seconds=options['idle_seconds'], seed=options['seed'],
+            )
+        finally:
+            query_logger.setLevel(previous_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        fanout = results['fanout']
+        self.stdout.write(
+            f"{fanout['connections']} bandejas abiertas en {fanout['open_seconds']} s "
+            f"(+{fanout['rss_delta_mb']} MB)\n"
+            f"consultas/s en reposo: {fanout['idle_queries_per_second']}\n"
+            f"{fanout['deliveries']} eventos por {fanout['messages']} mensajes, "
+            f"entrega p50 {fanout['delivery_ms']['p50']} ms, p99 {fanout['delivery_ms']['p99']} ms"
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {options['output']}"))
@@ -0,0 +1,62 @@
+import logging
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from accounts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra N usuarios en una base de test y mide latencia, throughput y "
+        "consultas de registro, login, perfiles y admin. Escribe JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Usuarios a sembrar (1k a 1M).")
+        parser.add_argument('--requests', type=int, default=100, help="Requests medidos por escenario.")
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios', choices=list(benchmarks.SCENARIOS),
+            help="Escenario a correr (se puede repetir; por defecto, todos)."
+        )
+        parser.add_argument('--media-per-user', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0, help="Semilla para que las corridas sean comparables.")
+        parser.add_argument('--output', help="Archivo JSON de salida (por defecto, stdout).")
+        parser.add_argument('--keepdb', action='store_true', help="No borrar la base de test al terminar.")
+
+    def handle(self, *args, **options):
+        # Nunca contra la base real: misma lógica que `manage.py test`
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        query_logger = logging.getLogger('accounts.queries')
+        previous_level = query_logger.level
+        query_logger.setLevel(logging.ERROR)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            ):
+                results = benchmarks.run(
+                    options['users'], options['requests'], options['scenarios'],
+                    media_per_user=options['media_per_user'], seed=options['seed'],
+                )
+        finally:
+            query_logger.setLevel(previous_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = benchmarks.dumps(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(output)
+            for name, result in results['scenarios'].items():
+                latency = result['latency_ms']
+                self.stdout.write(
+                    f"{name:16} {result['throughput_rps']:>9} req/s  p50 {latency['p50']:>8} ms  "
+                    f"p99 {latency['p99']:>8} ms  {result['queries_per_request']} consultas"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {options['output']}"))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,172 @@
+import json
+import os
+import queue
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, time as dtime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from accounts import contracts, seeding
+from accounts.models import ArtistEntrepreneur, ContractRequest, EstablishmentOwner
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga muchas solicitudes superpuestas para un mismo espacio y las "
+        "acepta desde varios threads a la vez; verifica que no queden fechas "
+        "aceptadas superpuestas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help="Solicitudes pendientes para el espacio.")
+        parser.add_argument('--slots', type=int, default=10, help="Franjas distintas (una aceptada por franja).")
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument(
+            '--mode', choices=['both', 'service', 'naive'], default='both',
+            help="service: contracts.transition; naive: verificar y después actualizar, sin lock ni versión."
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Archivo JSON de salida.")
+
+    def handle(self, *args, **options):
+        modes = ['naive', 'service'] if options['mode'] == 'both' else [options['mode']]
+        setup_test_environment()
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            test_settings = connection.settings_dict.setdefault('TEST', {})
+            previous_name = test_settings.get('NAME')
+            if connection.vendor == 'sqlite':
+                # En archivo: en memoria las conexiones de los threads comparten
+                # caché y SQLite no respeta busy_timeout entre ellas
+                test_settings['NAME'] = os.path.join(tmp, 'reservas.db')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                seeding.seed_users(100, media_per_user=0, seed=options['seed'])
+                for mode in modes:
+                    results[mode] = self.run(mode, options)
+                    self.report(mode, results[mode])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = previous_name
+                teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2)
+
+    def seed_requests(self, options):
+        rng = random.Random(options['seed'])
+        ContractRequest.objects.all().delete()
+        venue = EstablishmentOwner.objects.select_related('user').order_by('id').first()
+        artists = list(ArtistEntrepreneur.objects.select_related('user').order_by('id'))
+        day = timezone.localdate() + timedelta(days=7)
+        first = timezone.make_aware(datetime.combine(day, dtime(12, 0)))
+        # Franjas separadas por 3 h; dentro de cada una todas se superponen
+        rows = []
+        for i in range(options['requests']):
+            artist = artists[i % len(artists)]
+            starts_at = first + timedelta(hours=3 * (i % options['slots']), minutes=rng.randrange(60))
+            rows.append(ContractRequest(
+                venue=venue, artist=artist, requested_by=artist.user,
+                starts_at=starts_at, ends_at=starts_at + timedelta(minutes=90), service_type='Show',
+            ))
+        ContractRequest.objects.bulk_create(rows)
+        ids = list(ContractRequest.objects.values_list('id', flat=True))
+        rng.shuffle(ids)
+        return venue, ids
+
+    @staticmethod
+    def accept_naive(contract):
+        """Lo que haría una vista sin el servicio: verificar y después actualizar."""
+        others = ContractRequest.objects.filter(venue_id=contract.venue_id).exclude(pk=contract.pk)
+        if contracts.overlapping(others, contract.starts_at, contract.ends_at).exists():
+            raise contracts.SlotTaken("ocupado")
+        ContractRequest.objects.filter(pk=contract.pk).update(status='accepted')
+
+    def run(self, mode, options):
+        venue, ids = self.seed_requests(options)
+        pending = queue.Queue()
+        for contract_id in ids:
+            pending.put(contract_id)
+        latencies, outcomes = [], Counter()
+        lock = threading.Lock()
+
+        def worker():
+            local_latencies, local_outcomes = [], Counter()
+            try:
+                while True:
+                    try:
+                        contract_id = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    contract = ContractRequest.objects.select_related('venue', 'artist').get(pk=contract_id)
+                    started = time.perf_counter()
+                    try:
+                        if mode == 'naive':
+                            self.accept_naive(contract)
+                        else:
+                            contracts.transition(contract, venue.user, 'accepted')
+                        local_outcomes['accepted'] += 1
+                    except contracts.SlotTaken:
+                        local_outcomes['slot_taken'] += 1
+                    except contracts.StaleContract:
+                        local_outcomes['stale'] += 1
+                    except contracts.ContractError:
+                        local_outcomes['not_pending'] += 1
+                    except OperationalError:
+                        local_outcomes['db_locked'] += 1
+                    local_latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                outcomes.update(local_outcomes)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        # Pares de fechas aceptadas superpuestas del espacio (tiene que dar 0)
+        accepted = list(
+            ContractRequest.objects.filter(venue=venue, status='accepted')
+            .order_by('starts_at').values_list('starts_at', 'ends_at')
+        )
+        overlaps, latest_end = 0, None
+        for starts_at, ends_at in accepted:
+            if latest_end is not None and starts_at < latest_end:
+                overlaps += 1
+            latest_end = ends_at if latest_end is None else max(latest_end, ends_at)
+
+        latencies.sort()
+        return {
+            'requests': len(ids),
+            'slots': options['slots'],
+            'threads': options['threads'],
+            'seconds': round(elapsed, 3),
+            'decisions_per_second': round(len(ids) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+            'outcomes': dict(outcomes),
+            'accepted': len(accepted),
+            'overlapping_pairs': overlaps,
+        }
+
+    def report(self, mode, result):
+        style = self.style.SUCCESS if result['overlapping_pairs'] == 0 else self.style.ERROR
+        self.stdout.write(
+            f"{mode:8} {result['decisions_per_second']:>8} decisiones/s  p50 {result['p50_ms']} ms  "
+            f"p99 {result['p99_ms']} ms  aceptadas={result['accepted']}/{result['slots']}  "
+            + style(f"superpuestas={result['overlapping_pairs']}") + f"  {result['outcomes']}"
+        )
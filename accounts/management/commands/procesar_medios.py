@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from accounts import jobs
+from accounts.worker import init_worker
+
+
+class Command(BaseCommand):
+    help = "Worker de la cola de medios: genera variantes de imágenes en un pool de procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Segundos entre consultas si la cola está vacía.")
+        parser.add_argument('--once', action='store_true', help="Vacía la cola y termina.")
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"{requeued} trabajos colgados devueltos a la cola.")
+
+        pool = self.new_pool(processes)
+        running = {}  # future -> job
+        # Trabajos que estaban en vuelo cuando murió un proceso del pool: no
+        # se sabe cuál fue, así que se vuelven a correr de a uno. El que
+        # rompa el pool corriendo solo es el culpable y gasta un intento.
+        isolated = set()
+        try:
+            while True:
+                broken = False
+                free = (1 if isolated else processes) - len(running)
+                if free > 0:
+                    for job in jobs.claim_jobs(free):
+                        try:
+                            running[pool.submit(jobs.run_job, job.kind, job.object_id)] = job
+                        except BrokenProcessPool:
+                            jobs.release_job(job)
+                            broken = True
+
+                if not running and not broken:
+                    isolated.clear()
+                    if options['once']:
+                        break
+                    connections.close_all()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                if broken or any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                    # Con el pool roto fallan todos los trabajos que no terminaron
+                    done, _ = wait(running)
+                    broken = True
+
+                suspects = []
+                for future in done:
+                    job = running.pop(future)
+                    exc = future.exception()
+                    if isinstance(exc, BrokenProcessPool):
+                        suspects.append(job)
+                        continue
+                    # run_job devuelve el traceback; una excepción acá es del pool
+                    self.finish(job, repr(exc) if exc is not None else future.result(), isolated)
+
+                if broken:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.new_pool(processes)
+                    self.stdout.write(self.style.WARNING("Se cayó un proceso del pool: pool nuevo."))
+                    if len(suspects) == 1:
+                        self.finish(suspects[0], "El proceso murió corriendo el trabajo (BrokenProcessPool).", isolated)
+                    else:
+                        for job in suspects:
+                            jobs.release_job(job)
+                            isolated.add(job.id)
+        finally:
+            pool.shutdown()
+
+    def new_pool(self, processes):
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(processes, mp_context=context, initializer=init_worker)
+
+    def finish(self, job, error, isolated):
+        jobs.finish_job(job, error)
+        isolated.discard(job.id)
+        status = 'ok' if error is None else 'error'
+        self.stdout.write(f"{job.kind} #{job.object_id}: {status}")
@@ -0,0 +1,53 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import throttling, uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las sesiones vencidas por lotes (sin bloquear la tabla con un "
+        "único DELETE), los baldes de límite de login que ya se rellenaron y "
+        "las subidas por partes abandonadas con sus archivos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Segundos de espera entre lotes, para no competir con el tráfico.")
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+        if hasattr(engine.SessionStore, 'get_model_class'):
+            deleted = self.purge_sessions(engine.SessionStore.get_model_class(), options)
+            self.stdout.write(f"{deleted} sesiones vencidas borradas.")
+        else:
+            # signed_cookies: las sesiones viven en el navegador
+            self.stdout.write(f"{settings.SESSION_ENGINE} no guarda sesiones en la base.")
+
+        # Un balde sin uso durante el período más largo ya está lleno: borrarlo no cambia nada
+        older_than = max(rate.period for rate in throttling.rates().values())
+        buckets = throttling.DatabaseBucketStore().purge(older_than)
+        self.stdout.write(self.style.SUCCESS(f"{buckets} baldes de login borrados."))
+
+        sessions, files = uploads.expire_sessions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{sessions} subidas abandonadas y {files} archivos .part borrados."))
+
+    def purge_sessions(self, model, options):
+        # expire_date tiene índice: cada lote es un range scan y un DELETE por pk
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                return deleted
+            deleted += model.objects.filter(pk__in=keys).delete()[0]
+            if options['pause']:
+                time.sleep(options['pause'])
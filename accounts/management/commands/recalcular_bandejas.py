@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts import messaging
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde los mensajes los contadores denormalizados de la "
+        "mensajería (no leídos, último mensaje y totales de cada bandeja)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = messaging.rebuild_counters(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{total} conversaciones recalculadas."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts import reviews
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde las reseñas los agregados de calificación de todos "
+        "los perfiles (cantidad, suma, histograma y puntaje de orden)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reviews.rebuild_aggregates(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{fixed} perfiles corregidos."))
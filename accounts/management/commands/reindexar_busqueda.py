@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from accounts import fulltext
+from accounts.models import EstablishmentOwner, ArtistEntrepreneur, ProfileSearchDocument
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de texto completo de perfiles (dueños y artistas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing-only', action='store_true',
+            help="Indexa solo los perfiles que todavía no tienen documento (incremental)."
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+
+        for model in (EstablishmentOwner, ArtistEntrepreneur):
+            queryset = model.objects.order_by('id')
+            if options['missing_only']:
+                indexed = ProfileSearchDocument.objects.values('user_id')
+                queryset = queryset.exclude(user_id__in=indexed)
+
+            # Recorrido por cursor de id: no carga la tabla entera en memoria
+            last_id = 0
+            while True:
+                batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                total += fulltext.index_profiles(batch)
+                last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"{total} perfiles indexados."))
@@ -0,0 +1,43 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea usuarios sintéticos (dueños y artistas) con perfiles, medios, "
+        "horarios e índices de búsqueda para pruebas de carga."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=seeding.BATCH_SIZE)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help="Procesos que arman los lotes (la inserción es secuencial).")
+        parser.add_argument('--media-per-user', type=int, default=1)
+        parser.add_argument('--prefix', default='seed', help="Prefijo de los usernames.")
+        parser.add_argument('--password', default=seeding.DEFAULT_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(created):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{created} usuarios ({created / elapsed:.0f}/s)")
+
+        created = seeding.seed_users(
+            options['users'],
+            media_per_user=options['media_per_user'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+            processes=max(1, options['processes']),
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"{created} usuarios creados en {elapsed:.1f}s."))
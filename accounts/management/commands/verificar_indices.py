@@ -0,0 +1,182 @@
+import re
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from accounts import geo, search
+from accounts.backends import EmailOrUsernameBackend
+from accounts.contracts import overlapping
+from accounts.models import (
+    CustomUser, EstablishmentOwner, ArtistEntrepreneur, ProfileMedia, MediaJob,
+    ThrottleBucket, UploadSession, ConversationMember, Message, ContractRequest,
+    Review
+)
+
+
+# -------------------------
+# Consultas a verificar
+# -------------------------
+# Una por camino de acceso de la app y del admin, tal como las arma el
+# código (o el changelist del admin), con el índice que tiene que usar.
+# Las búsquedas de texto del admin (icontains = LIKE '%x%') no pueden usar
+# índices y no están acá.
+def access_paths():
+    now = timezone.now()
+    return {
+        'login (usuario o email)': (EmailOrUsernameBackend.candidates('usuario'), 'user_username_lower_idx'),
+        'admin usuarios por tipo': (
+            CustomUser.objects.filter(user_type='artist').order_by('username'), 'user_type_username_idx',
+        ),
+        'admin usuarios staff': (
+            CustomUser.objects.filter(is_staff=True).order_by('username'), 'user_staff_username_idx',
+        ),
+        'admin usuarios inactivos': (
+            CustomUser.objects.filter(is_active=False).order_by('username'), 'user_inactive_username_idx',
+        ),
+        'admin dueños por tipo de negocio': (
+            EstablishmentOwner.objects.select_related('user').filter(business_type='Bar').order_by('-pk'),
+            'owner_btype_id_idx',
+        ),
+        'admin dueños por nombre': (
+            EstablishmentOwner.objects.select_related('user').order_by('business_name'), 'owner_bname_idx',
+        ),
+        'admin artistas por categoría': (
+            ArtistEntrepreneur.objects.select_related('user').filter(category='dj').order_by('-pk'),
+            'artist_category_id_idx',
+        ),
+        'admin artistas por nombre artístico': (
+            ArtistEntrepreneur.objects.select_related('user').order_by('stage_name'), 'artist_stage_name_idx',
+        ),
+        'admin trabajos por tipo': (
+            MediaJob.objects.filter(kind='media_variants').order_by('-pk'), 'mediajob_kind_id_idx',
+        ),
+        'admin trabajos por estado': (
+            MediaJob.objects.filter(status='failed').order_by('-pk'), 'mediajob_status_id_idx',
+        ),
+        'buscar dueños por ciudad': (search.build_queryset('owner', {'city': 'Rosario'}), 'owner_city_id_idx'),
+        'buscar dueños por provincia': (
+            search.build_queryset('owner', {'province': 'Córdoba'}), 'owner_province_id_idx',
+        ),
+        'buscar artistas por ciudad': (
+            search.build_queryset('artist', {'city': 'Rosario'}), 'artist_location_id_idx',
+        ),
+        'buscar artistas por categoría': (
+            search.build_queryset('artist', {'category': 'dj'}), 'artist_category_id_idx',
+        ),
+        'buscar artistas por calificación': (
+            search.paginate_by_rating(search.build_queryset('artist', {}), '3.5_100')[0],
+            'artist_rating_id_idx',
+        ),
+        'buscar artistas cerca': (
+            geo.candidates(search.build_queryset('artist', {}), -34.6, -58.4, 10), 'artist_geohash_idx',
+        ),
+        'buscar espacios cerca': (
+            geo.candidates(search.build_queryset('owner', {}), -34.6, -58.4, 10), 'owner_geohash_idx',
+        ),
+        'medios del perfil': (ProfileMedia.objects.filter(user_id=1), None),
+        'worker: reclamar trabajos': (
+            MediaJob.objects.filter(status='pending', run_after__lte=now).order_by('run_after', 'id'),
+            'mediajob_status_run_idx',
+        ),
+        'worker: trabajos colgados': (
+            MediaJob.objects.filter(status='running', updated_at__lt=now - timedelta(minutes=10)),
+            'mediajob_status_updated_idx',
+        ),
+        'bandeja de mensajes': (
+            ConversationMember.objects.filter(user_id=1, last_message_id__gt=0, last_message_id__lt=100)
+            .order_by('-last_message_id'),
+            'member_user_last_msg_idx',
+        ),
+        'hilo de mensajes': (
+            Message.objects.filter(conversation_id=1, id__lt=100).order_by('-id'), 'message_conversation_id_idx',
+        ),
+        'solicitudes del espacio por estado': (
+            ContractRequest.objects.filter(venue_id=1, status='pending').order_by('-id'),
+            'contract_venue_status_id_idx',
+        ),
+        'solicitudes del artista por estado': (
+            ContractRequest.objects.filter(artist_id=1, status='pending').order_by('-id'),
+            'contract_artist_status_id_idx',
+        ),
+        'fechas superpuestas del espacio': (
+            overlapping(ContractRequest.objects.filter(venue_id=1), now, now + timedelta(hours=2)),
+            'contract_venue_start_idx',
+        ),
+        'fechas superpuestas del artista': (
+            overlapping(ContractRequest.objects.filter(artist_id=1), now, now + timedelta(hours=2)),
+            'contract_artist_start_idx',
+        ),
+        'reseñas del perfil': (
+            Review.objects.filter(subject_id=1, id__lt=100).order_by('-id'), 'review_subject_id_idx',
+        ),
+        'subidas abiertas del usuario': (UploadSession.objects.filter(user_id=1, status='open'), None),
+        'purgar sesiones': (Session.objects.filter(expire_date__lt=now), None),
+        'purgar baldes de login': (ThrottleBucket.objects.filter(updated_at__lt=0), None),
+        'purgar subidas abandonadas': (
+            UploadSession.objects.filter(status='open', updated_at__lt=now), 'upload_status_updated_idx',
+        ),
+    }
+
+
+# Recorridos completos de una tabla (sin índice) en el plan de cada motor
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+TEMP_SORT = {
+    'sqlite': 'USE TEMP B-TREE FOR ORDER BY',
+    'postgresql': 'Sort Key',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre EXPLAIN sobre las consultas principales de la app y del admin "
+        "y falla si alguna recorre una tabla completa o deja de usar su índice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Mostrar el plan de cada consulta.")
+        parser.add_argument('--strict-sort', action='store_true',
+                            help="Fallar también si alguna ordena en memoria.")
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in FULL_SCAN:
+            raise CommandError(f"verificar_indices no sabe leer los planes de {vendor}.")
+
+        failures = []
+        for name, (queryset, index) in access_paths().items():
+            plan = queryset.explain()
+            scans = FULL_SCAN[vendor].findall(plan)
+            missing_index = index is not None and index not in plan
+            sorts = TEMP_SORT[vendor] in plan
+
+            problems = []
+            if scans:
+                problems.append(f"recorre {', '.join(scans)}")
+            if missing_index:
+                problems.append(f"no usa {index}")
+            if sorts:
+                problems.append("ordena en memoria")
+
+            failed = scans or missing_index or (sorts and options['strict_sort'])
+            if failed:
+                failures.append(name)
+                status = self.style.ERROR('FALLA')
+            elif sorts:
+                status = self.style.WARNING('ORDENA')
+            else:
+                status = self.style.SUCCESS('OK')
+            detail = f" ({'; '.join(problems)})" if problems else ''
+            self.stdout.write(f"{status:>6}  {name}{detail}")
+            if options['verbose_plans'] or failed:
+                for line in plan.splitlines():
+                    self.stdout.write(f"        {line}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} consultas sin índice: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Todas las consultas usan índices."))
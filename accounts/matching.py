@@ -0,0 +1,212 @@
+from array import array
+from collections import defaultdict
+
+from .availability import MINUTES_PER_DAY
+from .fulltext import fold
+from .models import AvailabilitySlot, EstablishmentOwner, ArtistEntrepreneur
+
+
+# -------------------------
+# Emparejamiento de espacios con artistas
+# -------------------------
+# Los horarios semanales se discretizan en franjas de SLOT_MINUTES. Para cada
+# localidad se guarda, por franja, un entero cuyo bit j indica si el artista
+# j está libre (índice "bit-sliced"). El puntaje de todos los artistas de la
+# localidad contra un espacio se obtiene sumando esas columnas con un
+# sumador de planos de bits: cada operación procesa miles de artistas a la
+# vez, sin bucles de Python por pareja ni objetos del ORM. El top-k se elige
+# recorriendo los planos de bits del más significativo al menos.
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+EXPERIENCE_BITS = 5  # desempate: años de experiencia, hasta 31
+DEFAULT_TOP = 10
+
+
+def slot_range(day, start, end):
+    """Franjas [desde, hasta) que ocupa un rango de AvailabilitySlot."""
+    first = day * SLOTS_PER_DAY + start // SLOT_MINUTES
+    last = day * SLOTS_PER_DAY - (-end // SLOT_MINUTES)  # redondeo hacia arriba
+    return first, last
+
+
+def load_ranges(kind, user_ids=None):
+    """user_id -> lista de rangos de franjas, leída de AvailabilitySlot."""
+    slots = AvailabilitySlot.objects.filter(kind=kind)
+    if user_ids is not None:
+        slots = slots.filter(user_id__in=user_ids)
+    result = defaultdict(list)
+    for user_id, day, start, end in slots.values_list('user_id', 'day', 'start_minute', 'end_minute').iterator():
+        result[user_id].append(slot_range(day, start, end))
+    return result
+
+
+def ranges_mask(ranges):
+    mask = 0
+    for first, last in ranges:
+        mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+
+def indexes_to_int(indexes, size):
+    """Entero con los bits `indexes` en 1 (armado sobre un bytearray)."""
+    buffer = bytearray((size + 7) // 8)
+    for idx in indexes:
+        buffer[idx >> 3] |= 1 << (idx & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def set_bits(value):
+    """Posiciones de los bits en 1 de `value`."""
+    positions = []
+    while value:
+        low = value & -value
+        positions.append(low.bit_length() - 1)
+        value ^= low
+    return positions
+
+
+def add_to_planes(planes, column):
+    """Suma `column` (0/1 por artista) al contador bit-sliced `planes`."""
+    carry = column
+    for i, plane in enumerate(planes):
+        planes[i] = plane ^ carry
+        carry &= plane
+        if not carry:
+            return
+    planes.append(carry)
+
+
+def top_k_members(planes, universe, k):
+    """
+    Conjunto (como entero) de los k miembros con mayor valor, dados los
+    planos de bits del más al menos significativo.
+    """
+    greater, equal = 0, universe
+    for plane in planes:
+        candidate = greater | (equal & plane)
+        count = candidate.bit_count()
+        if count > k:
+            equal &= plane
+        elif count < k:
+            greater = candidate
+            equal &= ~plane
+        else:
+            return candidate
+    # Empates en el umbral: se completa con los de menor índice (menor user_id)
+    for position in set_bits(equal)[:k - greater.bit_count()]:
+        greater |= 1 << position
+    return greater
+
+
+class LocalityIndex:
+    """Artistas de una misma localidad, en arreglos paralelos."""
+
+    def __init__(self):
+        self.user_ids = array('q')
+        self.experience = array('b')
+        self.masks = []
+        self.columns = defaultdict(list)
+
+    def add(self, user_id, experience, ranges):
+        idx = len(self.user_ids)
+        self.user_ids.append(user_id)
+        self.experience.append(min(max(experience or 0, 0), (1 << EXPERIENCE_BITS) - 1))
+        self.masks.append(ranges_mask(ranges))
+        for first, last in ranges:
+            for slot in range(first, last):
+                self.columns[slot].append(idx)
+
+    def freeze(self):
+        size = len(self.user_ids)
+        self.columns = {
+            slot: indexes_to_int(indexes, size) for slot, indexes in self.columns.items()
+        }
+        self.universe = (1 << size) - 1
+        # Planos de la experiencia, del más al menos significativo
+        self.experience_planes = [
+            indexes_to_int((i for i, years in enumerate(self.experience) if years >> b & 1), size)
+            for b in reversed(range(EXPERIENCE_BITS))
+        ]
+
+    def rank(self, venue_bits, venue_mask, top_k):
+        """Top-k (minutos, experiencia, user_id) para el horario de un espacio."""
+        planes = []
+        for slot in venue_bits:
+            column = self.columns.get(slot)
+            if column:
+                add_to_planes(planes, column)
+        if not planes:
+            return []
+
+        members = top_k_members(planes[::-1] + self.experience_planes, self.universe, top_k)
+        ranked = []
+        for idx in set_bits(members):
+            slots = (self.masks[idx] & venue_mask).bit_count()
+            if slots:
+                ranked.append((slots * SLOT_MINUTES, self.experience[idx], self.user_ids[idx]))
+        return ranked
+
+
+class ArtistPool:
+    """Índices por localidad (ArtistEntrepreneur.location plegada)."""
+
+    def __init__(self, categories=None):
+        queryset = ArtistEntrepreneur.objects.filter(user__is_active=True)
+        if categories:
+            queryset = queryset.filter(category__in=categories)
+
+        ranges = load_ranges('artist')
+        self.localities = defaultdict(LocalityIndex)
+        # El índice de cada artista sigue el orden de user_id: los empates
+        # completos se resuelven igual en top_k_members() y en rank()
+        rows = queryset.order_by('user_id').values_list('user_id', 'location', 'experience_years').iterator()
+        for user_id, location, experience in rows:
+            artist_ranges = ranges.get(user_id)
+            locality = fold(location).strip()
+            if artist_ranges and locality:
+                self.localities[locality].add(user_id, experience, artist_ranges)
+        for index in self.localities.values():
+            index.freeze()
+
+    def rank(self, localities, venue_ranges, top_k):
+        venue_mask = ranges_mask(venue_ranges)
+        venue_bits = set_bits(venue_mask)
+        candidates = []
+        for locality in localities:
+            index = self.localities.get(locality)
+            if index:
+                candidates.extend(index.rank(venue_bits, venue_mask, top_k))
+        candidates.sort(key=lambda row: (-row[0], -row[1], row[2]))
+        return [(user_id, minutes) for minutes, _, user_id in candidates[:top_k]]
+
+
+def rank_artists_for_venues(venues=None, top_k=DEFAULT_TOP, categories=None):
+    """
+    Devuelve {user_id del espacio: [(user_id del artista, minutos), ...]}
+    con los `top_k` artistas de la misma ciudad o provincia (según
+    ArtistEntrepreneur.location) cuya disponibilidad más se superpone con el
+    horario del espacio. Desempata por años de experiencia y después por
+    user_id (el perfil más antiguo primero).
+
+    `venues` es un queryset de EstablishmentOwner (por defecto, todos).
+    """
+    pool = ArtistPool(categories)
+
+    if venues is None:
+        venues = EstablishmentOwner.objects.all()
+    venues = venues.filter(user__is_active=True)
+    venue_ranges = load_ranges('owner', venues.values('user_id'))
+
+    results = {}
+    cache = {}  # muchos espacios comparten ciudad y horario
+    for user_id, city, province in venues.values_list('user_id', 'city', 'province').iterator():
+        ranges = tuple(sorted(venue_ranges.get(user_id, ())))
+        localities = tuple(sorted({fold(city).strip(), fold(province).strip()} - {''}))
+        if not ranges or not localities:
+            results[user_id] = []
+            continue
+        key = (localities, ranges)
+        if key not in cache:
+            cache[key] = pool.rank(localities, ranges, top_k)
+        results[user_id] = cache[key]
+    return results
@@ -0,0 +1,371 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.text import Truncator
+
+from .models import Conversation, ConversationMember, Inbox, Message
+from .search import MAX_PAGE_SIZE, parse_cursor
+
+
+# -------------------------
+# Mensajería interna
+# -------------------------
+# La bandeja y los no leídos salen de filas denormalizadas que se actualizan
+# al enviar (ConversationMember por conversación, Inbox por usuario): leer
+# la bandeja es un rango del índice (user, last_message_id) y el total de no
+# leídos una lectura por clave primaria, sin COUNT(*) por conversación.
+INBOX_PAGE_SIZE = 20
+THREAD_PAGE_SIZE = 30
+PREVIEW_LENGTH = 140
+
+
+class MessagingError(Exception):
+    pass
+
+
+class MessagePage(NamedTuple):
+    results: list
+    next_cursor: str
+
+
+def pair(user_a_id, user_b_id):
+    return (user_a_id, user_b_id) if user_a_id < user_b_id else (user_b_id, user_a_id)
+
+
+def find_conversation(user, other):
+    low, high = pair(user.pk, other.pk)
+    return Conversation.objects.filter(user_low_id=low, user_high_id=high).first()
+
+
+def send_message(sender, recipient, body):
+    """
+    Guarda el mensaje y actualiza los contadores en la misma transacción.
+    Los incrementos son UPDATE con F(): dos envíos simultáneos no se pisan.
+    """
+    body = body.strip()
+    if not body:
+        raise MessagingError("El mensaje está vacío.")
+    if sender.pk == recipient.pk:
+        raise MessagingError("No podés enviarte mensajes a vos mismo.")
+    if not recipient.is_active:
+        raise MessagingError("Ese usuario no puede recibir mensajes.")
+
+    low, high = pair(sender.pk, recipient.pk)
+    with transaction.atomic():
+        conversation, created = Conversation.objects.get_or_create(user_low_id=low, user_high_id=high)
+        if created:
+            ConversationMember.objects.bulk_create([
+                ConversationMember(conversation=conversation, user_id=sender.pk, peer_id=recipient.pk),
+                ConversationMember(conversation=conversation, user_id=recipient.pk, peer_id=sender.pk),
+            ])
+            Inbox.objects.bulk_create(
+                [Inbox(user_id=sender.pk), Inbox(user_id=recipient.pk)], ignore_conflicts=True
+            )
+
+        message = Message.objects.create(conversation=conversation, sender=sender, body=body)
+        last = {
+            'last_message_id': message.pk,
+            'last_message_at': message.created_at,
+            'last_message_preview': Truncator(body).chars(PREVIEW_LENGTH),
+        }
+        Conversation.objects.filter(pk=conversation.pk).update(
+            message_count=F('message_count') + 1, last_message_at=message.created_at
+        )
+        members = ConversationMember.objects.filter(conversation=conversation)
+        # Responder no marca como leído lo recibido: last_read_message_id solo
+        # lo mueve mark_read(), y rebuild_counters() cuenta desde ahí
+        members.filter(user_id=sender.pk).update(**last)
+
+        # Si no tenía nada sin leer, la conversación pasa a contar como no leída
+        first_unread = members.filter(user_id=recipient.pk, unread_count=0).update(unread_count=1, **last)
+        if not first_unread:
+            members.filter(user_id=recipient.pk).update(unread_count=F('unread_count') + 1, **last)
+        Inbox.objects.filter(user_id=recipient.pk).update(
+            unread_messages=F('unread_messages') + 1,
+            unread_conversations=F('unread_conversations') + first_unread,
+            last_message_id=message.pk,
+        )
+        Inbox.objects.filter(user_id=sender.pk).update(last_message_id=message.pk)
+
+        transaction.on_commit(lambda: broker.publish([sender.pk, recipient.pk]))
+    return message
+
+
+def mark_read(member):
+    """Marca la conversación como leída. No escribe nada si ya lo estaba."""
+    if not member.unread_count:
+        return
+    with transaction.atomic():
+        current = ConversationMember.objects.select_for_update().get(pk=member.pk)
+        unread = current.unread_count
+        if not unread:
+            return
+        ConversationMember.objects.filter(pk=member.pk).update(
+            unread_count=0, last_read_message_id=current.last_message_id
+        )
+        Inbox.objects.filter(user_id=member.user_id).update(
+            unread_messages=F('unread_messages') - unread,
+            unread_conversations=F('unread_conversations') - 1,
+        )
+        transaction.on_commit(lambda: broker.publish([member.user_id]))
+    member.unread_count = 0
+    member.last_read_message_id = current.last_message_id
+
+
+def inbox_page(user, cursor=None, limit=INBOX_PAGE_SIZE):
+    """Conversaciones del usuario, la más reciente primero (cursor = last_message_id)."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    queryset = (
+        ConversationMember.objects
+        .filter(user=user, last_message_id__gt=0)
+        .select_related('peer')
+        .order_by('-last_message_id')
+    )
+    before = parse_cursor(cursor)
+    if before is not None:
+        queryset = queryset.filter(last_message_id__lt=before)
+    rows = list(queryset[:limit + 1])
+    next_cursor = ''
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1].last_message_id)
+    return MessagePage(results=rows, next_cursor=next_cursor)
+
+
+def thread_page(conversation, cursor=None, limit=THREAD_PAGE_SIZE):
+    """
+    Últimos mensajes del hilo en orden cronológico; next_cursor pide los
+    anteriores (id < cursor), por el índice (conversation, id).
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    queryset = Message.objects.filter(conversation=conversation).order_by('-id')
+    before = parse_cursor(cursor)
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+    rows = list(queryset[:limit + 1])
+    next_cursor = ''
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1].pk)
+    rows.reverse()
+    return MessagePage(results=rows, next_cursor=next_cursor)
+
+
+def inbox_state(user_id):
+    row = Inbox.objects.filter(user_id=user_id).values(
+        'unread_messages', 'unread_conversations', 'last_message_id'
+    ).first()
+    return row or {'unread_messages': 0, 'unread_conversations': 0, 'last_message_id': 0}
+
+
+def rebuild_counters(batch_size=500):
+    """
+    Recalcula los contadores denormalizados desde Message (para reparar
+    datos cargados a mano o restaurados). Va por lotes de conversaciones;
+    devuelve la cantidad de conversaciones recalculadas.
+    """
+    conversations = Conversation.objects.order_by('id')
+    last_id = total = 0
+    while True:
+        batch = list(conversations.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1]
+        stats = {
+            row['conversation_id']: row
+            for row in Message.objects.filter(conversation_id__in=batch)
+            .values('conversation_id').annotate(count=Count('id'), last=Max('id'))
+        }
+        last_messages = Message.objects.in_bulk([row['last'] for row in stats.values()])
+        unread = Message.objects.filter(
+            conversation_id=OuterRef('conversation_id'), id__gt=OuterRef('last_read_message_id')
+        ).exclude(sender_id=OuterRef('user_id')).values('conversation_id').annotate(n=Count('id')).values('n')
+        members = list(
+            ConversationMember.objects.filter(conversation_id__in=batch)
+            .annotate(real_unread=Coalesce(Subquery(unread), 0))
+        )
+
+        conversation_rows = []
+        for conversation_id in batch:
+            row = stats.get(conversation_id)
+            last = last_messages[row['last']] if row else None
+            conversation_rows.append(Conversation(
+                pk=conversation_id,
+                message_count=row['count'] if row else 0,
+                last_message_at=last.created_at if last else None,
+            ))
+        for member in members:
+            row = stats.get(member.conversation_id)
+            last = last_messages[row['last']] if row else None
+            member.unread_count = member.real_unread
+            member.last_message_id = last.pk if last else 0
+            member.last_message_at = last.created_at if last else None
+            member.last_message_preview = Truncator(last.body).chars(PREVIEW_LENGTH) if last else ''
+
+        with transaction.atomic():
+            Conversation.objects.bulk_update(conversation_rows, ['message_count', 'last_message_at'])
+            ConversationMember.objects.bulk_update(members, [
+                'unread_count', 'last_message_id', 'last_message_at', 'last_message_preview'
+            ])
+        total += len(batch)
+
+    # Totales por usuario, sumando las filas ya corregidas
+    totals = (
+        ConversationMember.objects.values('user_id')
+        .annotate(
+            unread_messages=Sum('unread_count'),
+            unread_conversations=Count('id', filter=Q(unread_count__gt=0)),
+            last_message_id=Max('last_message_id'),
+        )
+        .order_by('user_id')
+    )
+    with transaction.atomic():
+        Inbox.objects.all().delete()
+        Inbox.objects.bulk_create([Inbox(**row) for row in totals.iterator(chunk_size=batch_size)], batch_size=batch_size)
+    return total
+
+
+# -------------------------
+# Eventos en vivo (Server-Sent Events)
+# -------------------------
+# Cada bandeja abierta es una conexión SSE esperando un asyncio.Event, sin
+# thread propio: bajo ASGI miles de conexiones cuestan memoria, no
+# threads. El proceso que guarda un mensaje despierta a sus suscriptores al
+# hacer commit; para los mensajes guardados en otros procesos hay un solo
+# sondeo por proceso (no por conexión) que lee los ids nuevos de Message.
+# Al despertar, cada conexión lee su Inbox (clave primaria) y manda el
+# estado solo si cambió.
+def poll_interval():
+    return getattr(settings, 'MESSAGING_POLL_INTERVAL', 1.0)
+
+
+def stream_seconds():
+    return getattr(settings, 'MESSAGING_STREAM_SECONDS', 5 * 60)
+
+
+HEARTBEAT_SECONDS = 25  # comentario SSE para que los proxies no corten la conexión
+RETRY_MS = 3000
+POLL_BATCH = 1000
+
+
+def recipients_since(cursor):
+    """(nuevo cursor, ids de usuario) de los mensajes con id > cursor."""
+    if cursor is None:
+        last = Message.objects.order_by('-id').values_list('id', flat=True).first()
+        return last or 0, set()
+    rows = list(
+        Message.objects.filter(id__gt=cursor).order_by('id')
+        .values_list('id', 'conversation_id')[:POLL_BATCH]
+    )
+    if not rows:
+        return cursor, set()
+    conversation_ids = {conversation_id for _, conversation_id in rows}
+    user_ids = set(
+        ConversationMember.objects.filter(conversation_id__in=conversation_ids).values_list('user_id', flat=True)
+    )
+    return rows[-1][0], user_ids
+
+
+class InboxBroker:
+    """
+    Suscripciones de un proceso: user_id -> eventos de las conexiones
+    abiertas. publish() se puede llamar desde cualquier thread (los
+    on_commit corren en el thread de la vista o del ORM async).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+        self._pollers = {}
+        self._cursor = None
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            self._waiters[user_id].add(waiter)
+            if loop not in self._pollers:
+                self._pollers[loop] = loop.create_task(self._poll(loop))
+        return waiter
+
+    def unsubscribe(self, user_id, waiter):
+        with self._lock:
+            waiters = self._waiters.get(user_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[user_id]
+
+    def publish(self, user_ids):
+        with self._lock:
+            waiters = [waiter for user_id in user_ids for waiter in self._waiters.get(user_id, ())]
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def connections(self):
+        with self._lock:
+            return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def _poll(self, loop):
+        try:
+            while True:
+                await asyncio.sleep(poll_interval())
+                with self._lock:
+                    if not any(w[0] is loop for waiters in self._waiters.values() for w in waiters):
+                        self._pollers.pop(loop, None)
+                        return
+                self._cursor, user_ids = await sync_to_async(recipients_since)(self._cursor)
+                if user_ids:
+                    self.publish(user_ids)
+        except asyncio.CancelledError:
+            with self._lock:
+                self._pollers.pop(loop, None)
+            raise
+
+
+broker = InboxBroker()
+
+
+def sse_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def inbox_events(user_id, seconds=None):
+    """
+    Stream SSE de la bandeja de `user_id`: el estado actual al conectar y
+    después cada cambio. Corta a los `seconds` (MESSAGING_STREAM_SECONDS) y
+    el navegador reconecta solo: Django 4.2 no se entera si el cliente se
+    fue, así una conexión abandonada no queda abierta para siempre.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (seconds if seconds is not None else stream_seconds())
+    waiter = broker.subscribe(user_id)
+    event = waiter[1]
+    sent = None
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            event.clear()
+            state = await sync_to_async(inbox_state)(user_id)
+            if state != sent:
+                yield sse_event('inbox', state)
+                sent = state
+            # Sin consultas mientras no haya novedades: solo el latido
+            while not event.is_set():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), min(HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+    finally:
+        broker.unsubscribe(user_id, waiter)
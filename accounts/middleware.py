@@ -0,0 +1,236 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger('accounts.queries')
+
+
+# -------------------------
+# Presupuesto de consultas por vista
+# -------------------------
+# Cuenta las consultas SQL de cada request (y su tiempo) con un
+# execute_wrapper, detecta consultas con la misma forma repetidas (N+1) y
+# compara contra QUERY_BUDGETS = {'nombre_de_vista': máximo}.
+#
+# El wrapper queda instalado en cada conexión y anota en el QueryRecorder
+# del request actual, que viaja en una ContextVar: sync_to_async copia el
+# contexto al thread donde corre el ORM async, así que las consultas de las
+# vistas async (y las de sus respuestas en streaming) también se cuentan.
+# Con QUERY_BUDGET_STRICT=True (pensado para tests, vía override_settings)
+# pasarse del presupuesto levanta QueryBudgetExceeded; si no, solo se loguea.
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+DEFAULT_REPEAT_THRESHOLD = 3
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    """La consulta sin la cantidad de parámetros de los IN (...)."""
+    return IN_LIST_RE.sub('(...)', sql)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+
+current_recorder = ContextVar('query_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(**kwargs):
+    """Pone record_query en las conexiones del thread (idempotente)."""
+    for conn in connections.all():
+        if record_query not in conn.execute_wrappers:
+            conn.execute_wrappers.append(record_query)
+
+
+# Conexiones nuevas; las que ya estaban abiertas se cubren en cada request
+connection_created.connect(install_recorder, dispatch_uid='accounts.query_budget')
+ainstall_recorder = sync_to_async(install_recorder)
+
+
+# Estadísticas acumuladas del proceso (las muestra consultas_resumen)
+STATS = {}
+STATS_LOCK = threading.Lock()
+
+
+def record_stats(view_name, recorder, repeated, over_budget):
+    with STATS_LOCK:
+        stats = STATS.setdefault(view_name, {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_ms': 0.0,
+            'n_plus_one': 0, 'over_budget': 0,
+        })
+        stats['requests'] += 1
+        stats['queries'] += recorder.count
+        stats['max_queries'] = max(stats['max_queries'], recorder.count)
+        stats['sql_ms'] += recorder.duration * 1000
+        stats['n_plus_one'] += bool(repeated)
+        stats['over_budget'] += over_budget
+
+
+def stats_summary():
+    with STATS_LOCK:
+        return {
+            view: {
+                **stats,
+                'avg_queries': round(stats['queries'] / stats['requests'], 2),
+                'sql_ms': round(stats['sql_ms'], 2),
+                'budget': settings.QUERY_BUDGETS.get(view),
+            }
+            for view, stats in sorted(STATS.items())
+        }
+
+
+class QueryBudgetMiddleware:
+    # Sync y async: bajo ASGI un middleware solo-sync obliga a Django a
+    # pasar cada request por un thread y anula las vistas async
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install_recorder()
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, recorder, response)
+
+    async def __acall__(self, request):
+        # El ORM async consulta desde el thread de sync_to_async, no desde acá
+        await ainstall_recorder()
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        if response.streaming and response.is_async:
+            # Las vistas async mandan el fragmento con consultas en streaming:
+            # se cuenta y se loguea cuando termina de salir
+            chunks = aiter(response.streaming_content)
+            response.streaming_content = self.record_stream(request, recorder, response, chunks)
+            return response
+        return self.finish(request, recorder, response)
+
+    async def record_stream(self, request, recorder, response, chunks):
+        while True:
+            token = current_recorder.set(recorder)
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                break
+            finally:
+                current_recorder.reset(token)
+            yield chunk
+        self.finish(request, recorder, response)
+
+    def finish(self, request, recorder, response):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'sin_vista'
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+        repeated = recorder.repeated(threshold)
+        over_budget = budget is not None and recorder.count > budget
+
+        record_stats(view_name, recorder, repeated, over_budget)
+        # Una línea por request, en formato clave=valor para poder scrapearla.
+        # En DEBUG: con ACCOUNTS_LOG_LEVEL=DEBUG sale por consola.
+        logger.debug(
+            'view=%s status=%s queries=%d sql_ms=%.1f repeated=%d budget=%s',
+            view_name, response.status_code, recorder.count, recorder.duration * 1000,
+            len(repeated), budget if budget is not None else '-',
+        )
+        for shape, n in repeated.items():
+            logger.warning('view=%s n_plus_one=%d sql=%s', view_name, n, shape)
+
+        if over_budget:
+            message = f"{view_name}: {recorder.count} consultas (presupuesto {budget})"
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        if settings.DEBUG and not response.streaming:
+            response['X-Query-Count'] = str(recorder.count)
+        return response
+
+
+# -------------------------
+# Rol y perfil del usuario
+# -------------------------
+class RoleProfile:
+    """Rol de request.user y su perfil, sacados de la misma fila que el usuario."""
+
+    def __init__(self, user):
+        self.user_type = user.user_type if user.is_authenticated else None
+        self.profile = user.role_profile if user.is_authenticated else None
+
+    @property
+    def is_owner(self):
+        return self.user_type == 'owner'
+
+    @property
+    def is_artist(self):
+        return self.user_type == 'artist'
+
+    @property
+    def complete(self):
+        return self.profile is not None
+
+
+class RoleProfileMiddleware:
+    """
+    request.role_profile: perezoso como request.user, así los requests que
+    no lo usan no cargan al usuario. Va después de AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.role_profile = SimpleLazyObject(lambda: RoleProfile(request.user))
+        return self.get_response(request)
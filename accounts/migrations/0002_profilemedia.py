@@ -1,25 +1,17 @@
 # Generated by Django 4.2.7 on 2025-08-29 00:24
 
-from django.conf import settings
-from django.db import migrations, models
-import django.db.models.deletion
+from django.db import migrations
 
 
 class Migration(migrations.Migration):
+    """
+    ProfileMedia ya se crea en 0001_initial. Esta migración quedó vacía para
+    que `migrate` funcione sobre una base nueva (antes fallaba con
+    "table accounts_profilemedia already exists").
+    """
 
     dependencies = [
         ('accounts', '0001_initial'),
     ]
 
-    operations = [
-        migrations.CreateModel(
-            name='ProfileMedia',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('media_type', models.CharField(choices=[('image', 'Imagen'), ('video', 'Video')], default='image', max_length=5)),
-                ('file', models.FileField(upload_to='profile_media/')),
-                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
-                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media', to=settings.AUTH_USER_MODEL)),
-            ],
-        ),
-    ]
+    operations = []
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:31
+
+import json
+
+from django.db import migrations, models
+
+
+def clean_schedules(apps, schema_editor):
+    # La columna era texto libre: lo que no es un objeto JSON no pasa el
+    # cambio de tipo (CHECK JSON_VALID en SQLite, ::jsonb en Postgres). Todavía
+    # es NOT NULL, así que queda como el JSON 'null' y se pasa a NULL después.
+    EstablishmentOwner = apps.get_model('accounts', 'EstablishmentOwner')
+    for pk, schedule in EstablishmentOwner.objects.values_list('pk', 'schedule').iterator():
+        try:
+            valid = isinstance(json.loads(schedule), dict)
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            EstablishmentOwner.objects.filter(pk=pk).update(schedule='null')
+
+
+def null_schedules(apps, schema_editor):
+    EstablishmentOwner = apps.get_model('accounts', 'EstablishmentOwner')
+    # schedule=None en un JSONField es el JSON null; el update escribe NULL
+    EstablishmentOwner.objects.filter(schedule=None).update(schedule=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_profilemedia'),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_schedules, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='establishmentowner',
+            name='schedule',
+            field=models.JSONField(blank=True, null=True, verbose_name='Horarios de Funcionamiento'),
+        ),
+        migrations.RunPython(null_schedules, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='artistentrepreneur',
+            index=models.Index(fields=['category', 'id'], name='artist_category_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artistentrepreneur',
+            index=models.Index(fields=['location', 'id'], name='artist_location_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artistentrepreneur',
+            index=models.Index(fields=['neighborhood', 'id'], name='artist_nbhd_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='establishmentowner',
+            index=models.Index(fields=['city', 'id'], name='owner_city_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='establishmentowner',
+            index=models.Index(fields=['province', 'id'], name='owner_province_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='establishmentowner',
+            index=models.Index(fields=['business_type', 'id'], name='owner_btype_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='establishmentowner',
+            index=models.Index(fields=['capacity', 'id'], name='owner_capacity_id_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Copia de accounts/availability.py al momento de esta migración: las
+# migraciones no importan código de la app, que puede cambiar después.
+DAY_INDEX = {
+    day: idx for idx, day in enumerate(["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"])
+}
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value):
+    if not isinstance(value, str):
+        return None
+    try:
+        hours, minutes = (int(part) for part in value.split(':')[:2])
+    except ValueError:
+        return None
+    total = hours * 60 + minutes
+    return total if 0 <= minutes < 60 and 0 <= total <= MINUTES_PER_DAY else None
+
+
+def schedule_to_slots(schedule):
+    """{"Viernes": {"from": "21:00", "to": "02:00"}} -> [(4, 1260, 1440), (5, 0, 120)]"""
+    if not isinstance(schedule, dict):
+        return []
+    slots = []
+    for day_name, times in schedule.items():
+        day = DAY_INDEX.get(day_name)
+        if day is None or not isinstance(times, dict):
+            continue
+        start, end = to_minutes(times.get('from')), to_minutes(times.get('to'))
+        if start is None or end is None:
+            continue
+        start, end = start % MINUTES_PER_DAY, end % MINUTES_PER_DAY
+        if end > start:
+            slots.append((day, start, end))
+            continue
+        # Termina al día siguiente (o son 24 horas si son iguales)
+        slots.append((day, start, MINUTES_PER_DAY))
+        if end > 0:
+            slots.append(((day + 1) % 7, 0, end))
+    return slots
+
+
+def backfill_slots(apps, schema_editor):
+    AvailabilitySlot = apps.get_model('accounts', 'AvailabilitySlot')
+    sources = [
+        ('owner', apps.get_model('accounts', 'EstablishmentOwner'), 'schedule'),
+        ('artist', apps.get_model('accounts', 'ArtistEntrepreneur'), 'availability'),
+    ]
+    for kind, model, field in sources:
+        slots = [
+            AvailabilitySlot(user_id=user_id, kind=kind, day=day, start_minute=start, end_minute=end)
+            for user_id, schedule in model.objects.values_list('user_id', field).iterator()
+            for day, start, end in schedule_to_slots(schedule)
+        ]
+        AvailabilitySlot.objects.bulk_create(slots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_profilesearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilitySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('owner', 'Dueño de Establecimiento'), ('artist', 'Artista/Emprendedor')], max_length=10)),
+                ('day', models.PositiveSmallIntegerField()),
+                ('start_minute', models.PositiveSmallIntegerField()),
+                ('end_minute', models.PositiveSmallIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'day', 'start_minute', 'end_minute'], name='slot_kind_day_range_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:45
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_image',
+            field=models.ImageField(blank=True, storage=accounts.storage.ContentAddressedStorage(), upload_to='profiles/', verbose_name='Imagen de Perfil'),
+        ),
+        migrations.AlterField(
+            model_name='mediavariant',
+            name='file',
+            field=models.FileField(max_length=255, storage=accounts.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='profilemedia',
+            name='file',
+            field=models.FileField(storage=accounts.storage.ContentAddressedStorage(), upload_to='profile_media/'),
+        ),
+    ]
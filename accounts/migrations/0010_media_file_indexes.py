@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:46
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_storedblob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_image',
+            field=models.ImageField(blank=True, db_index=True, storage=accounts.storage.ContentAddressedStorage(), upload_to='profiles/', verbose_name='Imagen de Perfil'),
+        ),
+        migrations.AlterField(
+            model_name='mediavariant',
+            name='file',
+            field=models.FileField(db_index=True, max_length=255, storage=accounts.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='profilemedia',
+            name='file',
+            field=models.FileField(db_index=True, storage=accounts.storage.ContentAddressedStorage(), upload_to='profile_media/'),
+        ),
+    ]
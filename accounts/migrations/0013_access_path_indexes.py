@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_throttlebucket'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='mediajob',
+            name='mediajob_status_run_idx',
+        ),
+        migrations.AddIndex(
+            model_name='artistentrepreneur',
+            index=models.Index(fields=['stage_name'], name='artist_stage_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['user_type', 'username'], name='user_type_username_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_staff', True)), fields=['username'], name='user_staff_username_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['username'], name='user_inactive_username_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='establishmentowner',
+            index=models.Index(fields=['business_name'], name='owner_bname_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediajob',
+            index=models.Index(fields=['status', 'run_after', 'id'], name='mediajob_status_run_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediajob',
+            index=models.Index(fields=['status', 'updated_at'], name='mediajob_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediajob',
+            index=models.Index(fields=['status', 'id'], name='mediajob_status_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediajob',
+            index=models.Index(fields=['kind', 'id'], name='mediajob_kind_id_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_messaging'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField(verbose_name='Desde')),
+                ('ends_at', models.DateTimeField(verbose_name='Hasta')),
+                ('service_type', models.CharField(max_length=100, verbose_name='Tipo de Servicio')),
+                ('message', models.TextField(blank=True, verbose_name='Mensaje')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('accepted', 'Aceptada'), ('rejected', 'Rechazada'), ('cancelled', 'Cancelada')], default='pending', max_length=10)),
+                ('status_note', models.CharField(blank=True, max_length=200)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('artist', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='contract_requests', to='accounts.artistentrepreneur')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('venue', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='contract_requests', to='accounts.establishmentowner')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['venue', 'status', 'id'], name='contract_venue_status_id_idx'), models.Index(fields=['artist', 'status', 'id'], name='contract_artist_status_id_idx'), models.Index(fields=['venue', 'status', 'starts_at'], name='contract_venue_start_idx'), models.Index(fields=['artist', 'status', 'starts_at'], name='contract_artist_start_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='contractrequest',
+            constraint=models.CheckConstraint(check=models.Q(('ends_at__gt', models.F('starts_at'))), name='contract_range_valid'),
+        ),
+    ]
@@ -0,0 +1,158 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:31
+
+import csv
+import re
+import unicodedata
+from pathlib import Path
+
+from django.db import migrations, models
+
+
+# -------------------------
+# Copia de accounts/geo.py al momento de esta migración
+# -------------------------
+# Las migraciones no importan código de la app, que puede cambiar después.
+# Solo se lee el nomenclador; si cambió, `manage.py geocodificar_perfiles`
+# vuelve a ubicar todos los perfiles con el código actual.
+GAZETTEER_PATH = Path(__file__).resolve().parent.parent / 'data' / 'localidades.csv'
+KEY_RE = re.compile(r'[^a-z0-9]+')
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def place_key(text):
+    text = unicodedata.normalize('NFKD', (text or '').replace('.', ''))
+    return KEY_RE.sub(' ', ''.join(c for c in text if not unicodedata.combining(c)).lower()).strip()
+
+
+def load_gazetteer():
+    """(provincias, ciudades, barrios, barrios por nombre); los lugares son (ciudad, provincia, lat, lon)."""
+    provinces, cities, barrios, barrio_names = {}, {}, {}, {}
+    with open(GAZETTEER_PATH, encoding='utf-8', newline='') as fh:
+        for row in csv.DictReader(line for line in fh if not line.startswith('#')):
+            names = [row['nombre']] + [alias for alias in row['alias'].split('|') if alias]
+            if row['tipo'] == 'provincia':
+                for name in names:
+                    provinces.setdefault(place_key(name), row['nombre'])
+                continue
+            place = (row['ciudad'] or row['nombre'], row['provincia'], float(row['lat']), float(row['lon']))
+            for name in map(place_key, names):
+                if row['tipo'] == 'barrio':
+                    barrios.setdefault((place_key(place[0]), name), place)
+                    barrio_names.setdefault(name, []).append(place)
+                else:
+                    cities.setdefault(name, []).append(place)
+    return provinces, cities, barrios, barrio_names
+
+
+def geocode(gazetteer, city, province, neighborhood, address):
+    provinces, cities, barrios, barrio_names = gazetteer
+
+    def pick(candidates, province=''):
+        wanted = provinces.get(place_key(province)) if province else None
+        for place in candidates:
+            if wanted and place[1] == wanted:
+                return place
+        return candidates[0] if candidates else None
+
+    def find_city(name, province=''):
+        return pick(cities.get(place_key(name), []), province)
+
+    city_place = find_city(city, province) if place_key(city) else None
+    hints = [place_key(hint) for hint in [neighborhood, *address.split(',')[1:]]]
+    for hint in filter(None, hints):
+        if city_place is not None:
+            place = barrios.get((place_key(city_place[0]), hint))
+            nearby = find_city(hint, city_place[1])
+            if place is None and nearby is not None and nearby[1] == city_place[1]:
+                place = nearby
+        else:
+            place = pick(barrio_names.get(hint, []), province) or find_city(hint, province)
+        if place is not None:
+            return place
+    return city_place
+
+
+def encode(lat, lon, precision=GEOHASH_PRECISION):
+    bits = 5 * precision
+    lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+    i = min(max(int((lon + 180) / 360 * (1 << lon_bits)), 0), (1 << lon_bits) - 1)
+    j = min(max(int((lat + 90) / 180 * (1 << lat_bits)), 0), (1 << lat_bits) - 1)
+    value = 0
+    for bit in range(bits):
+        if bit % 2 == 0:
+            lon_bits -= 1
+            value = value << 1 | (i >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            value = value << 1 | (j >> lat_bits) & 1
+    return ''.join(BASE32[value >> 5 * k & 31] for k in reversed(range(precision)))
+
+
+def backfill_points(apps, schema_editor):
+    gazetteer = load_gazetteer()
+    for name in ('EstablishmentOwner', 'ArtistEntrepreneur'):
+        model = apps.get_model('accounts', name)
+        located = []
+        for profile in model.objects.iterator():
+            place = geocode(
+                gazetteer,
+                city=getattr(profile, 'city', '') or getattr(profile, 'location', ''),
+                province=getattr(profile, 'province', ''),
+                neighborhood=getattr(profile, 'neighborhood', ''),
+                address=getattr(profile, 'address', ''),
+            )
+            if place is not None:
+                profile.latitude, profile.longitude = place[2], place[3]
+                profile.geohash = encode(profile.latitude, profile.longitude)
+                located.append(profile)
+        model.objects.bulk_update(located, ['latitude', 'longitude', 'geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_reviews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artistentrepreneur',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='artistentrepreneur',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='artistentrepreneur',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='establishmentowner',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='establishmentowner',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='establishmentowner',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='artistentrepreneur',
+            index=models.Index(fields=['geohash'], name='artist_geohash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='establishmentowner',
+            index=models.Index(fields=['geohash'], name='owner_geohash_idx'),
+        ),
+        migrations.RunPython(backfill_points, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,14 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .storage import media_storage
 
 
 # -------------------------
@@ -31,6 +38,8 @@ class CustomUser(AbstractUser):
     dni = models.CharField(max_length=20, blank=True, verbose_name="DNI")
     profile_image = models.ImageField(
         upload_to='profiles/',
+        storage=media_storage,
+        db_index=True,  # accounts/serving.py busca por nombre de archivo
         blank=True,
         verbose_name="Imagen de Perfil"
     )
@@ -39,11 +48,105 @@ class CustomUser(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Login por usuario o email sin distinguir mayúsculas (accounts/backends.py)
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            # Filtros del admin, en el orden del changelist (username).
+            # Staff e inactivos son pocos: índices parciales con solo esas filas.
+            models.Index(fields=['user_type', 'username'], name='user_type_username_idx'),
+            models.Index(fields=['username'], condition=Q(is_staff=True), name='user_staff_username_idx'),
+            models.Index(fields=['username'], condition=Q(is_active=False), name='user_inactive_username_idx'),
+        ]
+
+    ROLE_PROFILES = {'owner': 'owner_profile', 'artist': 'artist_profile'}
+
+    @property
+    def role_profile(self):
+        """
+        Perfil de dueño o artista según user_type, o None si no lo completó.
+        Sin consultas si el usuario se cargó con select_related('owner_profile',
+        'artist_profile') (así lo carga accounts/backends.py).
+        """
+        relation = self.ROLE_PROFILES.get(self.user_type)
+        return getattr(self, relation, None) if relation else None
+
+
+# -------------------------
+# Calificaciones (agregados por perfil)
+# -------------------------
+# Prior del promedio bayesiano con el que se ordena por calificación: un
+# perfil con pocas reseñas queda cerca de RATING_PRIOR_MEAN hasta juntar
+# más de RATING_PRIOR_WEIGHT.
+RATING_PRIOR_MEAN = 3
+RATING_PRIOR_WEIGHT = 5
+RATING_FIELDS = (
+    'rating_count', 'rating_sum', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5', 'rating_score'
+)
+
+
+class RatingAggregate(models.Model):
+    """
+    Cantidad, suma e histograma de las reseñas del perfil, mantenidos por
+    accounts/reviews.py en la misma transacción que la reseña: el perfil
+    público y el buscador los leen de la fila, sin AVG/COUNT.
+    """
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    # (suma + prior) / (cantidad + peso): clave de orden del buscador
+    rating_score = models.FloatField(default=RATING_PRIOR_MEAN)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Editar el perfil no pisa los agregados con los valores que se leyeron
+        # al empezar el request (pudo entrar una reseña en el medio)
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def rating_average(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def rating_histogram(self):
+        """[(estrellas, cantidad, porcentaje)] de 5 a 1."""
+        return [
+            (stars, count, round(100 * count / self.rating_count) if self.rating_count else 0)
+            for stars in range(5, 0, -1)
+            for count in [getattr(self, f'stars_{stars}')]
+        ]
+
+
+# -------------------------
+# Ubicación
+# -------------------------
+class GeoPoint(models.Model):
+    """Punto del perfil, calculado por geo.locate_profile al guardar (ver geo.py)."""
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    # '' si no se pudo ubicar: una celda de la grilla es un rango de este índice
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
+
+    class Meta:
+        abstract = True
+
 
 # -------------------------
 # Dueño de Establecimiento
 # -------------------------
-class EstablishmentOwner(models.Model):
+class EstablishmentOwner(RatingAggregate, GeoPoint):
     user = models.OneToOneField(
         CustomUser,
         on_delete=models.CASCADE,
@@ -81,12 +184,24 @@ class EstablishmentOwner(models.Model):
     class Meta:
         verbose_name = "Propietario de Establecimiento"
         verbose_name_plural = "Propietarios de Establecimientos"
+        # Índices del buscador: cada filtro de igualdad va seguido del id
+        # para resolver la paginación por cursor (id < X ORDER BY id DESC)
+        # sin ordenar en memoria.
+        indexes = [
+            models.Index(fields=['city', 'id'], name='owner_city_id_idx'),
+            models.Index(fields=['province', 'id'], name='owner_province_id_idx'),
+            models.Index(fields=['business_type', 'id'], name='owner_btype_id_idx'),
+            models.Index(fields=['capacity', 'id'], name='owner_capacity_id_idx'),
+            models.Index(fields=['business_name'], name='owner_bname_idx'),  # orden del admin
+            models.Index(fields=['rating_score', 'id'], name='owner_rating_id_idx'),  # orden por calificación
+            models.Index(fields=['geohash'], name='owner_geohash_idx'),  # búsqueda por distancia
+        ]
 
 
 # -------------------------
 # Artista / Emprendedor
 # -------------------------
-class ArtistEntrepreneur(models.Model):
+class ArtistEntrepreneur(RatingAggregate, GeoPoint):
     CATEGORY_CHOICES = [
         ('musician', 'Músico'),
         ('band', 'Banda'),
@@ -121,6 +236,14 @@ class ArtistEntrepreneur(models.Model):
     class Meta:
         verbose_name = "Artista/Emprendedor"
         verbose_name_plural = "Artistas/Emprendedores"
+        indexes = [
+            models.Index(fields=['category', 'id'], name='artist_category_id_idx'),
+            models.Index(fields=['location', 'id'], name='artist_location_id_idx'),
+            models.Index(fields=['neighborhood', 'id'], name='artist_nbhd_id_idx'),
+            models.Index(fields=['stage_name'], name='artist_stage_name_idx'),  # orden del admin
+            models.Index(fields=['rating_score', 'id'], name='artist_rating_id_idx'),  # orden por calificación
+            models.Index(fields=['geohash'], name='artist_geohash_idx'),  # búsqueda por distancia
+        ]
 
 
 # -------------------------
@@ -142,11 +265,405 @@ class ProfileMedia(models.Model):
         choices=MEDIA_TYPE_CHOICES,
         default='image'
     )
-    file = models.FileField(upload_to='profile_media/')
+    STATUS_CHOICES = [
+        ('processing', 'Procesando'),
+        ('ready', 'Listo'),
+        ('failed', 'Error'),
+    ]
+
+    file = models.FileField(upload_to='profile_media/', storage=media_storage, db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Las imágenes nuevas quedan en 'processing' hasta que el worker
+    # (procesar_medios) genera sus variantes.
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ready')
 
     def __str__(self):
         return f"{self.user.username} - {self.media_type}"
 
 
+# -------------------------
+# Variantes de imágenes (miniaturas)
+# -------------------------
+class MediaVariant(models.Model):
+    """
+    Copia redimensionada de una imagen de ProfileMedia o de
+    CustomUser.profile_image (en ese caso `media` queda en null). Usa el
+    mismo storage por contenido que el original.
+    """
+    SIZE_CHOICES = [
+        ('thumb', 'Miniatura'),
+        ('card', 'Tarjeta'),
+        ('full', 'Completa'),
+    ]
+    FORMAT_CHOICES = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='media_variants'
+    )
+    media = models.ForeignKey(
+        ProfileMedia,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='variants'
+    )
+    size = models.CharField(max_length=5, choices=SIZE_CHOICES)
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(max_length=255, storage=media_storage, db_index=True)
+    # Nombre del original del que salió (para detectar cambios de foto de perfil)
+    source = models.CharField(max_length=255)
+
+    def __str__(self):
+        return f"{self.source} - {self.size}.{self.format}"
+
+
+# -------------------------
+# Archivos guardados por contenido
+# -------------------------
+class StoredBlob(models.Model):
+    """
+    Un archivo físico de ContentAddressedStorage (accounts/storage.py) y la
+    cantidad de campos que lo referencian.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+# -------------------------
+# Límite de intentos de login
+# -------------------------
+class ThrottleBucket(models.Model):
+    """Balde de DatabaseBucketStore (accounts/throttling.py)."""
+    key = models.CharField(max_length=255, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField(db_index=True)  # time.time(), para calcular el relleno
+
+    def __str__(self):
+        return f"{self.key} ({self.tokens:.1f})"
+
+
+# -------------------------
+# Subidas por partes (reanudables)
+# -------------------------
+class UploadSession(models.Model):
+    """
+    Subida de un archivo grande en partes. Los bytes recibidos se van
+    agregando a un archivo temporal (settings.CHUNKED_UPLOAD_DIR) y al
+    completar se crea el ProfileMedia.
+    """
+    STATUS_CHOICES = [
+        ('open', 'Abierta'),
+        ('complete', 'Completa'),
+        ('aborted', 'Cancelada'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    filename = models.CharField(max_length=255)
+    media_type = models.CharField(max_length=5, choices=ProfileMedia.MEDIA_TYPE_CHOICES, default='video')
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, verbose_name="SHA-256 del archivo completo")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    media = models.ForeignKey(ProfileMedia, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+
+    class Meta:
+        indexes = [
+            # Subidas abandonadas: status = 'open' AND updated_at < límite
+            models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ]
+
+
+# -------------------------
+# Cola de trabajos de medios
+# -------------------------
+class MediaJob(models.Model):
+    """
+    Trabajo pendiente para el worker `procesar_medios` (la cola vive en la
+    base de datos). `object_id` es el id de ProfileMedia o de CustomUser
+    según `kind`.
+    """
+    KIND_CHOICES = [
+        ('media_variants', 'Variantes de multimedia'),
+        ('profile_image', 'Variantes de foto de perfil'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('done', 'Terminado'),
+        ('failed', 'Fallido'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} - {self.status}"
+
+    class Meta:
+        indexes = [
+            # Worker: claim_jobs (pendientes por run_after) y requeue_stale
+            # (running por updated_at). No son parciales: Django compara
+            # status con un parámetro y SQLite solo usa un índice parcial si
+            # la condición aparece literal en la consulta.
+            models.Index(fields=['status', 'run_after', 'id'], name='mediajob_status_run_idx'),
+            models.Index(fields=['status', 'updated_at'], name='mediajob_status_updated_idx'),
+            # Filtros del admin, en el orden del changelist (-id)
+            models.Index(fields=['status', 'id'], name='mediajob_status_id_idx'),
+            models.Index(fields=['kind', 'id'], name='mediajob_kind_id_idx'),
+        ]
+
+
+# -------------------------
+# Documento de búsqueda (texto completo)
+# -------------------------
+class ProfileSearchDocument(models.Model):
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='search_document'
+    )
+    kind = models.CharField(max_length=10, choices=CustomUser.USER_TYPE_CHOICES)
+    # Texto del perfil en minúsculas y sin acentos (Postgres: tsvector 'spanish')
+    content = models.TextField(blank=True)
+    # Mismo texto reducido a raíces (SQLite: tabla FTS5)
+    stems = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.kind}"
+
+
+# -------------------------
+# Índice de disponibilidad / horarios
+# -------------------------
+class AvailabilitySlot(models.Model):
+    """
+    Una fila por día y rango de minutos de EstablishmentOwner.schedule o
+    ArtistEntrepreneur.availability. Los rangos nocturnos (21:00 a 02:00) se
+    parten en dos filas en la medianoche. Se regenera al guardar el perfil.
+    """
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='availability_slots'
+    )
+    kind = models.CharField(max_length=10, choices=CustomUser.USER_TYPE_CHOICES)
+    day = models.PositiveSmallIntegerField()  # 0 = Lunes ... 6 = Domingo
+    start_minute = models.PositiveSmallIntegerField()
+    end_minute = models.PositiveSmallIntegerField()  # exclusivo, hasta 1440
+
+    def __str__(self):
+        return f"{self.user_id} - {self.day} {self.start_minute}-{self.end_minute}"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['kind', 'day', 'start_minute', 'end_minute'],
+                name='slot_kind_day_range_idx'
+            ),
+        ]
+
+
+# -------------------------
+# Mensajería interna
+# -------------------------
+class Conversation(models.Model):
+    """
+    Conversación entre dos usuarios. El par se guarda ordenado por id
+    (user_low < user_high) para que haya una sola conversación por par.
+    Los contadores los mantiene accounts/messaging.py al enviar.
+    """
+    # El índice único del par cubre las búsquedas por user_low
+    user_low = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', db_index=False)
+    user_high = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    message_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_low_id} - {self.user_high_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='conversation_pair_uniq'),
+            models.CheckConstraint(check=Q(user_low__lt=models.F('user_high')), name='conversation_pair_order'),
+        ]
+
+
+class ConversationMember(models.Model):
+    """
+    Una fila por participante: es la fila de su bandeja de entrada, con el
+    último mensaje y los no leídos denormalizados. La bandeja se lee por
+    (user, last_message_id) sin tocar Message ni contar nada; como los ids
+    de mensaje crecen, last_message_id ordena por fecha y sirve de cursor.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='conversations', db_index=False)
+    peer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_message_id = models.PositiveBigIntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=140, blank=True)
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.conversation_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'conversation'], name='member_user_conversation_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'last_message_id'], name='member_user_last_msg_idx'),
+        ]
+
+
+class Message(models.Model):
+    # El índice (conversation, id) cubre las búsquedas por conversation
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='messages',
+        db_index=False
+    )
+    sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='sent_messages')
+    body = models.TextField(max_length=2000)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sender_id} - {self.created_at}"
+
+    class Meta:
+        indexes = [
+            # Hilo paginado por cursor: WHERE conversation_id = ? AND id < ? ORDER BY id DESC
+            models.Index(fields=['conversation', 'id'], name='message_conversation_id_idx'),
+        ]
+
+
+class Inbox(models.Model):
+    """
+    Totales de la bandeja de cada usuario, para el menú y los eventos en
+    vivo: una lectura por clave primaria en vez de sumar conversaciones.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='inbox')
+    unread_messages = models.PositiveIntegerField(default=0)
+    unread_conversations = models.PositiveIntegerField(default=0)
+    last_message_id = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.unread_messages}"
+
+
+# -------------------------
+# Solicitudes de contratación
+# -------------------------
+class ContractRequest(models.Model):
+    """
+    Pedido de fecha entre un espacio y un artista (lo puede iniciar
+    cualquiera de los dos). Los cambios de estado pasan por
+    accounts/contracts.py: `version` se incrementa en cada uno y el UPDATE
+    la exige, así dos decisiones sobre la misma solicitud no se pisan.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('accepted', 'Aceptada'),
+        ('rejected', 'Rechazada'),
+        ('cancelled', 'Cancelada'),
+    ]
 
+    # Los índices compuestos de Meta cubren las búsquedas por venue y artist
+    venue = models.ForeignKey(
+        EstablishmentOwner, on_delete=models.CASCADE, related_name='contract_requests', db_index=False
+    )
+    artist = models.ForeignKey(
+        ArtistEntrepreneur, on_delete=models.CASCADE, related_name='contract_requests', db_index=False
+    )
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    starts_at = models.DateTimeField(verbose_name="Desde")
+    ends_at = models.DateTimeField(verbose_name="Hasta")
+    service_type = models.CharField(max_length=100, verbose_name="Tipo de Servicio")
+    message = models.TextField(blank=True, verbose_name="Mensaje")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    status_note = models.CharField(max_length=200, blank=True)
+    version = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.venue_id} - {self.artist_id} ({self.status})"
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=Q(ends_at__gt=models.F('starts_at')), name='contract_range_valid'),
+        ]
+        indexes = [
+            # "Mis solicitudes" por estado, paginadas por cursor (id < X ORDER BY id DESC)
+            models.Index(fields=['venue', 'status', 'id'], name='contract_venue_status_id_idx'),
+            models.Index(fields=['artist', 'status', 'id'], name='contract_artist_status_id_idx'),
+            # Superposición al aceptar: status = 'accepted' AND starts_at < fin AND ends_at > inicio
+            models.Index(fields=['venue', 'status', 'starts_at'], name='contract_venue_start_idx'),
+            models.Index(fields=['artist', 'status', 'starts_at'], name='contract_artist_start_idx'),
+        ]
+
+
+# -------------------------
+# Reseñas
+# -------------------------
+class Review(models.Model):
+    """
+    Reseña pública de un usuario sobre el perfil de otro (una por par). Los
+    agregados del perfil reseñado los actualiza accounts/reviews.py.
+    """
+    RATING_CHOICES = [(stars, f"{stars} estrella{'s' if stars > 1 else ''}") for stars in range(5, 0, -1)]
+
+    # El índice único (author, subject) cubre las búsquedas por author
+    author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='reviews_written', db_index=False)
+    # El índice (subject, id) cubre las búsquedas por subject
+    subject = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='reviews_received', db_index=False)
+    rating = models.PositiveSmallIntegerField(choices=RATING_CHOICES, verbose_name="Puntuación")
+    comment = models.TextField(max_length=2000, blank=True, verbose_name="Comentario")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.author_id} -> {self.subject_id} ({self.rating})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'subject'], name='review_author_subject_uniq'),
+            models.CheckConstraint(check=Q(rating__gte=1, rating__lte=5), name='review_rating_range'),
+        ]
+        indexes = [
+            # Reseñas del perfil, las más nuevas primero, paginadas por cursor
+            models.Index(fields=['subject', 'id'], name='review_subject_id_idx'),
+        ]
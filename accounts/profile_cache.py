@@ -0,0 +1,78 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# -------------------------
+# Caché del perfil público
+# -------------------------
+# Cada usuario tiene una versión en caché; las claves de los fragmentos la
+# incluyen, así invalidar es cambiar la versión (las entradas viejas quedan
+# huérfanas y expiran solas). La versión es aleatoria y no un contador:
+# si la clave de versión se pierde, nunca se vuelve a una versión anterior.
+# Funciona con cualquier backend de django.core.cache; con varios procesos
+# (runserver + procesar_medios) hace falta uno compartido, como el de archivos.
+#
+# La versión se lee ANTES de consultar la base y el fragmento se guarda con
+# esa versión: si el perfil se guardó en el medio, lo leído puede ser viejo
+# y set_fragment no lo guarda (ni bajo la versión nueva).
+PREFIX = 'perfil_publico'
+
+
+def timeout():
+    return getattr(settings, 'PROFILE_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def version(user_id):
+    key = f'{PREFIX}:version:{user_id}'
+    current = cache.get(key)
+    if current is None:
+        current = uuid.uuid4().hex
+        # add() por si otro proceso la creó en el medio
+        if not cache.add(key, current, None):
+            current = cache.get(key, current)
+    return current
+
+
+def invalidate(user_id):
+    """Cambia la versión ya y de nuevo al confirmar (hasta el COMMIT otro request lee la fila vieja)."""
+    def bump():
+        cache.set(f'{PREFIX}:version:{user_id}', uuid.uuid4().hex, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def fragment_key(user_id, name, seen):
+    return f'{PREFIX}:{user_id}:{seen}:{name}'
+
+
+def get_fragment(user_id, name, seen):
+    return cache.get(fragment_key(user_id, name, seen))
+
+
+def set_fragment(user_id, name, value, seen):
+    """Guarda `value` si la versión sigue siendo `seen`, la leída antes de consultar la base."""
+    if version(user_id) != seen:
+        return False
+    cache.set(fragment_key(user_id, name, seen), value, timeout())
+    return True
+
+
+# -------------------------
+# username -> id
+# -------------------------
+# Puede quedar desactualizado si el usuario cambia de username; por eso los
+# fragmentos guardan el username con el que se generaron y la vista lo compara.
+def cached_user_id(username):
+    return cache.get(f'{PREFIX}:user:{username}')
+
+
+def remember_user_id(username, user_id):
+    cache.set(f'{PREFIX}:user:{username}', user_id, timeout())
+
+
+def forget_user_id(username):
+    cache.delete(f'{PREFIX}:user:{username}')
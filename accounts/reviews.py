@@ -0,0 +1,161 @@
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast
+
+from . import profile_cache
+from .models import (
+    ArtistEntrepreneur, EstablishmentOwner, Review, RATING_FIELDS, RATING_PRIOR_MEAN, RATING_PRIOR_WEIGHT
+)
+from .search import make_page, paginate
+
+
+# -------------------------
+# Reseñas y agregados
+# -------------------------
+# Cada alta, edición o baja ajusta en el mismo UPDATE la cantidad, la suma,
+# el histograma y el puntaje del perfil reseñado (RatingAggregate). Son
+# incrementos con F(): dos reseñas simultáneas sobre el mismo perfil no se
+# pisan. Las bajas pasan por el post_delete de Review (signals.py), así
+# también se descuentan las que se borran en cascada con su autor.
+PROFILE_MODELS = {'owner': EstablishmentOwner, 'artist': ArtistEntrepreneur}
+RECENT_REVIEWS = 5
+
+
+class ReviewError(Exception):
+    pass
+
+
+def aggregate_updates(old=None, new=None):
+    """Valores del UPDATE que pasan el agregado de la puntuación `old` a `new`."""
+    count_delta = (new is not None) - (old is not None)
+    sum_delta = (new or 0) - (old or 0)
+    updates = {
+        'rating_count': F('rating_count') + count_delta,
+        'rating_sum': F('rating_sum') + sum_delta,
+        # Los SET leen los valores de antes del UPDATE: se suma el delta a mano
+        'rating_score': (
+            Cast(F('rating_sum') + (sum_delta + RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT), FloatField())
+            / Cast(F('rating_count') + (count_delta + RATING_PRIOR_WEIGHT), FloatField())
+        ),
+    }
+    if old != new:
+        if old is not None:
+            updates[f'stars_{old}'] = F(f'stars_{old}') - 1
+        if new is not None:
+            updates[f'stars_{new}'] = F(f'stars_{new}') + 1
+    return updates
+
+
+def apply_rating(subject_id, user_type=None, old=None, new=None):
+    """
+    Ajusta el agregado del perfil de `subject_id`. Sin `user_type` se prueba
+    en las dos tablas de perfiles (solo una tiene la fila): así el borrado
+    en cascada no tiene que cargar al usuario reseñado.
+    """
+    models = [PROFILE_MODELS[user_type]] if user_type in PROFILE_MODELS else PROFILE_MODELS.values()
+    updates = aggregate_updates(old, new)
+    for model in models:
+        model.objects.filter(user_id=subject_id).update(**updates)
+    transaction.on_commit(lambda: profile_cache.invalidate(subject_id))
+
+
+def save_review(author, subject, rating, comment=''):
+    """Crea o edita la reseña de `author` sobre `subject`."""
+    if author.pk == subject.pk:
+        raise ReviewError("No podés reseñar tu propio perfil.")
+    if subject.role_profile is None:
+        raise ReviewError("Ese usuario todavía no completó su perfil.")
+    if rating not in range(1, 6):
+        raise ReviewError("La puntuación va de 1 a 5.")
+
+    with transaction.atomic():
+        review = Review.objects.select_for_update().filter(author=author, subject=subject).first()
+        old = review.rating if review else None
+        if review is None:
+            review = Review.objects.create(author=author, subject=subject, rating=rating, comment=comment)
+        else:
+            review.rating = rating
+            review.comment = comment
+            review.save(update_fields=['rating', 'comment', 'updated_at'])
+        if old != rating:
+            apply_rating(subject.pk, subject.user_type, old, rating)
+        else:
+            # Solo cambió el comentario: el agregado queda igual, pero la tarjeta lo muestra
+            transaction.on_commit(lambda: profile_cache.invalidate(subject.pk))
+    return review
+
+
+def delete_review(review):
+    """
+    Borra la reseña; el agregado lo descuenta el post_delete
+    (discount_review). Devuelve False si otro request ya la había borrado.
+    """
+    with transaction.atomic():
+        # Model.delete() manda post_delete aunque la fila ya no exista: se
+        # bloquea y se vuelve a leer para que dos bajas simultáneas de la
+        # misma reseña descuenten una sola vez.
+        locked = Review.objects.select_for_update().filter(pk=review.pk).first()
+        if locked is None:
+            return False
+        locked.delete()
+    return True
+
+
+def discount_review(review):
+    subject = review.subject if Review.subject.is_cached(review) else None
+    apply_rating(review.subject_id, subject.user_type if subject else None, old=review.rating)
+
+
+def recent_reviews(subject, limit=RECENT_REVIEWS):
+    return list(subject.reviews_received.select_related('author').order_by('-id')[:limit])
+
+
+def reviews_page(subject, cursor=None):
+    queryset, limit = paginate(subject.reviews_received.select_related('author').order_by('-id'), cursor)
+    return make_page(queryset, limit)
+
+
+def rebuild_aggregates(batch_size=1000):
+    """
+    Recalcula los agregados de todos los perfiles desde Review, por lotes de
+    perfiles (una consulta agrupada y un bulk_update por lote). Devuelve
+    cuántos perfiles estaban desactualizados.
+    """
+    fields = list(RATING_FIELDS)
+    stars_counts = {f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)}
+    fixed = 0
+    for model in PROFILE_MODELS.values():
+        last_id = 0
+        while True:
+            # Las filas del lote quedan bloqueadas hasta el COMMIT: una reseña
+            # que llega en el medio suma su delta después, sobre el total nuevo
+            with transaction.atomic():
+                batch = list(
+                    model.objects.select_for_update().filter(id__gt=last_id)
+                    .order_by('id').only('id', 'user_id', *fields)[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                totals = {
+                    row.pop('subject_id'): row
+                    for row in Review.objects.filter(subject_id__in=[p.user_id for p in batch])
+                    .values('subject_id')
+                    .annotate(rating_count=Count('id'), rating_sum=Sum('rating'), **stars_counts)
+                }
+                changed = []
+                for profile in batch:
+                    total = totals.get(profile.user_id) or dict.fromkeys(['rating_count', 'rating_sum', *stars_counts], 0)
+                    total['rating_score'] = (
+                        (total['rating_sum'] + RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT)
+                        / (total['rating_count'] + RATING_PRIOR_WEIGHT)
+                    )
+                    if any(getattr(profile, name) != value for name, value in total.items()):
+                        for name, value in total.items():
+                            setattr(profile, name, value)
+                        changed.append(profile)
+                model.objects.bulk_update(changed, fields)
+            for profile in changed:
+                profile_cache.invalidate(profile.user_id)
+            fixed += len(changed)
+    return fixed
@@ -0,0 +1,229 @@
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+
+from . import availability, fulltext, geo
+from .models import EstablishmentOwner, ArtistEntrepreneur
+
+
+# -------------------------
+# Buscador de Espacios y Servicios
+# -------------------------
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Filtro del formulario -> lookup del ORM, por tipo de perfil.
+# Todos los lookups tienen un índice (campo, id) en el modelo.
+OWNER_FILTERS = {
+    'city': 'city',
+    'province': 'province',
+    'business_type': 'business_type',
+    'capacity': 'capacity__gte',
+}
+ARTIST_FILTERS = {
+    'city': 'location',
+    'neighborhood': 'neighborhood',
+    'category': 'category',
+}
+
+SEARCH_KINDS = {
+    'owner': (EstablishmentOwner, OWNER_FILTERS),
+    'artist': (ArtistEntrepreneur, ARTIST_FILTERS),
+}
+
+
+class SearchPage(NamedTuple):
+    results: list
+    next_cursor: str
+
+
+def build_queryset(kind, filters):
+    """
+    Arma el queryset del buscador para `kind` ('owner' o 'artist').
+    Los filtros vacíos o que no aplican al tipo de perfil se ignoran.
+    """
+    model, lookups = SEARCH_KINDS[kind]
+    conditions = {}
+    for name, lookup in lookups.items():
+        value = filters.get(name)
+        if value in (None, ''):
+            continue
+        conditions[lookup] = value.strip() if isinstance(value, str) else value
+
+    queryset = model.objects.filter(user__is_active=True, **conditions)
+
+    # Disponibilidad: se resuelve como subconsulta sobre AvailabilitySlot
+    day, start, end = filters.get('day'), filters.get('start'), filters.get('end')
+    if day not in (None, '') and start and end:
+        queryset = queryset.filter(
+            user_id__in=availability.free_user_ids(kind, day, start, end)
+        )
+
+    # select_related trae el usuario en el mismo JOIN: cada tarjeta
+    # necesita username e imagen de perfil sin una consulta extra.
+    return queryset.select_related('user').order_by('-id')
+
+
+def parse_cursor(cursor):
+    """Devuelve el id del cursor o None si es inválido."""
+    try:
+        value = int(cursor)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def paginate(queryset, cursor=None, limit=PAGE_SIZE):
+    """
+    Aplica la paginación por cursor (keyset) sobre un queryset ordenado por
+    -id. Se pide un elemento de más para saber si hay página siguiente.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    last_id = parse_cursor(cursor)
+    if last_id is not None:
+        queryset = queryset.filter(id__lt=last_id)
+    return queryset[:limit + 1], limit
+
+
+def make_page(rows, limit, cursor_for=lambda row: str(row.id)):
+    rows = list(rows)
+    next_cursor = ''
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursor_for(rows[-1])
+    return SearchPage(results=rows, next_cursor=next_cursor)
+
+
+# -------------------------
+# Orden por calificación
+# -------------------------
+# rating_score ya está en la fila del perfil (RatingAggregate): se ordena
+# por (rating_score, id) sin agregar reseñas. El cursor es 'puntaje_id'.
+def parse_rating_cursor(cursor):
+    try:
+        score, last_id = str(cursor).split('_')
+        return float(score), int(last_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def rating_cursor(row):
+    return f'{row.rating_score!r}_{row.id}'
+
+
+def paginate_by_rating(queryset, cursor=None, limit=PAGE_SIZE):
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    queryset = queryset.order_by('-rating_score', '-id')
+    key = parse_rating_cursor(cursor)
+    if key is not None:
+        score, last_id = key
+        queryset = queryset.filter(Q(rating_score__lt=score) | Q(rating_score=score, id__lt=last_id))
+    return queryset[:limit + 1], limit
+
+
+def search_ranked(kind, filters, query, cursor=None, limit=PAGE_SIZE):
+    """
+    Búsqueda por texto libre: los filtros van dentro de la consulta del
+    índice de texto completo y la página sale de ese ranking ya filtrado.
+    Acá el cursor es la posición dentro del ranking.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    offset = parse_cursor(cursor) or 0
+
+    candidates = build_queryset(kind, filters)
+    if filters.get('origin') and filters.get('radius'):
+        # Con radio, el texto sigue mandando en el orden y la distancia filtra
+        # (en Python: se recorre el ranking entero de los filtrados)
+        lat, lon = filters['origin']
+        inside = {uid for _, uid in geo.within_radius(candidates, lat, lon, filters['radius'], key='user_id')}
+        ranked = fulltext.ranked_user_ids(query, kind, within=candidates)
+        page_ids = [uid for uid in ranked if uid in inside][offset:offset + limit + 1]
+    else:
+        page_ids = fulltext.ranked_user_ids(query, kind, within=candidates, offset=offset, limit=limit + 1)
+
+    profiles = {
+        p.user_id: p
+        for p in build_queryset(kind, filters).filter(user_id__in=page_ids[:limit])
+    }
+    results = [profiles[uid] for uid in page_ids[:limit] if uid in profiles]
+    next_cursor = str(offset + limit) if len(page_ids) > limit else ''
+    return SearchPage(results=results, next_cursor=next_cursor)
+
+
+# -------------------------
+# Cercanía
+# -------------------------
+def wants_distance(filters):
+    return bool(filters.get('radius')) or filters.get('order') == 'distance'
+
+
+def search_nearby(kind, filters, cursor=None, limit=PAGE_SIZE):
+    """
+    Perfiles ordenados por distancia a filters['origin'] (lat, lon): los que
+    están a menos de filters['radius'] km o, sin radio, los más cercanos.
+    Como en search_ranked, el cursor es la posición dentro del orden. Cada
+    resultado trae `distance_km`.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    offset = parse_cursor(cursor) or 0
+    lat, lon = filters['origin']
+
+    queryset = build_queryset(kind, filters)
+    if filters.get('radius'):
+        hits = geo.within_radius(queryset, lat, lon, filters['radius'])
+    else:
+        hits = geo.nearest(queryset, lat, lon, offset + limit + 1)
+    page = hits[offset:offset + limit + 1]
+
+    profiles = queryset.in_bulk([pk for _, pk in page[:limit]])
+    results = []
+    for distance, pk in page[:limit]:
+        profile = profiles.get(pk)
+        if profile is not None:
+            profile.distance_km = distance
+            results.append(profile)
+    next_cursor = str(offset + limit) if len(page) > limit else ''
+    return SearchPage(results=results, next_cursor=next_cursor)
+
+
+def search_profiles(kind, filters, cursor=None, limit=PAGE_SIZE):
+    """
+    Busca perfiles de dueños o artistas.
+
+    Si `filters` trae texto libre en 'q' los resultados se ordenan por
+    relevancia; si no, por más recientes o, con order='rating', por
+    calificación. Con un punto en 'origin' y un radio u order='distance',
+    por distancia. Devuelve un SearchPage con los
+    resultados (con `user` precargado) y el cursor para pedir la página
+    siguiente ('' si no hay más).
+    """
+    query = (filters.get('q') or '').strip()
+    if query:
+        return search_ranked(kind, filters, query, cursor, limit)
+
+    if filters.get('origin') and wants_distance(filters):
+        return search_nearby(kind, filters, cursor, limit)
+
+    if filters.get('order') == 'rating':
+        queryset, limit = paginate_by_rating(build_queryset(kind, filters), cursor, limit)
+        return make_page(queryset, limit, rating_cursor)
+    queryset, limit = paginate(build_queryset(kind, filters), cursor, limit)
+    return make_page(queryset, limit)
+
+
+async def asearch_profiles(kind, filters, cursor=None, limit=PAGE_SIZE):
+    """search_profiles para las vistas async: la página se lee con `async for`."""
+    query = (filters.get('q') or '').strip()
+    if query:
+        # El ranking sale del índice de texto completo (SQL crudo, sin API async)
+        return await sync_to_async(search_ranked)(kind, filters, query, cursor, limit)
+    if filters.get('origin') and wants_distance(filters):
+        # Las distancias se calculan en Python sobre los candidatos
+        return await sync_to_async(search_nearby)(kind, filters, cursor, limit)
+
+    if filters.get('order') == 'rating':
+        queryset, limit = paginate_by_rating(build_queryset(kind, filters), cursor, limit)
+        return make_page([profile async for profile in queryset], limit, rating_cursor)
+    queryset, limit = paginate(build_queryset(kind, filters), cursor, limit)
+    return make_page([profile async for profile in queryset], limit)
@@ -0,0 +1,275 @@
+import multiprocessing
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from io import BytesIO
+from typing import NamedTuple
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import F, Max
+from PIL import Image
+
+from . import availability, fulltext, geo
+from .models import (
+    CustomUser, EstablishmentOwner, ArtistEntrepreneur, ProfileMedia, StoredBlob,
+    ProfileSearchDocument, AvailabilitySlot
+)
+from .storage import media_storage
+from .worker import init_worker
+
+
+# -------------------------
+# Datos sintéticos
+# -------------------------
+# Usuarios con perfil, medios e índices derivados (búsqueda,
+# disponibilidad y coordenadas) creados con bulk_create, sin señales. Los ids de usuario se
+# asignan de antemano, así cada lote se arma completo (con sus claves
+# foráneas) en un proceso hijo y el proceso principal solo inserta, un lote
+# por transacción.
+DEFAULT_PASSWORD = 'benchmark-1234'
+BATCH_SIZE = 5000
+
+# (ciudad, provincia, peso aproximado por población, barrios)
+CITIES = [
+    ('Buenos Aires', 'Buenos Aires', 30, ['Palermo', 'San Telmo', 'Almagro', 'Caballito', 'Belgrano', 'Boedo', 'Villa Crespo', 'La Boca']),
+    ('Córdoba', 'Córdoba', 14, ['Nueva Córdoba', 'Güemes', 'Alberdi', 'General Paz', 'Cerro de las Rosas', 'Centro']),
+    ('Rosario', 'Santa Fe', 12, ['Pichincha', 'Centro', 'Echesortu', 'Fisherton', 'Alberdi']),
+    ('Mendoza', 'Mendoza', 8, ['Quinta Sección', 'Godoy Cruz', 'Chacras de Coria', 'Centro']),
+    ('La Plata', 'Buenos Aires', 7, ['Centro', 'City Bell', 'Tolosa', 'Gonnet']),
+    ('San Miguel de Tucumán', 'Tucumán', 7, ['Centro', 'Barrio Norte', 'Yerba Buena']),
+    ('Mar del Plata', 'Buenos Aires', 6, ['Güemes', 'La Perla', 'Centro', 'Los Troncos']),
+    ('Salta', 'Salta', 5, ['Centro', 'Tres Cerritos', 'Grand Bourg']),
+    ('Santa Fe', 'Santa Fe', 5, ['Centro', 'Candioti', 'Guadalupe']),
+    ('San Juan', 'San Juan', 4, ['Centro', 'Rivadavia', 'Desamparados']),
+    ('Resistencia', 'Chaco', 3, ['Centro', 'Villa Centenario']),
+    ('Neuquén', 'Neuquén', 3, ['Centro', 'Santa Genoveva', 'Alta Barda']),
+    ('Santiago del Estero', 'Santiago del Estero', 3, ['Centro', 'Belgrano']),
+    ('Corrientes', 'Corrientes', 3, ['Centro', 'Cambá Cuá']),
+    ('Posadas', 'Misiones', 3, ['Centro', 'Villa Sarita']),
+    ('Bahía Blanca', 'Buenos Aires', 3, ['Centro', 'Universitario']),
+    ('Paraná', 'Entre Ríos', 2, ['Centro', 'Parque Urquiza']),
+    ('San Salvador de Jujuy', 'Jujuy', 2, ['Centro', 'Los Perales']),
+    ('San Carlos de Bariloche', 'Río Negro', 2, ['Centro', 'Melipal']),
+    ('Río Cuarto', 'Córdoba', 2, ['Centro', 'Banda Norte']),
+    ('Villa Carlos Paz', 'Córdoba', 1, ['Centro']),
+    ('Ushuaia', 'Tierra del Fuego', 1, ['Centro']),
+]
+CITY_WEIGHTS = [city[2] for city in CITIES]
+
+BUSINESS_TYPES = ['Bar', 'Restaurante', 'Centro Cultural', 'Teatro', 'Boliche', 'Café', 'Cervecería', 'Peña']
+VENUE_WORDS = ['La Cueva', 'El Galpón', 'La Esquina', 'El Patio', 'La Usina', 'El Refugio', 'La Trastienda', 'El Faro', 'La Fábrica', 'El Altillo']
+FIRST_NAMES = ['Martina', 'Lucía', 'Sofía', 'Valentina', 'Camila', 'Mateo', 'Santiago', 'Benjamín', 'Joaquín', 'Tomás', 'Julieta', 'Facundo']
+LAST_NAMES = ['González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez', 'Romero', 'Sosa', 'Álvarez', 'Benítez']
+BAND_WORDS = ['Los Pájaros', 'Río Seco', 'Niebla', 'Cumbia Norte', 'La Sureña', 'Trío Andino', 'Bordona', 'Ruido Blanco']
+SERVICES = ['Sonido', 'Luces', 'Escenario', 'Camarín', 'Proyector', 'Estacionamiento']
+CATEGORIES = [c for c, _ in ArtistEntrepreneur.CATEGORY_CHOICES]
+CATEGORY_WEIGHTS = [30, 20, 15, 8, 10, 7, 10]
+
+DAYS = availability.DAYS_OF_WEEK
+
+
+# -------------------------
+# Horarios
+# -------------------------
+def venue_schedule(rng, business_type):
+    if business_type in ('Café', 'Restaurante'):
+        days, start, length = DAYS[rng.randint(0, 2):], rng.choice([8, 9, 12]), rng.choice([8, 10, 12])
+    else:
+        # Bares y boliches: de noche, más días hacia el fin de semana
+        days, start, length = DAYS[rng.randint(2, 4):], rng.choice([19, 20, 21, 22]), rng.choice([4, 5, 6, 7])
+    end = (start + length) % 24
+    return {day: {'from': f'{start:02d}:00', 'to': f'{end:02d}:00'} for day in days}
+
+
+def artist_availability(rng):
+    schedule = {}
+    for day in rng.sample(DAYS, rng.randint(2, 6)):
+        start = rng.choice([14, 18, 19, 20, 21, 22])
+        minutes = rng.choice(['00', '30'])
+        end = (start + rng.randint(2, 6)) % 24
+        schedule[day] = {'from': f'{start:02d}:{minutes}', 'to': f'{end:02d}:{minutes}'}
+    return schedule
+
+
+def sample_image():
+    """Un JPEG chico guardado una sola vez; todos los medios lo comparten."""
+    buffer = BytesIO()
+    Image.new('RGB', (640, 480), (180, 40, 40)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+# -------------------------
+# Armado de lotes (corre en los procesos hijos)
+# -------------------------
+class BatchSpec(NamedTuple):
+    first_id: int
+    start: int
+    count: int
+    password_hash: str
+    prefix: str
+    seed: int
+    media_per_user: int
+    blob_name: str
+
+
+class Batch(NamedTuple):
+    users: list
+    owners: list
+    artists: list
+    media: list
+    documents: list
+    slots: list
+
+
+def build_user(user_id, index, password_hash, prefix, rng):
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    username = f'{prefix}_{index:07d}'
+    return CustomUser(
+        id=user_id,
+        username=username,
+        email=f'{username}@example.com',
+        first_name=first_name,
+        last_name=last_name,
+        password=password_hash,
+        user_type='owner' if index % 2 == 0 else 'artist',
+        phone=f'+549{rng.randint(11, 388)}{rng.randint(1000000, 9999999)}',
+        birth_date=date(rng.randint(1960, 2004), rng.randint(1, 12), rng.randint(1, 28)),
+    )
+
+
+def build_profile(user, rng):
+    city, province, _, neighborhoods = rng.choices(CITIES, weights=CITY_WEIGHTS)[0]
+    if user.user_type == 'owner':
+        business_type = rng.choice(BUSINESS_TYPES)
+        return EstablishmentOwner(
+            user_id=user.id,
+            business_name=f'{rng.choice(VENUE_WORDS)} {user.last_name}',
+            business_type=business_type,
+            address=f'{rng.choice(LAST_NAMES)} {rng.randint(1, 4000)}',
+            city=city,
+            province=province,
+            capacity=rng.choice([40, 80, 120, 200, 350, 600]),
+            description=f'{business_type} en {rng.choice(neighborhoods)}, {city}.',
+            schedule=venue_schedule(rng, business_type),
+            additional_services=rng.sample(SERVICES, rng.randint(0, 3)),
+        )
+    category = rng.choices(CATEGORIES, weights=CATEGORY_WEIGHTS)[0]
+    stage_name = rng.choice(BAND_WORDS) if category == 'band' else f'{user.first_name} {user.last_name}'
+    return ArtistEntrepreneur(
+        user_id=user.id,
+        stage_name=stage_name,
+        category=category,
+        experience_years=min(int(rng.expovariate(1 / 6)), 40),
+        bio=f'{dict(ArtistEntrepreneur.CATEGORY_CHOICES)[category]} de {city}.',
+        location=city,
+        neighborhood=rng.choice(neighborhoods),
+        availability=artist_availability(rng),
+    )
+
+
+def build_batch(spec):
+    """Arma todas las filas de un lote. No toca la base de datos."""
+    rng = random.Random(spec.seed * 1_000_003 + spec.start)
+    batch = Batch([], [], [], [], [], [])
+    for offset in range(spec.count):
+        user = build_user(spec.first_id + offset, spec.start + offset, spec.password_hash, spec.prefix, rng)
+        profile = build_profile(user, rng)
+        geo.locate_profile(profile)
+        batch.users.append(user)
+        (batch.owners if user.user_type == 'owner' else batch.artists).append(profile)
+        batch.documents.append(fulltext.build_document(profile))
+        batch.slots.extend(availability.build_slots(profile))
+        if spec.blob_name:
+            batch.media.extend(
+                ProfileMedia(user_id=user.id, file=spec.blob_name, media_type='image')
+                for _ in range(spec.media_per_user)
+            )
+    return batch
+
+
+def insert_batch(batch):
+    with transaction.atomic():
+        CustomUser.objects.bulk_create(batch.users)
+        EstablishmentOwner.objects.bulk_create(batch.owners)
+        ArtistEntrepreneur.objects.bulk_create(batch.artists)
+        ProfileMedia.objects.bulk_create(batch.media)
+        ProfileSearchDocument.objects.bulk_create(batch.documents)
+        AvailabilitySlot.objects.bulk_create(batch.slots)
+    return len(batch.users)
+
+
+# -------------------------
+# Punto de entrada
+# -------------------------
+def seed_users(total, media_per_user=1, batch_size=BATCH_SIZE, password=DEFAULT_PASSWORD,
+               prefix='bench', seed=0, processes=1, progress=None):
+    """
+    Crea `total` usuarios (mitad dueños, mitad artistas) con perfil,
+    `media_per_user` imágenes, documento de búsqueda y franjas de
+    disponibilidad. La contraseña se hashea una sola vez. Con processes > 1
+    los lotes se arman en paralelo. `progress(creados)` se llama por lote.
+    Devuelve la cantidad de usuarios creados.
+    """
+    password_hash = make_password(password)
+    blob_name = ''
+    if media_per_user:
+        blob_name = media_storage.save('seed.jpg', ContentFile(sample_image()))
+
+    first_id = (CustomUser.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+    start = CustomUser.objects.filter(username__startswith=f'{prefix}_').count()
+    specs = [
+        BatchSpec(first_id + offset, start + offset, min(batch_size, total - offset),
+                  password_hash, prefix, seed, media_per_user, blob_name)
+        for offset in range(0, total, batch_size)
+    ]
+
+    created = 0
+    for batch in build_batches(specs, processes):
+        created += insert_batch(batch)
+        if progress:
+            progress(created)
+
+    reset_user_sequence()
+    if blob_name:
+        # Una referencia por fila (save() ya sumó una), para que borrar un
+        # medio no borre el archivo compartido
+        StoredBlob.objects.filter(name=blob_name).update(
+            refcount=F('refcount') + created * media_per_user - 1
+        )
+    return created
+
+
+def build_batches(specs, processes):
+    """Lotes en orden; en paralelo, con a lo sumo 2 lotes por proceso en memoria."""
+    if processes <= 1:
+        for spec in specs:
+            yield build_batch(spec)
+        return
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(processes, mp_context=context, initializer=init_worker) as pool:
+        pending = deque()
+        specs = iter(specs)
+        for spec in specs:
+            pending.append(pool.submit(build_batch, spec))
+            if len(pending) >= processes * 2:
+                break
+        while pending:
+            batch = pending.popleft().result()
+            spec = next(specs, None)
+            if spec is not None:
+                pending.append(pool.submit(build_batch, spec))
+            yield batch
+
+
+def reset_user_sequence():
+    """Los ids se asignaron a mano: en Postgres hay que mover la secuencia."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [CustomUser])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
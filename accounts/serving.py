@@ -0,0 +1,162 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import CustomUser, MediaVariant, ProfileMedia
+from .storage import BLOB_DIR, media_storage
+
+
+# -------------------------
+# Servir medios (Range, ETag, sendfile)
+# -------------------------
+# Reemplaza a django.conf.urls.static, que solo funciona con DEBUG y no
+# soporta Range: sin Range el <video> no puede adelantar sin descargar todo.
+# Con MEDIA_SENDFILE = 'x-accel-redirect' (nginx) o 'x-sendfile' (Apache,
+# lighttpd) Django solo valida y el proxy hace la transferencia.
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOB_MAX_AGE = 365 * 24 * 60 * 60  # el contenido de un blob nunca cambia
+FILE_MAX_AGE = 60 * 60
+BLOCK_SIZE = 64 * 1024
+
+
+def is_public(name, user=None):
+    """El archivo pertenece a un perfil activo (o al usuario que lo pide)."""
+    visible, visible_user = Q(user__is_active=True), Q(is_active=True)
+    if user is not None and user.is_authenticated:
+        visible |= Q(user=user)
+        visible_user |= Q(pk=user.pk)
+    return (
+        ProfileMedia.objects.filter(visible, file=name).exists()
+        or MediaVariant.objects.filter(visible, file=name).exists()
+        or CustomUser.objects.filter(visible_user, profile_image=name).exists()
+    )
+
+
+def file_etag(name, stat):
+    if name.startswith(BLOB_DIR + '/'):
+        # El nombre del blob ya es el SHA-256 del contenido
+        return '"%s"' % os.path.splitext(os.path.basename(name))[0]
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+
+
+def parse_range(header, size):
+    """
+    (inicio, fin) inclusive para un único rango `bytes=`; None si el header
+    no aplica (se sirve el archivo entero) y ValueError si es insatisfacible.
+    Varios rangos separados por coma se ignoran: 200 con todo el archivo.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # bytes=-500: los últimos 500
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+class RangeFile:
+    """Lee como máximo `length` bytes de `fh` desde su posición actual."""
+
+    def __init__(self, fh, length):
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fh.close()
+
+
+def sendfile_response(name, full_path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + name
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def serve_media(request, name):
+    """
+    Respuesta para el archivo `name` de media_storage. No valida permisos
+    (eso lo hace la vista con is_public).
+    """
+    full_path = media_storage.path(name)
+    stat = os.stat(full_path)
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    # 304 / 412 según If-None-Match, If-Modified-Since, If-Match...
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if settings.MEDIA_SENDFILE:
+            # El proxy resuelve Range y el envío del archivo
+            response = sendfile_response(name, full_path, content_type)
+        else:
+            response = file_response(request, full_path, stat.st_size, etag, last_modified, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    max_age = BLOB_MAX_AGE if name.startswith(BLOB_DIR + '/') else FILE_MAX_AGE
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def file_response(request, full_path, size, etag, last_modified, content_type):
+    byte_range = None
+    header = request.headers.get('Range')
+    if header and request.method == 'GET' and if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    fh = open(full_path, 'rb')
+    if byte_range is None:
+        # Archivo completo: el servidor WSGI puede usar sendfile() vía wsgi.file_wrapper
+        response = FileResponse(fh, content_type=content_type)
+        response.block_size = BLOCK_SIZE
+        return response
+
+    start, end = byte_range
+    fh.seek(start)
+    response = FileResponse(RangeFile(fh, end - start + 1), status=206, content_type=content_type)
+    response.block_size = BLOCK_SIZE
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,129 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import availability, fulltext, geo, jobs, profile_cache, reviews, thumbnails, user_cache
+from .models import (
+    CustomUser, EstablishmentOwner, ArtistEntrepreneur, AvailabilitySlot,
+    ProfileMedia, MediaVariant, Review
+)
+
+
+# -------------------------
+# Índice de texto completo
+# -------------------------
+@receiver(post_save, sender=EstablishmentOwner)
+@receiver(post_save, sender=ArtistEntrepreneur)
+def update_search_document(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    fulltext.index_profile(instance)
+
+
+@receiver(post_delete, sender=EstablishmentOwner)
+@receiver(post_delete, sender=ArtistEntrepreneur)
+def delete_search_document(sender, instance, **kwargs):
+    fulltext.remove_profile(instance.user_id)
+
+
+# -------------------------
+# Coordenadas
+# -------------------------
+# Se recalculan en cada guardado: es una búsqueda en memoria (geo.py)
+@receiver(pre_save, sender=EstablishmentOwner)
+@receiver(pre_save, sender=ArtistEntrepreneur)
+def locate_profile(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    geo.locate_profile(instance)
+
+
+# -------------------------
+# Índice de disponibilidad
+# -------------------------
+@receiver(post_save, sender=EstablishmentOwner)
+@receiver(post_save, sender=ArtistEntrepreneur)
+def update_availability_slots(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    availability.sync_profiles([instance])
+
+
+@receiver(post_delete, sender=EstablishmentOwner)
+@receiver(post_delete, sender=ArtistEntrepreneur)
+def delete_availability_slots(sender, instance, **kwargs):
+    AvailabilitySlot.objects.filter(user_id=instance.user_id).delete()
+
+
+# -------------------------
+# Variantes de imágenes
+# -------------------------
+# Las variantes se generan en el worker (procesar_medios), no en el request.
+@receiver(post_save, sender=ProfileMedia)
+def enqueue_media_variants(sender, instance, created, raw=False, **kwargs):
+    if raw or not created or instance.status != 'processing':
+        return
+    jobs.enqueue('media_variants', instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def update_profile_image_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'profile_image' not in update_fields):
+        return
+    if not instance.profile_image:
+        thumbnails.delete_variants(instance.pk)
+    elif not thumbnails.profile_image_is_current(instance):
+        jobs.enqueue('profile_image', instance.pk)
+
+
+@receiver(post_delete, sender=MediaVariant)
+def delete_variant_file(sender, instance, **kwargs):
+    instance.file.delete(save=False)
+
+
+# -------------------------
+# Agregados de reseñas
+# -------------------------
+# También corre en los borrados en cascada (el autor da de baja su cuenta)
+@receiver(post_delete, sender=Review)
+def discount_deleted_review(sender, instance, **kwargs):
+    reviews.discount_review(instance)
+
+
+# -------------------------
+# Caché del perfil público
+# -------------------------
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_profile_cache(sender, instance, update_fields=None, **kwargs):
+    # El login solo actualiza last_login (y password si se rehashea): no se muestran
+    if update_fields is not None and set(update_fields) <= {'last_login', 'password'}:
+        return
+    profile_cache.invalidate(instance.pk)
+    profile_cache.forget_user_id(instance.username)
+
+
+@receiver(post_save, sender=EstablishmentOwner)
+@receiver(post_save, sender=ArtistEntrepreneur)
+@receiver(post_save, sender=ProfileMedia)
+@receiver(post_delete, sender=EstablishmentOwner)
+@receiver(post_delete, sender=ArtistEntrepreneur)
+@receiver(post_delete, sender=ProfileMedia)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    profile_cache.invalidate(instance.user_id)
+
+
+# -------------------------
+# Caché del usuario autenticado
+# -------------------------
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_user(sender, instance, **kwargs):
+    user_cache.forget(instance.pk)
+
+
+@receiver(post_save, sender=EstablishmentOwner)
+@receiver(post_save, sender=ArtistEntrepreneur)
+@receiver(post_delete, sender=EstablishmentOwner)
+@receiver(post_delete, sender=ArtistEntrepreneur)
+def forget_cached_profile_user(sender, instance, **kwargs):
+    user_cache.forget(instance.user_id)
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import tempfile
+from collections import Counter
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils.deconstruct import deconstructible
+
+
+# -------------------------
+# Storage direccionado por contenido
+# -------------------------
+# Cada archivo se guarda una sola vez, con el SHA-256 de su contenido como
+# nombre: blobs/3f/3fa9...c1.jpg. Subir la misma imagen tres veces crea tres
+# filas de ProfileMedia que apuntan al mismo archivo. StoredBlob lleva la
+# cuenta de referencias y el archivo físico se borra con la última.
+BLOB_DIR = 'blobs'
+HASH_BLOCK = 64 * 1024
+# Los campos que apuntan a blobs: (modelo, campo)
+REFERENCE_FIELDS = [
+    ('ProfileMedia', 'file'),
+    ('CustomUser', 'profile_image'),
+    ('MediaVariant', 'file'),
+]
+
+
+def blob_name(digest, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return f"{BLOB_DIR}/{digest[:2]}/{digest}{extension}"
+
+
+def reference_fields():
+    from django.apps import apps
+
+    return [(apps.get_model('accounts', model), field) for model, field in REFERENCE_FIELDS]
+
+
+def count_references(names):
+    """Cuántos campos apuntan a cada nombre de `names`: una consulta agrupada por campo."""
+    counts = Counter()
+    for model, field in reference_fields():
+        rows = (
+            model.objects.filter(**{f'{field}__in': names})
+            .values(field).annotate(references=Count('pk')).order_by()
+        )
+        for row in rows:
+            counts[row[field]] += row['references']
+    return counts
+
+
+def recount(names):
+    """
+    Pone el refcount de los blobs de `names` en las referencias que hay en
+    las tablas (los incrementos de _save() y delete() pueden quedar
+    desfasados si falla el guardado de la fila). Devuelve cuántos cambiaron.
+    """
+    from .models import StoredBlob
+
+    with transaction.atomic():
+        blobs = list(StoredBlob.objects.select_for_update().filter(name__in=names))
+        counts = count_references([blob.name for blob in blobs])
+        changed = [blob for blob in blobs if blob.refcount != counts[blob.name]]
+        for blob in changed:
+            blob.refcount = counts[blob.name]
+        StoredBlob.objects.bulk_update(changed, ['refcount'])
+    return len(changed)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage que nombra los archivos por su contenido. Los archivos
+    guardados antes (sin fila en StoredBlob) se siguen leyendo y borrando
+    como en FileSystemStorage.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre final lo decide _save() según el contenido
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        if hasattr(content, 'temporary_file_path'):
+            # Ya está en disco (subida grande o por partes): se hashea
+            # leyéndolo y, si es nuevo, se mueve sin copiar.
+            source = content.temporary_file_path()
+            digest, size = self.hash_file(source)
+            temporary = False
+        else:
+            source, digest, size = self.spool(content)
+            temporary = True
+
+        final_name = blob_name(digest, name)
+        full_path = self.path(final_name)
+        with transaction.atomic():
+            blob, _ = StoredBlob.objects.select_for_update().get_or_create(
+                name=final_name, defaults={'sha256': digest, 'size': size, 'refcount': 0}
+            )
+            if not os.path.exists(full_path):
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if temporary:
+                    os.replace(source, full_path)
+                else:
+                    file_move_safe(source, full_path, allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+            StoredBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+
+        if temporary and os.path.exists(source):  # el blob ya existía
+            os.remove(source)
+        return final_name
+
+    def delete(self, name):
+        from .models import StoredBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                # Archivo anterior al storage por contenido
+                return super().delete(name)
+            if blob.refcount > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+                return
+            blob.delete()
+            super().delete(name)
+
+    # -------------------------
+    # Hash en streaming
+    # -------------------------
+    def spool(self, content):
+        """Copia `content` a un temporal junto a los blobs mientras lo hashea."""
+        tmp_dir = self.path(os.path.join(BLOB_DIR, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    tmp.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    @staticmethod
+    def hash_file(path):
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(HASH_BLOCK), b''):
+                digest.update(block)
+                size += len(block)
+        return digest.hexdigest(), size
+
+
+media_storage = ContentAddressedStorage()
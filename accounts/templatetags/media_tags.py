@@ -0,0 +1,56 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from accounts.thumbnails import profile_image_variants
+
+register = template.Library()
+
+# Atributo `sizes` de cada variante pedida
+SIZES_ATTR = {
+    'thumb': '160px',
+    'card': '(max-width: 576px) 100vw, 480px',
+    'full': '100vw',
+}
+
+
+def _srcset(variants, fmt):
+    return ', '.join(
+        f"{v.file.url} {v.width}w" for v in sorted(variants, key=lambda v: v.width) if v.format == fmt
+    )
+
+
+@register.simple_tag
+def picture(source, size='card', alt='', css_class=''):
+    """
+    <picture> con srcset WebP y JPEG para un ProfileMedia o la foto de
+    perfil de un CustomUser. Si todavía no hay variantes usa el original.
+
+    Uso: {% picture m 'card' alt='Imagen' css_class='gallery-item' %}
+    """
+    if hasattr(source, 'profile_image'):
+        field_file, variants = source.profile_image, profile_image_variants(source)
+    else:
+        field_file, variants = source.file, list(source.variants.all())
+
+    if not field_file:
+        return ''
+    if not variants:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy">', field_file.url, alt, css_class
+        )
+
+    fallback = next(
+        (v for v in variants if v.size == size and v.format == 'jpeg'),
+        variants[0],
+    )
+    sizes = SIZES_ATTR.get(size, SIZES_ATTR['card'])
+    sources = format_html_join(
+        '', '<source type="image/webp" srcset="{}" sizes="{}">',
+        [(_srcset(variants, 'webp'), sizes)]
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" class="{}" loading="lazy"></picture>',
+        sources, fallback.file.url, _srcset(variants, 'jpeg'), sizes,
+        fallback.width, fallback.height, alt, css_class,
+    )
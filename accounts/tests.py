@@ -1,3 +1,1287 @@
-from django.test import TestCase
+import math
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import Context, Template
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.templatetags.static import static
+from django.utils import timezone
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from redshow.database import apply_pragmas
+
+from . import (
+    async_views, availability, benchmarks, contracts, fulltext, geo, hashers, jobs, matching, messaging,
+    profile_cache, reviews, search, seeding, thumbnails, throttling, uploads, user_cache,
+)
+from .backends import EmailOrUsernameBackend
+from .middleware import QueryBudgetExceeded, QueryBudgetMiddleware
+from .models import (
+    ArtistEntrepreneur, AvailabilitySlot, Conversation, ConversationMember, CustomUser, EstablishmentOwner, Inbox,
+    MediaJob, ProfileMedia, RATING_PRIOR_MEAN, RATING_PRIOR_WEIGHT, Review, StoredBlob, UploadSession,
+)
+
+
+# -------------------------
+# Migraciones
+# -------------------------
+class MigrationTestCase(TransactionTestCase):
+    """Vuelve a `migrate_from`, carga datos y migra a `migrate_to`."""
+    migrate_from = migrate_to = None
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class ScheduleMigrationTests(MigrationTestCase):
+    """0003 pasa schedule de texto a JSON: los valores viejos no pueden frenarla."""
+    migrate_from = [('accounts', '0002_profilemedia')]
+    migrate_to = [('accounts', '0003_search_indexes')]
+
+    def test_text_schedules_become_null(self):
+        apps = self.migrate(self.migrate_from)
+        CustomUser = apps.get_model('accounts', 'CustomUser')
+        EstablishmentOwner = apps.get_model('accounts', 'EstablishmentOwner')
+        schedules = {
+            'vacio': '',
+            'texto': 'Lunes a viernes de 20 a 2',
+            'objeto': '{"Lunes": {"from": "20:00", "to": "02:00"}}',
+        }
+        for username, schedule in schedules.items():
+            user = CustomUser.objects.create(username=username, user_type='owner')
+            EstablishmentOwner.objects.create(
+                user=user, business_name='Bar', business_type='Bar', address='Calle 1',
+                capacity=50, schedule=schedule,
+            )
+
+        apps = self.migrate(self.migrate_to)
+        EstablishmentOwner = apps.get_model('accounts', 'EstablishmentOwner')
+        migrated = dict(EstablishmentOwner.objects.values_list('user__username', 'schedule'))
+        self.assertEqual(migrated, {
+            'vacio': None,
+            'texto': None,
+            'objeto': {'Lunes': {'from': '20:00', 'to': '02:00'}},
+        })
+        self.assertFalse(EstablishmentOwner.objects.filter(schedule__isnull=False, user__username='vacio').exists())
+
+
+class AvailabilityMigrationTests(MigrationTestCase):
+    """0005 llena AvailabilitySlot con los horarios ya cargados."""
+    migrate_from = [('accounts', '0004_profilesearchdocument')]
+    migrate_to = [('accounts', '0005_availabilityslot')]
+
+    def test_backfill_splits_overnight_schedules(self):
+        apps = self.migrate(self.migrate_from)
+        CustomUser = apps.get_model('accounts', 'CustomUser')
+        EstablishmentOwner = apps.get_model('accounts', 'EstablishmentOwner')
+        ArtistEntrepreneur = apps.get_model('accounts', 'ArtistEntrepreneur')
+        owner = CustomUser.objects.create(username='bar', user_type='owner')
+        EstablishmentOwner.objects.create(
+            user=owner, business_name='Bar', business_type='Bar', address='Calle 1', capacity=50,
+            schedule={'Viernes': {'from': '22:00', 'to': '02:00'}, 'Lunes': {'from': 'tarde', 'to': '23:00'}},
+        )
+        artist = CustomUser.objects.create(username='banda', user_type='artist')
+        ArtistEntrepreneur.objects.create(
+            user=artist, stage_name='Banda', category='band',
+            availability={'Domingo': {'from': '20:00', 'to': '24:00'}},
+        )
+
+        apps = self.migrate(self.migrate_to)
+        AvailabilitySlot = apps.get_model('accounts', 'AvailabilitySlot')
+        slots = set(AvailabilitySlot.objects.values_list('kind', 'day', 'start_minute', 'end_minute'))
+        self.assertEqual(slots, {('owner', 4, 1320, 1440), ('owner', 5, 0, 120), ('artist', 6, 1200, 1440)})
+
+
+class PointsMigrationTests(MigrationTestCase):
+    """0017 ubica los perfiles existentes con su propia copia del geocodificador."""
+    migrate_from = [('accounts', '0016_reviews')]
+    migrate_to = [('accounts', '0017_profile_points')]
+
+    def test_backfill_matches_the_live_geocoder(self):
+        apps = self.migrate(self.migrate_from)
+        CustomUser = apps.get_model('accounts', 'CustomUser')
+        EstablishmentOwner = apps.get_model('accounts', 'EstablishmentOwner')
+        ArtistEntrepreneur = apps.get_model('accounts', 'ArtistEntrepreneur')
+        venues = {
+            'almagro': {'city': 'CABA', 'address': 'Av. Corrientes 1234, Almagro'},
+            'godoy': {'city': 'Mendoza', 'province': 'Mendoza', 'address': 'San Martín 100, Godoy Cruz'},
+            'nada': {'city': 'Ciudad Inventada'},
+        }
+        for username, fields in venues.items():
+            user = CustomUser.objects.create(username=username, user_type='owner')
+            EstablishmentOwner.objects.create(
+                user=user, business_name=username, business_type='Bar', capacity=50,
+                **{'address': 'Calle 1', **fields},
+            )
+        user = CustomUser.objects.create(username='banda', user_type='artist')
+        ArtistEntrepreneur.objects.create(user=user, stage_name='Banda', category='band', location='Rosario')
+
+        apps = self.migrate(self.migrate_to)
+        points = {}
+        for name in ('EstablishmentOwner', 'ArtistEntrepreneur'):
+            model = apps.get_model('accounts', name)
+            points.update({
+                profile.user.username: (profile.latitude, profile.longitude, profile.geohash)
+                for profile in model.objects.select_related('user')
+            })
+        for username, fields in {**venues, 'banda': {'city': 'Rosario'}}.items():
+            place = geo.geocode(**fields)
+            expected = (place.lat, place.lon, geo.encode(place.lat, place.lon)) if place else (None, None, '')
+            with self.subTest(username=username):
+                self.assertEqual(points[username], expected)
+
+
+# -------------------------
+# Configuración de SQLite y caché
+# -------------------------
+class SettingsTests(TestCase):
+    def test_journal_mode_is_only_set_when_it_differs(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        conn = sqlite3.connect(os.path.join(directory, 'copia.db'))
+        self.addCleanup(conn.close)
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+        statements = []
+        conn.set_trace_callback(statements.append)
+
+        apply_pragmas(conn, {'journal_mode': 'DELETE', 'synchronous': 'normal'})
+        self.assertEqual(statements, ['PRAGMA journal_mode', 'PRAGMA synchronous = normal'])
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+
+        apply_pragmas(conn, {'journal_mode': 'wal'})
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_tests_use_an_in_memory_cache(self):
+        self.assertEqual(settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+
+
+# -------------------------
+# Servir medios
+# -------------------------
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media_root, 'profile_media'))
+        for name in ('propio.jpg', 'huerfano.jpg'):
+            with open(os.path.join(self.media_root, 'profile_media', name), 'wb') as fh:
+                fh.write(b'jpeg')
+
+    def test_logo_is_a_static_file(self):
+        self.assertIsNotNone(finders.find('img/logo.png'))
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, static('img/logo.png'))
+        self.assertNotContains(response, '/media/logo.png')
+
+    def test_only_profile_files_are_served(self):
+        user = CustomUser.objects.create_user('artista', password='x', user_type='artist')
+        ProfileMedia.objects.create(user=user, file='profile_media/propio.jpg', status='ready')
+
+        response = self.client.get('/media/profile_media/propio.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'jpeg')
+        self.assertEqual(self.client.get('/media/profile_media/huerfano.jpg').status_code, 404)
+
+
+# -------------------------
+# Búsqueda por texto libre
+# -------------------------
+class FullTextSearchTests(TestCase):
+    """Los filtros van dentro del ranking: no se pierden resultados con muchos candidatos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = CustomUser.objects.bulk_create(
+            CustomUser(username=f'jazz{i}', user_type='artist') for i in range(560)
+        )
+        # Los de Rosario son los últimos: empatan en relevancia y quedan al final
+        profiles = ArtistEntrepreneur.objects.bulk_create(
+            ArtistEntrepreneur(
+                user=user, stage_name=f'Jazz {i}', category='musician', bio='Trío de jazz',
+                location='Rosario' if i >= 500 else 'Córdoba',
+            )
+            for i, user in enumerate(users)
+        )
+        fulltext.index_profiles(profiles)
+
+    def collect(self, filters):
+        found, cursor = [], ''
+        while True:
+            page = search.search_profiles('artist', filters, cursor, limit=25)
+            found += [p.user_id for p in page.results]
+            if not page.next_cursor:
+                return found
+            cursor = page.next_cursor
+
+    def test_filtered_results_beyond_the_first_candidates(self):
+        found = self.collect({'q': 'jazz', 'city': 'Rosario'})
+        expected = ArtistEntrepreneur.objects.filter(location='Rosario').values_list('user_id', flat=True)
+        self.assertEqual(len(found), 60)
+        self.assertEqual(set(found), set(expected))
+
+    def test_every_match_is_paginated_once(self):
+        found = self.collect({'q': 'jazz'})
+        self.assertEqual(len(found), 560)
+        self.assertEqual(len(set(found)), 560)
+
+
+# -------------------------
+# Presupuesto de consultas
+# -------------------------
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.logs = self.enterContext(self.assertLogs('accounts.queries', 'DEBUG'))
+
+    def counted(self):
+        return [line for line in self.logs.output if 'view=sin_vista status=' in line]
+
+    async def test_async_views_count_orm_queries(self):
+        async def view(request):
+            await CustomUser.objects.acount()
+            await CustomUser.objects.acount()
+            return HttpResponse('ok')
+
+        await QueryBudgetMiddleware(view)(self.request)
+        self.assertIn('queries=2 ', self.counted()[0])
+
+    async def test_async_streaming_counts_queries_of_the_whole_stream(self):
+        async def view(request):
+            async def chunks():
+                yield 'head'
+                yield str(await CustomUser.objects.acount())
+            await CustomUser.objects.acount()
+            return StreamingHttpResponse(chunks())
+
+        response = await QueryBudgetMiddleware(view)(self.request)
+        self.assertEqual(self.counted(), [])  # se loguea al terminar el stream
+        self.assertEqual([chunk async for chunk in response.streaming_content], [b'head', b'0'])
+        self.assertIn('queries=2 ', self.counted()[0])
+
+    def test_repeated_queries_are_reported(self):
+        def view(request):
+            for pk in range(3):
+                CustomUser.objects.filter(pk=pk).exists()
+            return HttpResponse('ok')
+
+        QueryBudgetMiddleware(view)(self.request)
+        self.assertIn('queries=3 ', self.counted()[0])
+        self.assertTrue(any('n_plus_one=3' in line for line in self.logs.output))
+
+    @override_settings(QUERY_BUDGETS={'sin_vista': 1}, QUERY_BUDGET_STRICT=True)
+    async def test_async_strict_budget(self):
+        async def view(request):
+            await CustomUser.objects.acount()
+            await CustomUser.objects.acount()
+            return HttpResponse('ok')
+
+        self.request.resolver_match = None
+        with self.assertRaises(QueryBudgetExceeded):
+            await QueryBudgetMiddleware(view)(self.request)
+
+
+# -------------------------
+# Login y registro async
+# -------------------------
+class AsyncAuthTests(TestCase):
+    """Las vistas async hashean en el pool de procesos de accounts/hashers.py."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(hashers.shutdown_pool)
+
+    def post(self, path, data):
+        request = AsyncRequestFactory().post(path, data)
+        request.session = SessionStore()
+        request.user = AnonymousUser()
+        return request
+
+    async def test_login_checks_the_password_in_the_pool(self):
+        user = await CustomUser.objects.acreate(username='Ana', email='ana@example.com', user_type='artist')
+        user.password = await hashers.amake_password('clave-larga-123')
+        await user.asave()
+
+        request = self.post('/accounts/login/', {'username': 'ana@example.com', 'password': 'otra'})
+        response = await async_views.login(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', request.session)
+
+        request = self.post('/accounts/login/', {'username': 'ANA', 'password': 'clave-larga-123'})
+        response = await async_views.login(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, '/dashboard/')
+        self.assertEqual(request.session['_auth_user_id'], str(user.pk))
+
+    async def test_register_hashes_in_the_pool(self):
+        response = await async_views.register(self.post('/accounts/register/', {
+            'username': 'nuevo', 'email': 'nuevo@example.com', 'confirm_email': 'nuevo@example.com',
+            'first_name': 'Nuevo', 'last_name': 'Usuario', 'birth_date': '1990-01-01', 'phone': '+5493415551234',
+            'user_type': 'owner', 'password1': 'clave-larga-123', 'password2': 'clave-larga-123',
+            'accept_terms': 'on',
+        }))
+        self.assertEqual(response.status_code, 302)
+        user = await CustomUser.objects.aget(username='nuevo')
+        self.assertTrue(user.check_password('clave-larga-123'))
+
+
+# -------------------------
+# Login con usuario o email
+# -------------------------
+class EmailOrUsernameBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def user(username, email):
+            return CustomUser.objects.create_user(username, email, f'clave-{username}', user_type='artist')
+
+        cls.ana = user('Ana', 'Ana.Perez@Example.com')
+        # El email de bruno es el username de otra cuenta
+        cls.bruno = user('bruno', 'duenio@example.com')
+        cls.duenio = user('duenio@example.com', 'otro@example.com')
+        # Email repetido en dos cuentas (el email no es único)
+        cls.carla, cls.carla_2 = user('carla', 'compartido@example.com'), user('carla2', 'compartido@example.com')
+
+    def login(self, username, password):
+        return EmailOrUsernameBackend().authenticate(None, username=username, password=password)
+
+    def test_username_or_email_without_case(self):
+        for name in ('Ana', 'ana', ' ANA ', 'ana.perez@example.com', 'ANA.PEREZ@EXAMPLE.COM'):
+            with self.subTest(name=name):
+                self.assertEqual(self.login(name, 'clave-Ana'), self.ana)
+        self.assertIsNone(self.login('ana', 'clave-otra'))
+        self.assertIsNone(self.login('nadie@example.com', 'clave-Ana'))
+
+    def test_username_wins_over_another_accounts_email(self):
+        self.assertEqual(self.login('Duenio@example.com', 'clave-duenio@example.com'), self.duenio)
+        # No se prueba con la contraseña de la cuenta que tiene ese email
+        self.assertIsNone(self.login('duenio@example.com', 'clave-bruno'))
+
+        # Aunque haya más cuentas con ese email, creadas antes, que candidatos pedidos
+        for i in range(3):
+            CustomUser.objects.create(username=f'copia_{i}', email='tarde@example.com', user_type='artist')
+        tarde = CustomUser.objects.create_user('tarde@example.com', '', 'clave-tarde', user_type='artist')
+        self.assertEqual(self.login('TARDE@example.com', 'clave-tarde'), tarde)
+        self.assertEqual(throttling.account_key('tarde@example.com'), f'id:{tarde.pk}')
+
+    def test_shared_emails_do_not_log_in(self):
+        self.assertIsNone(self.login('compartido@example.com', 'clave-carla'))
+        self.assertEqual(self.login('carla', 'clave-carla'), self.carla)
+        self.assertEqual(throttling.account_key('Compartido@example.com'), 'name:compartido@example.com')
+
+    def test_account_key_follows_the_same_resolution(self):
+        self.assertEqual(throttling.account_key(' ANA.perez@example.com '), f'id:{self.ana.pk}')
+        self.assertEqual(throttling.account_key('duenio@example.com'), f'id:{self.duenio.pk}')
+        self.assertEqual(throttling.account_key('bruno'), f'id:{self.bruno.pk}')
+
+
+# -------------------------
+# Límite de intentos de login
+# -------------------------
+@override_settings(
+    LOGIN_THROTTLE_STORE='accounts.throttling.LocMemBucketStore',
+    LOGIN_THROTTLE_RATES={'ip': (100, 60), 'ip_user': (100, 60), 'user': (3, 3600)},
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        throttling._store = None
+        self.addCleanup(setattr, throttling, '_store', None)
+        self.user = CustomUser.objects.create_user('Ana', 'ana@example.com', 'clave-larga-123', user_type='artist')
+
+    def attempt(self, username, ip='10.0.0.1'):
+        return throttling.check_login(RequestFactory().post('/', REMOTE_ADDR=ip), username)[0]
+
+    def test_username_and_email_share_the_account_bucket(self):
+        keys = {throttling.login_keys(RequestFactory().get('/'), name)['user'] for name in ('Ana', ' ana ', 'ANA@example.com')}
+        self.assertEqual(keys, {f'login:user:id:{self.user.pk}'})
+
+        self.assertTrue(self.attempt('ana'))
+        self.assertTrue(self.attempt('ana@example.com', ip='10.0.0.2'))
+        self.assertTrue(self.attempt('ANA', ip='10.0.0.3'))
+        with self.assertLogs('accounts.throttling', 'WARNING'):
+            self.assertFalse(self.attempt('Ana@Example.com', ip='10.0.0.4'))
+
+    def test_unknown_names_are_keyed_on_the_text(self):
+        self.assertEqual(throttling.login_keys(RequestFactory().get('/'), ' Nadie ')['user'], 'login:user:name:nadie')
+        for _ in range(3):
+            self.assertTrue(self.attempt('nadie'))
+        with self.assertLogs('accounts.throttling', 'WARNING'):
+            self.assertFalse(self.attempt('nadie'))
+        self.assertTrue(self.attempt('ana'))
+
+    def test_the_account_is_resolved_once_per_request(self):
+        request = RequestFactory().post('/')
+        with self.assertNumQueries(1):
+            self.assertTrue(throttling.check_login(request, 'ana@example.com')[0])
+            throttling.login_succeeded(request, 'ana@example.com')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class StrictQueryBudgetTests(TestCase):
+    """Las vistas con presupuesto en settings.QUERY_BUDGETS no se pasan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seeding.seed_users(20, media_per_user=0)
+        cls.owner = CustomUser.objects.filter(user_type='owner').first()
+        cls.artist = CustomUser.objects.filter(user_type='artist').first()
+
+    def test_views_stay_within_budget(self):
+        urls = [
+            '/accounts/publico/%s/' % self.owner.username,
+            '/accounts/publico/%s/' % self.artist.username,
+            '/accounts/buscar/?kind=owner',
+            '/accounts/buscar/?kind=artist&q=banda',
+        ]
+        for user in (self.owner, self.artist):
+            self.client.force_login(user)
+            for url in urls + ['/accounts/perfil/', '/accounts/perfil/editar/']:
+                with self.subTest(user=user.user_type, url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'buscar': 0})
+    def test_going_over_budget_fails(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'buscar'):
+            self.client.get('/accounts/buscar/?kind=owner')
+
+
+# -------------------------
+# Benchmarks
+# -------------------------
+class BenchmarkSmokeTests(TestCase):
+    """medir_rendimiento con pocos usuarios: todos los escenarios responden bien."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_every_scenario_runs(self):
+        results = benchmarks.run(users=10, requests=2, media_per_user=1)
+        self.assertEqual(set(results['scenarios']), set(benchmarks.SCENARIOS))
+        for name, result in results['scenarios'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result['requests'], 2)
+                self.assertTrue(all(code in ('200', '302') for code in result['status']), result['status'])
+        self.assertGreater(results['scenarios']['registro']['queries_per_request'], 0)
+        self.assertIn('"scenarios"', benchmarks.dumps(results))
+
+
+# -------------------------
+# Mensajería
+# -------------------------
+class MessagingCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana, cls.beto, cls.caro = [
+            CustomUser.objects.create_user(name, password='x', user_type='artist')
+            for name in ('ana', 'beto', 'caro')
+        ]
+
+    def unread(self, user):
+        state = messaging.inbox_state(user.pk)
+        return state['unread_messages'], state['unread_conversations']
+
+    def member(self, user, other):
+        return ConversationMember.objects.get(user=user, peer=other)
+
+    def counters(self):
+        return (
+            list(Inbox.objects.order_by('user_id').values_list(
+                'user_id', 'unread_messages', 'unread_conversations', 'last_message_id'
+            )),
+            list(ConversationMember.objects.order_by('id').values_list(
+                'unread_count', 'last_message_id', 'last_message_at', 'last_message_preview'
+            )),
+            list(Conversation.objects.order_by('id').values_list('message_count', 'last_message_at')),
+        )
+
+    def test_send_increments_the_counters(self):
+        messaging.send_message(self.ana, self.beto, 'Hola')
+        messaging.send_message(self.ana, self.beto, '¿Tocan el sábado?')
+        messaging.send_message(self.caro, self.beto, 'Buenas')
+        self.assertEqual(self.unread(self.beto), (3, 2))
+        self.assertEqual(self.unread(self.ana), (0, 0))
+        self.assertEqual(self.member(self.beto, self.ana).unread_count, 2)
+        self.assertEqual(messaging.find_conversation(self.ana, self.beto).message_count, 2)
+
+        # Responder no marca como leído lo que le mandaron
+        messaging.send_message(self.beto, self.ana, 'Sí')
+        self.assertEqual(self.unread(self.ana), (1, 1))
+        self.assertEqual(self.unread(self.beto), (3, 2))
+
+    def test_mark_read_never_goes_negative(self):
+        messaging.send_message(self.ana, self.beto, 'Hola')
+        messaging.send_message(self.ana, self.beto, 'Hola de nuevo')
+        member = self.member(self.beto, self.ana)
+        stale = self.member(self.beto, self.ana)
+
+        messaging.mark_read(member)
+        self.assertEqual(self.unread(self.beto), (0, 0))
+        self.assertEqual(member.unread_count, 0)
+        # Otra pestaña con la fila vieja: no descuenta de nuevo
+        messaging.mark_read(stale)
+        self.assertEqual(self.unread(self.beto), (0, 0))
+
+        messaging.send_message(self.ana, self.beto, 'Otro')
+        self.assertEqual(self.unread(self.beto), (1, 1))
+
+    def test_rebuild_matches_the_counters_kept_on_send(self):
+        messaging.send_message(self.ana, self.beto, 'Hola')
+        messaging.send_message(self.beto, self.ana, 'Hola, ¿qué tal?')
+        messaging.send_message(self.ana, self.beto, 'Todo bien')
+        messaging.send_message(self.caro, self.beto, 'x' * 300)
+        messaging.send_message(self.caro, self.ana, 'Buenas')
+        messaging.mark_read(self.member(self.ana, self.beto))
+        kept = self.counters()
+
+        messaging.rebuild_counters(batch_size=1)
+        self.assertEqual(self.counters(), kept)
+
+        Inbox.objects.update(unread_messages=9, unread_conversations=9)
+        ConversationMember.objects.update(unread_count=5, last_message_preview='')
+        Conversation.objects.update(message_count=0)
+        self.assertEqual(messaging.rebuild_counters(), 3)
+        self.assertEqual(self.counters(), kept)
+
+
+# -------------------------
+# Solicitudes de contratación
+# -------------------------
+def create_venue(username):
+    user = CustomUser.objects.create_user(username, password='x', user_type='owner')
+    return EstablishmentOwner.objects.create(
+        user=user, business_name=username, business_type='Bar', address='Calle 1', capacity=100,
+    )
+
+
+def create_artist(username):
+    user = CustomUser.objects.create_user(username, password='x', user_type='artist')
+    return ArtistEntrepreneur.objects.create(user=user, stage_name=username, category='band')
+
+
+class ContractTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.venue = create_venue('espacio')
+        cls.other_venue = create_venue('otro_espacio')
+        cls.artist = create_artist('banda')
+        cls.other_artist = create_artist('solista')
+        cls.starts_at = (timezone.now() + timedelta(days=7)).replace(minute=0, second=0, microsecond=0)
+
+    def request(self, requested_by, venue, artist, hours=(0, 3)):
+        return contracts.create_request(
+            requested_by, venue, artist,
+            self.starts_at + timedelta(hours=hours[0]), self.starts_at + timedelta(hours=hours[1]), 'Show',
+        )
+
+    def test_state_machine(self):
+        contract = self.request(self.artist.user, self.venue, self.artist)
+        self.assertEqual(contracts.allowed_transitions(contract, self.artist.user), ['cancelled'])
+        self.assertEqual(contracts.allowed_transitions(contract, self.venue.user), ['accepted', 'rejected'])
+        self.assertEqual(contracts.allowed_transitions(contract, self.other_venue.user), [])
+        with self.assertRaises(contracts.ContractError):
+            contracts.transition(contract, self.artist.user, 'accepted')
+
+        seen = contract.version
+        contracts.transition(contract, self.venue.user, 'accepted')
+        self.assertEqual((contract.status, contract.version), ('accepted', seen + 1))
+        with self.assertRaises(contracts.StaleContract):
+            # Otra pestaña con la versión vieja
+            stale = contracts.ContractRequest.objects.get(pk=contract.pk)
+            stale.status = 'pending'
+            contracts.transition(stale, self.venue.user, 'rejected', version=seen)
+
+        contracts.transition(contract, self.artist.user, 'cancelled')
+        self.assertEqual(contract.status, 'cancelled')
+        self.assertEqual(contracts.allowed_transitions(contract, self.venue.user), [])
+
+    def test_invalid_ranges_are_rejected(self):
+        with self.assertRaises(contracts.ContractError):
+            self.request(self.artist.user, self.venue, self.artist, hours=(3, 1))
+        with self.assertRaises(contracts.ContractError):
+            self.request(self.artist.user, self.venue, self.artist, hours=(0, 25))
+        with self.assertRaises(contracts.ContractError):
+            self.request(self.other_artist.user, self.venue, self.artist)
+
+    def test_accepting_rejects_overlapping_requests(self):
+        first = self.request(self.artist.user, self.venue, self.artist)
+        overlapping = self.request(self.other_artist.user, self.venue, self.other_artist, hours=(2, 5))
+        later = self.request(self.other_artist.user, self.venue, self.other_artist, hours=(3, 6))
+
+        contracts.transition(first, self.venue.user, 'accepted')
+        overlapping.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(overlapping.status, 'rejected')
+        self.assertIn('el espacio aceptó otra fecha', overlapping.status_note)
+        self.assertEqual(later.status, 'pending')  # empieza justo cuando termina la aceptada
+
+        with self.assertRaises(contracts.SlotTaken):
+            self.request(self.other_artist.user, self.venue, self.other_artist, hours=(1, 2))
+
+    def test_artist_cannot_be_booked_twice(self):
+        first = self.request(self.artist.user, self.venue, self.artist)
+        elsewhere = self.request(self.other_venue.user, self.other_venue, self.artist, hours=(1, 4))
+        contracts.transition(first, self.venue.user, 'accepted')
+        elsewhere.refresh_from_db()
+        self.assertEqual(elsewhere.status, 'rejected')
+
+        # Una pendiente que se salteó el rechazo automático igual no se acepta
+        elsewhere.status = 'pending'
+        elsewhere.save(update_fields=['status'])
+        with self.assertRaisesMessage(contracts.SlotTaken, 'artista'):
+            contracts.transition(elsewhere, self.artist.user, 'accepted')
+
+
+# -------------------------
+# Disponibilidad
+# -------------------------
+class AvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.venue = create_venue('bar')
+        cls.venue.schedule = {'Viernes': {'from': '22:00', 'to': '02:00'}}
+        cls.venue.save()
+
+    def free(self, day, start, end, cover=False):
+        return list(availability.free_user_ids('owner', day, start, end, cover=cover))
+
+    def test_overnight_ranges_split_at_midnight(self):
+        user_id = self.venue.user_id
+        slots = set(AvailabilitySlot.objects.filter(user_id=user_id).values_list('day', 'start_minute', 'end_minute'))
+        self.assertEqual(slots, {(4, 1320, 1440), (5, 0, 120)})
+
+        self.assertEqual(self.free('Sábado', '01:00', '03:00'), [user_id])
+        self.assertEqual(self.free('Viernes', '23:00', '01:30', cover=True), [user_id])
+        self.assertEqual(self.free('Viernes', '23:00', '03:00', cover=True), [])
+        self.assertEqual(self.free('Sábado', '22:00', '23:00'), [])
+
+    def test_ranges_that_only_touch_do_not_overlap(self):
+        user_id = self.venue.user_id
+        self.assertEqual(self.free('Viernes', '21:00', '22:00'), [])
+        self.assertEqual(self.free('Sábado', '02:00', '04:00'), [])
+        self.assertEqual(self.free('Viernes', '21:00', '22:01'), [user_id])
+        self.assertEqual(self.free('Sábado', '01:59', '04:00'), [user_id])
+
+        self.assertEqual(self.free('Viernes', '22:00', '24:00', cover=True), [user_id])
+        self.assertEqual(self.free(4, 1320, 1440, cover=True), [user_id])
+        self.assertEqual(self.free('Viernes', '21:59', '23:00', cover=True), [])
+
+    def test_invalid_filters_find_nobody(self):
+        invalid = [
+            ('Viernes', '25:00', '02:00'), ('Viernes', '22:00', 'tarde'), ('Viernes', '22:75', '23:00'),
+            ('Viernes', None, '23:00'), ('Feriado', '22:00', '23:00'), ('9', '22:00', '23:00'), (-1, 0, 60),
+        ]
+        for day, start, end in invalid:
+            with self.subTest(day=day, start=start, end=end):
+                self.assertEqual(self.free(day, start, end), [])
+
+        # El buscador pasa los filtros del GET tal cual
+        filters = {'day': 'viernes', 'start': '22:00', 'end': '23:00'}
+        self.assertEqual(list(search.build_queryset('owner', filters)), [])
+        filters['day'] = '4'
+        self.assertEqual(list(search.build_queryset('owner', filters)), [self.venue])
+
+
+# -------------------------
+# Emparejamiento
+# -------------------------
+class MatchingTests(TestCase):
+    """El top-k por planos de bits tiene que dar lo mismo que puntuar pareja por pareja."""
+    LOCALITIES = ['Rosario', 'Santa Fe', 'Córdoba']
+    HOURS = ['18:00', '19:30', '20:00', '21:15', '22:00', '23:00', '00:30', '02:00']
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(4)
+
+        def schedule():
+            days = rng.sample(availability.DAYS_OF_WEEK, rng.randint(1, 3))
+            return {day: {'from': rng.choice(cls.HOURS), 'to': rng.choice(cls.HOURS)} for day in days}
+
+        for i in range(60):
+            user = CustomUser.objects.create(username=f'artista_{i}', user_type='artist', is_active=i % 17 != 0)
+            ArtistEntrepreneur.objects.create(
+                user=user, stage_name=f'Artista {i}', category=rng.choice(['band', 'dj']),
+                location=rng.choice(cls.LOCALITIES + ['']), experience_years=rng.choice([0, 0, 1, 2, 40]),
+                availability=schedule() if i % 11 else None,
+            )
+        for i in range(8):
+            user = CustomUser.objects.create(username=f'espacio_{i}', user_type='owner')
+            EstablishmentOwner.objects.create(
+                user=user, business_name=f'Espacio {i}', business_type='Bar', address='Calle 1', capacity=80,
+                city=rng.choice(['Rosario', 'Córdoba', 'Mendoza']), province='Santa Fe' if i % 2 else '',
+                schedule=schedule(),
+            )
+
+    def slots(self, kind):
+        result = {}
+        for user_id, day, start, end in AvailabilitySlot.objects.filter(kind=kind).values_list(
+            'user_id', 'day', 'start_minute', 'end_minute'
+        ):
+            first = day * matching.SLOTS_PER_DAY
+            result.setdefault(user_id, set()).update(
+                range(first + start // matching.SLOT_MINUTES, first + math.ceil(end / matching.SLOT_MINUTES))
+            )
+        return result
+
+    def brute_force(self, top_k, categories=None):
+        artists = ArtistEntrepreneur.objects.filter(user__is_active=True)
+        if categories:
+            artists = artists.filter(category__in=categories)
+        artist_slots, venue_slots = self.slots('artist'), self.slots('owner')
+        results = {}
+        for venue in EstablishmentOwner.objects.all():
+            localities = {fulltext.fold(venue.city).strip(), fulltext.fold(venue.province).strip()} - {''}
+            scored = []
+            for artist in artists:
+                if fulltext.fold(artist.location).strip() not in localities:
+                    continue
+                overlap = len(artist_slots.get(artist.user_id, set()) & venue_slots.get(venue.user_id, set()))
+                experience = min(artist.experience_years, (1 << matching.EXPERIENCE_BITS) - 1)
+                if overlap:
+                    scored.append((-overlap, -experience, artist.user_id))
+            results[venue.user_id] = [
+                (user_id, -overlap * matching.SLOT_MINUTES) for overlap, _, user_id in sorted(scored)[:top_k]
+            ]
+        return results
+
+    def test_top_k_matches_brute_force(self):
+        for top_k in (1, 3, 5, 100):
+            with self.subTest(top_k=top_k):
+                ranked = matching.rank_artists_for_venues(top_k=top_k)
+                self.assertEqual(ranked, self.brute_force(top_k))
+        self.assertEqual(matching.rank_artists_for_venues(top_k=4, categories=['dj']), self.brute_force(4, ['dj']))
+
+    def test_ties_and_short_lists(self):
+        # El conjunto de datos tiene empates completos (minutos y
+        # experiencia) dentro de un mismo espacio y listas más cortas que k
+        experience = dict(ArtistEntrepreneur.objects.values_list('user_id', 'experience_years'))
+        ranked = matching.rank_artists_for_venues(top_k=100)
+        self.assertTrue(any(
+            len({(minutes, experience[user_id]) for user_id, minutes in matches}) < len(matches)
+            for matches in ranked.values()
+        ))
+        self.assertTrue(any(0 < len(matches) < 100 for matches in ranked.values()))
+
+
+# -------------------------
+# Ubicación
+# -------------------------
+class GeoTests(TestCase):
+    def in_cover(self, lat, lon, ranges):
+        geohash = geo.encode(lat, lon)
+        return any(low <= geohash and (high is None or geohash < high) for low, high in ranges)
+
+    def test_cover_contains_the_whole_box(self):
+        boxes = [
+            (-0.001, -0.001, 0.001, 0.001),  # (0, 0) es borde de celda en todas las precisiones
+            (-34.62, -58.45, -34.58, -58.40),
+            (-35.5, -59.5, -33.5, -57.5),
+            (89.9, 179.9, 90, 180),  # última celda: el rango no tiene fin
+            (-90, -180, -89.9, -179.9),
+            (-20, 179.5, -10, 180),
+        ]
+        for box in boxes:
+            ranges = geo.cover(box)
+            self.assertLessEqual(len(ranges), geo.MAX_CELLS)
+            for step_lat in range(11):
+                for step_lon in range(11):
+                    lat = box[0] + (box[2] - box[0]) * step_lat / 10
+                    lon = box[1] + (box[3] - box[1]) * step_lon / 10
+                    with self.subTest(box=box, lat=lat, lon=lon):
+                        self.assertTrue(self.in_cover(lat, lon, ranges))
+        self.assertIsNone(geo.cover(boxes[3])[-1][1])
+        self.assertEqual(geo.cover(boxes[4])[0][0].strip('0'), '')
+
+    def test_boxes_split_at_the_antimeridian(self):
+        self.assertEqual(len(geo.bounding_boxes(-34.6, -58.4, 50)), 1)
+        east, west = geo.bounding_boxes(-16.5, 179.9, 50)
+        self.assertEqual(east[3], 180)
+        self.assertEqual(west[1], -180)
+        self.assertGreater(west[3], -180)
+        (polar,) = geo.bounding_boxes(-89.9, 0, 50)
+        self.assertEqual((polar[0], polar[1], polar[3]), (-90, -180, 180))
+
+    def test_nearest_is_ordered_and_matches_brute_force(self):
+        rng = random.Random(25)
+        points = [(rng.uniform(-35, -34), rng.uniform(-59, -58)) for _ in range(40)]
+        points += [(-16.5, 179.95), (-16.5, -179.95), (-16.6, 179.5)]
+        for i, (lat, lon) in enumerate(points):
+            user = CustomUser.objects.create(username=f'espacio_{i}', user_type='owner')
+            venue = EstablishmentOwner.objects.create(
+                user=user, business_name=f'Espacio {i}', business_type='Bar', address='Calle 1', capacity=80,
+            )
+            EstablishmentOwner.objects.filter(pk=venue.pk).update(
+                latitude=lat, longitude=lon, geohash=geo.encode(lat, lon)
+            )
+        queryset = EstablishmentOwner.objects.all()
+        rows = list(queryset.values_list('id', 'latitude', 'longitude'))
+
+        for lat, lon in [(-34.5, -58.5), (-34, -60), (-16.5, 179.99), (-16.5, -179.99)]:
+            expected = sorted(
+                (distance, pk) for pk, row_lat, row_lon in rows
+                if (distance := geo.haversine_km(lat, lon, row_lat, row_lon)) <= geo.MAX_SEARCH_KM
+            )
+            for k in (1, 5, 50):
+                with self.subTest(lat=lat, lon=lon, k=k):
+                    hits = geo.nearest(queryset, lat, lon, k)
+                    self.assertEqual(hits, expected[:k])
+                    self.assertEqual(hits, sorted(hits))
+            radius = expected[2][0] + 0.001
+            self.assertEqual(geo.within_radius(queryset, lat, lon, radius), expected[:3])
+
+        # El segundo más cercano está del otro lado del antimeridiano
+        second = geo.nearest(queryset, -16.5, 179.99, 2)[1]
+        self.assertEqual(EstablishmentOwner.objects.get(pk=second[1]).longitude, -179.95)
+        self.assertAlmostEqual(second[0], 6.4, delta=0.1)
+
+    def test_geocode(self):
+        rosario = geo.geocode(city='Rosario', province='Santa Fe')
+        self.assertEqual((rosario.kind, rosario.name), ('ciudad', 'Rosario'))
+        # Barrio de la ciudad, por campo o por lo que sigue a la calle
+        self.assertEqual(geo.geocode(city='Rosario', neighborhood='Barrio Alberdi').lat, -32.895)
+        self.assertEqual(geo.geocode(city='Córdoba', neighborhood='Alberdi').lat, -31.41)
+        almagro = geo.geocode(city='CABA', address='Av. Corrientes 1234, Almagro')
+        self.assertEqual((almagro.kind, almagro.name), ('barrio', 'Almagro'))
+        # Otra localidad de la misma provincia cargada como barrio
+        self.assertEqual(geo.geocode(city='Mendoza', neighborhood='Godoy Cruz').name, 'Godoy Cruz')
+        # La provincia desempata los nombres repetidos
+        self.assertEqual(geo.geocode(city='San Martín', province='Mendoza').province, 'Mendoza')
+        self.assertEqual(geo.geocode(city='San Martín', province='Bs As').province, 'Buenos Aires')
+        # Un barrio desconocido deja el centro de la ciudad
+        self.assertEqual(geo.geocode(city='Rosario', neighborhood='Inventado'), rosario)
+        self.assertIsNone(geo.geocode(city='Ciudad Inventada'))
+        self.assertIsNone(geo.geocode())
+
+
+# -------------------------
+# Reseñas
+# -------------------------
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.artist = create_artist('banda')
+        cls.authors = [create_venue(f'espacio_{i}').user for i in range(3)]
+
+    def aggregate(self):
+        self.artist.refresh_from_db()
+        stars = [getattr(self.artist, f'stars_{n}') for n in range(1, 6)]
+        return self.artist.rating_count, self.artist.rating_sum, stars
+
+    def assertScore(self, count, total):
+        expected = (total + RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT) / (count + RATING_PRIOR_WEIGHT)
+        self.assertAlmostEqual(self.artist.rating_score, expected)
+
+    def test_create_edit_and_delete(self):
+        subject = self.artist.user
+        reviews.save_review(self.authors[0], subject, 5)
+        reviews.save_review(self.authors[1], subject, 3)
+        self.assertEqual(self.aggregate(), (2, 8, [0, 0, 1, 0, 1]))
+        self.assertScore(2, 8)
+
+        reviews.save_review(self.authors[1], subject, 1, 'Llegaron tarde')
+        self.assertEqual(self.aggregate(), (2, 6, [1, 0, 0, 0, 1]))
+        reviews.save_review(self.authors[1], subject, 1, 'Llegaron muy tarde')
+        self.assertEqual(self.aggregate(), (2, 6, [1, 0, 0, 0, 1]))
+
+        reviews.delete_review(subject.reviews_received.get(author=self.authors[0]))
+        self.assertEqual(self.aggregate(), (1, 1, [1, 0, 0, 0, 0]))
+        self.assertScore(1, 1)
+
+        # Borrar al autor borra la reseña en cascada
+        reviews.save_review(self.authors[2], subject, 4)
+        self.authors[2].delete()
+        self.assertEqual(self.aggregate(), (1, 1, [1, 0, 0, 0, 0]))
+        self.assertEqual(reviews.rebuild_aggregates(), 0)
+
+    def test_deleting_twice_discounts_once(self):
+        review = reviews.save_review(self.authors[0], self.artist.user, 4)
+        reviews.save_review(self.authors[1], self.artist.user, 2)
+        # Dos requests con la misma reseña cargada
+        stale = Review.objects.get(pk=review.pk)
+        self.assertTrue(reviews.delete_review(review))
+        self.assertFalse(reviews.delete_review(stale))
+        self.assertEqual(self.aggregate(), (1, 2, [0, 1, 0, 0, 0]))
+        self.assertEqual(reviews.rebuild_aggregates(), 0)
+
+    def test_rebuild_fixes_drifted_aggregates(self):
+        reviews.save_review(self.authors[0], self.artist.user, 4)
+        ArtistEntrepreneur.objects.filter(pk=self.artist.pk).update(rating_count=7, stars_2=3)
+        self.assertEqual(reviews.rebuild_aggregates(), 1)
+        self.assertEqual(self.aggregate(), (1, 4, [0, 0, 0, 1, 0]))
+
+    def test_invalid_reviews(self):
+        with self.assertRaises(reviews.ReviewError):
+            reviews.save_review(self.artist.user, self.artist.user, 5)
+        with self.assertRaises(reviews.ReviewError):
+            reviews.save_review(self.authors[0], self.artist.user, 6)
+        self.assertEqual(self.aggregate(), (0, 0, [0, 0, 0, 0, 0]))
+
+
+# -------------------------
+# Variantes de imágenes
+# -------------------------
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media_root, 'profile_media'))
+        self.user = CustomUser.objects.create_user('artista', password='x', user_type='artist')
+
+    def image(self, name, size):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, format='JPEG')
+        with open(os.path.join(self.media_root, 'profile_media', name), 'wb') as fh:
+            fh.write(buffer.getvalue())
+        return ProfileMedia.objects.create(
+            user=self.user, file=f'profile_media/{name}', media_type='image', status='ready'
+        )
+
+    def render(self, source):
+        return Template("{% load media_tags %}{% picture source 'card' alt='Foto' %}").render(
+            Context({'source': source})
+        )
+
+    def test_variants_are_scaled_down_but_never_up(self):
+        media = self.image('grande.jpg', (2000, 1000))
+        variants = thumbnails.generate_variants(media.file, self.user.pk, media)
+        sizes = {(v.size, v.format): (v.width, v.height) for v in variants}
+        self.assertEqual(sizes, {
+            ('thumb', 'webp'): (160, 80), ('thumb', 'jpeg'): (160, 80),
+            ('card', 'webp'): (480, 240), ('card', 'jpeg'): (480, 240),
+            ('full', 'webp'): (1280, 640), ('full', 'jpeg'): (1280, 640),
+        })
+
+        small = self.image('chica.jpg', (100, 50))
+        widths = {v.width for v in thumbnails.generate_variants(small.file, self.user.pk, small)}
+        self.assertEqual(widths, {100})
+
+    def test_regenerating_replaces_variants_and_skips_non_images(self):
+        media = self.image('grande.jpg', (2000, 1000))
+        thumbnails.generate_variants(media.file, self.user.pk, media)
+        thumbnails.generate_variants(media.file, self.user.pk, media)
+        self.assertEqual(media.variants.count(), 6)
+
+        with open(os.path.join(self.media_root, 'profile_media', 'roto.jpg'), 'wb') as fh:
+            fh.write(b'no es una imagen')
+        broken = ProfileMedia.objects.create(user=self.user, file='profile_media/roto.jpg', media_type='image')
+        self.assertEqual(thumbnails.generate_variants(broken.file, self.user.pk, broken), [])
+
+    def test_picture_tag_uses_the_variants_or_the_original(self):
+        media = self.image('grande.jpg', (2000, 1000))
+        html = self.render(media)
+        self.assertNotIn('<picture>', html)
+        self.assertIn(f'<img src="{media.file.url}" alt="Foto"', html)
+
+        thumbnails.generate_variants(media.file, self.user.pk, media)
+        media = ProfileMedia.objects.prefetch_related('variants').get(pk=media.pk)
+        card = media.variants.get(size='card', format='jpeg')
+        html = self.render(media)
+        self.assertIn('<picture><source type="image/webp"', html)
+        self.assertIn(f'<img src="{card.file.url}"', html)
+        self.assertIn('width="480" height="240"', html)
+        self.assertIn(' 160w, ', html)
+
+    def test_missing_only_includes_users_without_any_variants(self):
+        media = self.image('grande.jpg', (2000, 1000))
+        thumbnails.generate_variants(media.file, self.user.pk, media)
+        CustomUser.objects.filter(pk=self.user.pk).update(profile_image=media.file.name)
+        other = CustomUser.objects.create_user('otro', password='x', user_type='artist')
+        CustomUser.objects.filter(pk=other.pk).update(profile_image=media.file.name)
+
+        out = StringIO()
+        call_command('generar_variantes', '--missing-only', stdout=out)
+        self.assertIn('2 imágenes procesadas', out.getvalue())
+        self.assertEqual(self.user.media_variants.filter(media=None).count(), 6)
+        self.assertEqual(other.media_variants.count(), 6)
+
+        out = StringIO()
+        call_command('generar_variantes', '--missing-only', stdout=out)
+        self.assertIn('0 imágenes procesadas', out.getvalue())
+
+
+# -------------------------
+# Deduplicar medios
+# -------------------------
+class DeduplicateMediaTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media_root, 'profile_media'))
+        for name in ('viejo.jpg', 'copia.jpg'):
+            with open(os.path.join(self.media_root, 'profile_media', name), 'wb') as fh:
+                fh.write(b'misma imagen')
+
+        self.user = CustomUser.objects.create_user('artista', password='x', user_type='artist')
+        # Dos filas con el mismo archivo viejo y una tercera con una copia
+        for name in ('viejo.jpg', 'viejo.jpg', 'copia.jpg'):
+            ProfileMedia.objects.create(user=self.user, file=f'profile_media/{name}', status='ready')
+        CustomUser.objects.filter(pk=self.user.pk).update(profile_image='profile_media/viejo.jpg')
+
+    def dedupe(self, *args):
+        call_command('deduplicar_medios', *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_rows_sharing_a_file_point_to_one_blob(self):
+        self.dedupe()
+        names = set(ProfileMedia.objects.values_list('file', flat=True))
+        names.add(CustomUser.objects.get(pk=self.user.pk).profile_image.name)
+        self.assertEqual(len(names), 1)
+        blob = StoredBlob.objects.get()
+        self.assertEqual(names, {blob.name})
+        self.assertEqual(blob.refcount, 4)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'profile_media')), [])
+
+    def test_a_failed_repoint_leaves_no_references_behind(self):
+        with mock.patch('accounts.management.commands.deduplicar_medios.recount', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.dedupe()
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertEqual(
+            set(ProfileMedia.objects.values_list('file', flat=True)),
+            {'profile_media/viejo.jpg', 'profile_media/copia.jpg'},
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, 'profile_media', 'viejo.jpg')))
+
+        self.dedupe()
+        self.assertEqual(StoredBlob.objects.get().refcount, 4)
+
+    def test_recount_fixes_drifted_refcounts(self):
+        self.dedupe()
+        StoredBlob.objects.update(refcount=9)
+        self.dedupe('--recontar')
+        self.assertEqual(StoredBlob.objects.get().refcount, 4)
+
+
+# -------------------------
+# Worker de medios
+# -------------------------
+def crash_on_three(kind, object_id):
+    """run_job de prueba: el trabajo 3 mata al proceso del pool."""
+    time.sleep(0.2)
+    if object_id == 3:
+        os._exit(1)
+    return None
+
+
+class MediaWorkerTests(TestCase):
+    def test_a_dead_process_only_fails_its_own_job(self):
+        for object_id in range(1, 6):
+            jobs.enqueue('media_variants', object_id, max_attempts=1)
+
+        with mock.patch.object(jobs, 'run_job', crash_on_three):
+            call_command('procesar_medios', processes=3, once=True, poll_interval=0.1, stdout=StringIO())
+
+        status = dict(MediaJob.objects.values_list('object_id', 'status'))
+        self.assertEqual(status, {1: 'done', 2: 'done', 3: 'failed', 4: 'done', 5: 'done'})
+        self.assertIn('BrokenProcessPool', MediaJob.objects.get(object_id=3).last_error)
+        # Los que compartían el pool roto no pierden intentos
+        self.assertEqual(set(MediaJob.objects.values_list('attempts', flat=True)), {1})
+
+
+# -------------------------
+# Subidas por partes
+# -------------------------
+class UploadExpiryTests(TestCase):
+    def setUp(self):
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir)
+        override = override_settings(CHUNKED_UPLOAD_DIR=upload_dir, CHUNKED_UPLOAD_EXPIRY=3600)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = CustomUser.objects.create_user('artista', password='x', user_type='artist')
+
+    def session(self, hours_ago, status='open'):
+        session = uploads.create_session(self.user, 'video.mp4', 10, 'a' * 64)
+        updated_at = timezone.now() - timedelta(hours=hours_ago)
+        UploadSession.objects.filter(pk=session.pk).update(status=status, updated_at=updated_at)
+        os.utime(uploads.part_path(session), (updated_at.timestamp(),) * 2)
+        return session
+
+    def test_stale_open_sessions_and_their_files_are_removed(self):
+        stale = self.session(hours_ago=2)
+        active = self.session(hours_ago=0)
+        finished = self.session(hours_ago=2, status='complete')  # quedó el .part
+
+        self.assertEqual(uploads.expire_sessions(), (1, 2))
+        self.assertFalse(UploadSession.objects.filter(pk=stale.pk).exists())
+        self.assertTrue(UploadSession.objects.filter(pk=finished.pk).exists())
+        self.assertEqual(os.listdir(uploads.upload_dir()), [f'{active.pk}.part'])
+
+    def test_a_new_chunk_keeps_the_session_alive(self):
+        session = self.session(hours_ago=2)
+        uploads.append_chunk(session, 0, BytesIO(b'12345'), 5)
+        self.assertEqual(uploads.expire_sessions(), (0, 0))
+
+    def test_purgar_sesiones_runs_the_sweep(self):
+        self.session(hours_ago=2)
+        out = StringIO()
+        call_command('purgar_sesiones', stdout=out)
+        self.assertIn('1 subidas abandonadas y 1 archivos .part borrados', out.getvalue())
+
+
+class UploadConcurrencyTests(TransactionTestCase):
+    """Dos PATCH con el mismo offset: se escribe una sola parte, entera."""
+
+    def setUp(self):
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir)
+        override = override_settings(CHUNKED_UPLOAD_DIR=upload_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        user = CustomUser.objects.create(username='artista', user_type='artist')
+        self.session = uploads.create_session(user, 'video.mp4', 10, 'a' * 64)
+
+    class SlowStream:
+        """Entrega la parte de a un byte, como una conexión lenta."""
+
+        def __init__(self, data):
+            self.data = BytesIO(data)
+
+        def read(self, size):
+            time.sleep(0.005)
+            return self.data.read(1)
+
+    def append(self, data, results):
+        try:
+            session = UploadSession.objects.get(pk=self.session.pk)
+            uploads.append_chunk(session, 0, self.SlowStream(data), len(data))
+            results.append(data)
+        except uploads.OffsetMismatch as exc:
+            results.append(exc)
+        finally:
+            connection.close()
+
+    def test_same_offset_chunks_do_not_interleave(self):
+        results = []
+        threads = [threading.Thread(target=self.append, args=(data, results)) for data in (b'AAAAA', b'BBBBB')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        written = [result for result in results if isinstance(result, bytes)]
+        self.assertEqual(len(written), 1)
+        self.assertEqual(sum(isinstance(result, uploads.OffsetMismatch) for result in results), 1)
+        with open(uploads.part_path(self.session), 'rb') as fh:
+            self.assertEqual(fh.read(), written[0])
+        self.assertEqual(UploadSession.objects.get(pk=self.session.pk).received_bytes, 5)
+
+    def test_aborted_sessions_reject_chunks(self):
+        session = UploadSession.objects.get(pk=self.session.pk)
+        uploads.abort_session(UploadSession.objects.get(pk=self.session.pk))
+        with self.assertRaisesMessage(uploads.UploadError, 'ya no está abierta'):
+            uploads.append_chunk(session, 0, BytesIO(b'12345'), 5)
+
+
+# -------------------------
+# Caché del usuario autenticado
+# -------------------------
+class UserCacheTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.artist = create_artist('banda')
+        self.user = self.artist.user
+        self.client.force_login(self.user)
+
+    def test_profile_edit_does_not_revert_changes_from_another_process(self):
+        # Este proceso guarda al usuario en su caché
+        self.assertEqual(self.client.get('/accounts/perfil/editar/').status_code, 200)
+        # Otro proceso cambia la contraseña (update(): sin señales, la caché de acá no se entera)
+        CustomUser.objects.filter(pk=self.user.pk).update(password=hashers.hashers.make_password('nueva-clave-123'))
+
+        response = self.client.post('/accounts/perfil/editar/', {
+            'first_name': 'Nuevo', 'last_name': 'Nombre', 'email': 'banda@example.com',
+            'phone': '+5493511234567', 'birth_date': '1990-05-01', 'dni': '',
+            'stage_name': 'Banda', 'category': 'band', 'experience_years': 3, 'availability_json': '{}',
+        })
+        self.assertEqual(response.status_code, 302)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(user.first_name, 'Nuevo')
+        self.assertTrue(user.check_password('nueva-clave-123'))
+
+
+# -------------------------
+# Caché del perfil público
+# -------------------------
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProfileCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.venue = create_venue('espacio')
+        self.url = '/accounts/publico/espacio/'
+
+    def cached_card(self):
+        user_id = profile_cache.cached_user_id('espacio')
+        return user_id and profile_cache.get_fragment(user_id, 'card', profile_cache.version(user_id))
+
+    def test_a_save_between_read_and_write_drops_the_fragment(self):
+        seen = profile_cache.version(self.venue.user_id)
+        # ... el request lee la base, y otro guarda el perfil
+        with self.captureOnCommitCallbacks(execute=True):
+            profile_cache.invalidate(self.venue.user_id)
+        self.assertFalse(profile_cache.set_fragment(self.venue.user_id, 'card', 'vieja', seen))
+        self.assertIsNone(profile_cache.get_fragment(self.venue.user_id, 'card', seen))
+        current = profile_cache.version(self.venue.user_id)
+        self.assertIsNone(profile_cache.get_fragment(self.venue.user_id, 'card', current))
+
+    def test_profile_and_media_edits_invalidate_the_card(self):
+        self.client.get(self.url)  # aprende el id
+        self.client.get(self.url)  # guarda la tarjeta
+        self.assertIn('espacio', self.cached_card()['html'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.venue.business_name = 'Los Nuevos'
+            self.venue.save()
+        self.assertIsNone(self.cached_card())
+        self.assertContains(self.client.get(self.url), 'Los Nuevos')
+        self.assertIsNotNone(self.cached_card())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProfileMedia.objects.create(user=self.venue.user, file='profile_media/x.mp4', media_type='video', status='ready')
+        self.assertIsNone(self.cached_card())
+
+    def test_anonymous_pages_are_cached_per_version(self):
+        self.client.get(self.url)
+        first = self.client.get(self.url).content
+        self.assertEqual(self.client.get(self.url).content, first)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.venue.business_name = 'Otro Nombre'
+            self.venue.save()
+        self.assertContains(self.client.get(self.url), 'Otro Nombre')
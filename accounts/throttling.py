@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('accounts.throttling')
+
+
+# -------------------------
+# Límite de intentos de login (token bucket)
+# -------------------------
+# Cada clave (IP, IP+usuario, usuario) tiene un balde de `capacity` fichas
+# que se rellena a `capacity / period` fichas por segundo. Cada intento de
+# login gasta una ficha y se chequea ANTES de validar el formulario, así un
+# ataque de fuerza bruta no consume CPU en hashear contraseñas. Un login
+# correcto vacía el registro de la IP+usuario y del usuario.
+# Guardar un balde son dos números, y tomar una ficha es O(1).
+#
+# El "usuario" es la cuenta (su pk) si el texto ingresado la identifica, así
+# username y email comparten balde y variar mayúsculas no da intentos de más.
+# El balde por cuenta es un límite duro, a propósito: es lo único que frena
+# una fuerza bruta repartida entre muchas IPs. El costo es que quien siga
+# gastando fichas de una cuenta la deja sin login mientras dure el ataque
+# (cada ficha nueva llega a los period/capacity segundos de 'user'); para
+# eso se mira la métrica blocked_user en login_metricas.
+class Rate(NamedTuple):
+    capacity: int
+    period: float  # segundos para rellenar el balde completo
+
+    @property
+    def per_second(self):
+        return self.capacity / self.period
+
+
+def rates():
+    return {scope: Rate(*value) for scope, value in settings.LOGIN_THROTTLE_RATES.items()}
+
+
+def refill(tokens, updated_at, rate, now):
+    return min(rate.capacity, tokens + (now - updated_at) * rate.per_second)
+
+
+def spend(tokens, rate):
+    """Gasta una ficha si hay. Devuelve (fichas, (permitido, segundos a esperar))."""
+    if tokens >= 1:
+        return tokens - 1, (True, 0)
+    return tokens, (False, (1 - tokens) / rate.per_second)
+
+
+class LocMemBucketStore:
+    """
+    Baldes en memoria del proceso. Con `max_keys` acotado (se descarta el
+    menos usado), un ataque con muchas IPs no hace crecer la memoria.
+    """
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, requests, now):
+        """`requests`: [(clave, Rate)]. Devuelve [(permitido, espera)] en el mismo orden."""
+        results = []
+        with self.lock:
+            for key, rate in requests:
+                tokens, updated_at = self.buckets.pop(key, (rate.capacity, now))
+                tokens, result = spend(refill(tokens, updated_at, rate, now), rate)
+                self.buckets[key] = (tokens, now)
+                results.append(result)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return results
+
+    def reset(self, key):
+        with self.lock:
+            self.buckets.pop(key, None)
+
+
+class DatabaseBucketStore:
+    """Baldes en la tabla ThrottleBucket: compartidos entre procesos y servidores."""
+
+    def take(self, requests, now):
+        """Todas las claves en una transacción: un SELECT y un upsert."""
+        from .models import ThrottleBucket
+
+        results = []
+        with transaction.atomic():
+            current = {
+                bucket.key: bucket
+                for bucket in ThrottleBucket.objects.select_for_update()
+                .filter(key__in=[key for key, _ in requests])
+            }
+            updated = []
+            for key, rate in requests:
+                bucket = current.get(key)
+                tokens = rate.capacity if bucket is None else refill(bucket.tokens, bucket.updated_at, rate, now)
+                tokens, result = spend(tokens, rate)
+                updated.append(ThrottleBucket(key=key, tokens=tokens, updated_at=now))
+                results.append(result)
+            ThrottleBucket.objects.bulk_create(
+                updated, update_conflicts=True, unique_fields=['key'], update_fields=['tokens', 'updated_at'],
+            )
+        return results
+
+    def reset(self, key):
+        from .models import ThrottleBucket
+
+        ThrottleBucket.objects.filter(key=key).delete()
+
+    def purge(self, older_than):
+        """Borra baldes sin uso en `older_than` segundos (ya estarían llenos)."""
+        from .models import ThrottleBucket
+
+        return ThrottleBucket.objects.filter(updated_at__lt=time.time() - older_than).delete()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = import_string(settings.LOGIN_THROTTLE_STORE)()
+        return _store
+
+
+# -------------------------
+# Métricas
+# -------------------------
+METRICS = Counter()
+METRICS_LOCK = threading.Lock()
+
+
+def count(name):
+    with METRICS_LOCK:
+        METRICS[name] += 1
+
+
+def metrics_summary():
+    with METRICS_LOCK:
+        return dict(METRICS)
+
+
+# -------------------------
+# Login
+# -------------------------
+def client_ip(request):
+    """REMOTE_ADDR, o la IP que agregó el último proxy confiable en X-Forwarded-For."""
+    proxies = settings.LOGIN_THROTTLE_TRUSTED_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [ip.strip() for ip in forwarded.split(',')]
+        return hops[-proxies] if len(hops) >= proxies else hops[0]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def account_key(username):
+    """
+    'id:<pk>' si el texto identifica una cuenta (por username o email, como
+    EmailOrUsernameBackend); si no, el texto normalizado.
+    """
+    from .backends import EmailOrUsernameBackend
+
+    username = (username or '').strip()
+    if username:
+        user = EmailOrUsernameBackend.pick_user(list(EmailOrUsernameBackend.candidates(username)), username)
+        if user is not None:
+            return f'id:{user.pk}'
+    return 'name:' + username.lower()[:150]
+
+
+def login_keys(request, username):
+    ip = client_ip(request)
+    # check_login() y login_succeeded() resuelven la misma cuenta: una consulta por request
+    accounts = request.__dict__.setdefault('_login_accounts', {})
+    if username not in accounts:
+        accounts[username] = account_key(username)
+    account = accounts[username]
+    return {
+        'ip': f'login:ip:{ip}',
+        'ip_user': f'login:ip_user:{ip}:{account}',
+        'user': f'login:user:{account}',
+    }
+
+
+def check_login(request, username):
+    """
+    Gasta una ficha de cada balde. Devuelve (permitido, segundos a esperar).
+    Si un balde está vacío el intento se rechaza sin tocar la contraseña.
+    """
+    limits = rates()
+    keys = login_keys(request, username)
+    results = get_store().take([(key, limits[scope]) for scope, key in keys.items()], time.time())
+    retry_after = 0
+    blocked_by = None
+    for scope, (allowed, wait) in zip(keys, results):
+        if not allowed:
+            blocked_by = blocked_by or scope
+            retry_after = max(retry_after, wait)
+
+    count('attempts')
+    if blocked_by:
+        count('blocked')
+        count(f'blocked_{blocked_by}')
+        logger.warning('login bloqueado scope=%s ip=%s retry_after=%.0f', blocked_by, client_ip(request), retry_after)
+        return False, retry_after
+    return True, 0
+
+
+def login_succeeded(request, username):
+    store = get_store()
+    keys = login_keys(request, username)
+    store.reset(keys['ip_user'])
+    store.reset(keys['user'])
+    count('succeeded')
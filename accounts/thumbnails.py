@@ -0,0 +1,98 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import MediaVariant
+
+
+# -------------------------
+# Variantes de imágenes
+# -------------------------
+# Ancho máximo de cada variante. Las imágenes más chicas no se agrandan.
+VARIANT_WIDTHS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def variant_name(source_name, size, fmt):
+    stem, _ = os.path.splitext(source_name)
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f"{stem}_{size}.{extension}"
+
+
+def open_image(field_file):
+    """Abre la imagen ya rotada según EXIF y en RGB (sin canal alfa)."""
+    field_file.open('rb')
+    try:
+        image = Image.open(field_file)
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        return image
+    finally:
+        field_file.close()
+
+
+def render_variants(image):
+    """Genera (tamaño, formato, ancho, alto, bytes) para cada variante."""
+    for size, max_width in VARIANT_WIDTHS.items():
+        resized = image.copy()
+        if resized.width > max_width:
+            height = round(resized.height * max_width / resized.width)
+            resized = resized.resize((max_width, height), Image.LANCZOS)
+        for fmt, options in SAVE_OPTIONS.items():
+            buffer = BytesIO()
+            # Al re-codificar no se copian los metadatos EXIF del original
+            resized.save(buffer, **options)
+            yield size, fmt, resized.width, resized.height, buffer.getvalue()
+
+
+def generate_variants(field_file, user_id, media=None):
+    """
+    Crea las variantes de `field_file` (ProfileMedia.file o
+    CustomUser.profile_image) en el mismo storage y directorio que el
+    original. Reemplaza las variantes anteriores. Devuelve la lista de
+    MediaVariant creadas ([] si el archivo no es una imagen válida).
+    """
+    delete_variants(user_id, media)
+    try:
+        image = open_image(field_file)
+    except (UnidentifiedImageError, OSError):
+        return []
+
+    storage = field_file.storage
+    variants = []
+    for size, fmt, width, height, data in render_variants(image):
+        name = storage.save(variant_name(field_file.name, size, fmt), ContentFile(data))
+        variants.append(MediaVariant(
+            user_id=user_id, media=media, size=size, format=fmt,
+            width=width, height=height, file=name, source=field_file.name,
+        ))
+    return MediaVariant.objects.bulk_create(variants)
+
+
+def delete_variants(user_id, media=None):
+    """Borra filas y archivos (los archivos los borra la señal post_delete)."""
+    MediaVariant.objects.filter(user_id=user_id, media=media).delete()
+
+
+def profile_image_is_current(user):
+    return MediaVariant.objects.filter(
+        user_id=user.pk, media=None, source=user.profile_image.name
+    ).exists()
+
+
+def profile_image_variants(user):
+    """Variantes de la foto de perfil (usa el prefetch de media_variants si existe)."""
+    return [v for v in user.media_variants.all() if v.media_id is None]
@@ -0,0 +1,257 @@
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File, locks
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ProfileMedia, UploadSession
+
+
+# -------------------------
+# Subidas por partes
+# -------------------------
+# El cliente crea una sesión con el tamaño y el SHA-256 del archivo y después
+# envía las partes en orden (cada una con su offset). Si la conexión se corta,
+# consulta la sesión y sigue desde `received_bytes`. Las partes se escriben en
+# disco a medida que llegan, en bloques de READ_BLOCK bytes: la memoria usada
+# no depende del tamaño del archivo ni de la parte.
+# Las sesiones abiertas que no reciben partes en CHUNKED_UPLOAD_EXPIRY
+# segundos las borra purgar_sesiones, con su archivo.
+READ_BLOCK = 64 * 1024
+
+
+class UploadError(Exception):
+    status = 400
+
+    def __init__(self, message, **extra):
+        super().__init__(message)
+        self.extra = extra
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+
+class ChecksumMismatch(UploadError):
+    status = 422
+
+
+def upload_dir():
+    return os.fspath(settings.CHUNKED_UPLOAD_DIR)
+
+
+def max_upload_size():
+    return settings.CHUNKED_UPLOAD_MAX_SIZE
+
+
+def max_chunk_size():
+    return settings.CHUNKED_UPLOAD_CHUNK_SIZE
+
+
+def part_path(session):
+    return os.path.join(upload_dir(), f"{session.pk}.part")
+
+
+class PartFile(File):
+    """
+    File que expone temporary_file_path(): FileSystemStorage mueve el
+    archivo al destino en lugar de copiarlo.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+# -------------------------
+# Sesiones
+# -------------------------
+def create_session(user, filename, total_size, checksum, media_type='video'):
+    if total_size <= 0:
+        raise UploadError("El tamaño del archivo debe ser mayor a cero.")
+    if total_size > max_upload_size():
+        raise UploadError("El archivo supera el tamaño máximo permitido.", max_size=max_upload_size())
+    checksum = (checksum or '').lower()
+    if len(checksum) != 64 or any(c not in '0123456789abcdef' for c in checksum):
+        raise UploadError("El checksum debe ser un SHA-256 en hexadecimal.")
+
+    session = UploadSession.objects.create(
+        user=user,
+        filename=os.path.basename(filename)[:255],
+        media_type=media_type,
+        total_size=total_size,
+        checksum=checksum,
+    )
+    os.makedirs(upload_dir(), exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def append_chunk(session, offset, stream, length, chunk_checksum=None):
+    """
+    Agrega `length` bytes leídos de `stream` en la posición `offset`.
+    Si el SHA-256 de la parte no coincide con `chunk_checksum`, la parte se
+    descarta y `received_bytes` no cambia, así el cliente puede reenviarla.
+    """
+    if session.status != 'open':
+        raise UploadError("La subida ya no está abierta.")
+    if length <= 0 or length > max_chunk_size():
+        raise UploadError("Tamaño de parte inválido.", max_chunk_size=max_chunk_size())
+
+    try:
+        part = open(part_path(session), 'r+b')
+    except FileNotFoundError:
+        # Cancelada o purgada mientras llegaba la parte
+        raise UploadError("La subida ya no está abierta.")
+    with part:
+        # Un lock por sesión sobre el .part, no sobre la base: dos PATCH con
+        # el mismo offset (un reintento del cliente) se escriben de a uno, y
+        # el segundo ve el received_bytes que dejó el primero. Leer la parte
+        # de la red no bloquea al resto de las escrituras de SQLite.
+        locks.lock(part, locks.LOCK_EX)
+        try:
+            try:
+                session.refresh_from_db(fields=['status', 'received_bytes'])
+            except UploadSession.DoesNotExist:
+                raise UploadError("La subida ya no está abierta.")
+            if session.status != 'open':
+                raise UploadError("La subida ya no está abierta.")
+            if offset != session.received_bytes:
+                raise OffsetMismatch("El offset no coincide con lo recibido.", offset=session.received_bytes)
+            if offset + length > session.total_size:
+                raise UploadError("La parte excede el tamaño declarado del archivo.")
+            write_part(part, offset, stream, length, chunk_checksum)
+
+            # Condicionado al offset, además del lock: una parte no avanza dos veces
+            # updated_at a mano (update() no toca auto_now): marca la sesión como activa
+            updated = UploadSession.objects.filter(pk=session.pk, received_bytes=offset).update(
+                received_bytes=F('received_bytes') + length, updated_at=timezone.now()
+            )
+        finally:
+            locks.unlock(part)
+    if not updated:
+        session.refresh_from_db()
+        raise OffsetMismatch("La parte ya fue recibida.", offset=session.received_bytes)
+    session.received_bytes = offset + length
+    return session
+
+
+def write_part(part, offset, stream, length, chunk_checksum=None):
+    digest = hashlib.sha256()
+    written = 0
+    part.seek(offset)
+    # Descarta restos de una parte anterior que quedó a medio escribir
+    part.truncate()
+    while written < length:
+        block = stream.read(min(READ_BLOCK, length - written))
+        if not block:
+            break
+        part.write(block)
+        digest.update(block)
+        written += len(block)
+
+    if written != length:
+        part.truncate(offset)
+        raise UploadError("La parte llegó incompleta.", offset=offset)
+    if chunk_checksum and digest.hexdigest() != chunk_checksum.lower():
+        part.truncate(offset)
+        raise ChecksumMismatch("El checksum de la parte no coincide.", offset=offset)
+    part.flush()
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_session(session):
+    """Verifica el archivo completo y crea el ProfileMedia."""
+    if session.status != 'open':
+        raise UploadError("La subida ya no está abierta.")
+    if session.received_bytes != session.total_size:
+        raise UploadError("Faltan partes por subir.", offset=session.received_bytes)
+
+    path = part_path(session)
+    if file_checksum(path) != session.checksum:
+        # El archivo no sirve: hay que volver a subirlo desde cero
+        abort_session(session)
+        raise ChecksumMismatch("El checksum del archivo no coincide.")
+
+    media = ProfileMedia(
+        user=session.user,
+        media_type=session.media_type,
+        status='processing' if session.media_type == 'image' else 'ready',
+    )
+    with open(path, 'rb') as fh:
+        media.file.save(session.filename, PartFile(fh), save=False)
+    media.save()  # las imágenes se encolan en la señal post_save
+
+    if os.path.exists(path):  # si el storage copió en vez de mover
+        os.remove(path)
+    session.status = 'complete'
+    session.media = media
+    session.save(update_fields=['status', 'media', 'updated_at'])
+    return media
+
+
+def abort_session(session):
+    if os.path.exists(part_path(session)):
+        os.remove(part_path(session))
+    session.status = 'aborted'
+    session.save(update_fields=['status', 'updated_at'])
+
+
+# -------------------------
+# Subidas abandonadas
+# -------------------------
+def expire_sessions(older_than=None, batch_size=500):
+    """
+    Borra las sesiones abiertas sin partes nuevas hace más de `older_than`
+    segundos (CHUNKED_UPLOAD_EXPIRY) y sus archivos, y los .part viejos que
+    ya no tienen sesión abierta. Devuelve (sesiones, archivos) borrados.
+    """
+    if older_than is None:
+        older_than = settings.CHUNKED_UPLOAD_EXPIRY
+    limit = timezone.now() - timedelta(seconds=older_than)
+    stale = UploadSession.objects.filter(status='open', updated_at__lt=limit)
+    sessions = files = 0
+    while True:
+        batch = list(stale.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        for pk in batch:
+            # Condicionado otra vez: si llegó una parte en el medio, la sesión sigue
+            if stale.filter(pk=pk).delete()[0]:
+                sessions += 1
+                files += remove_part(os.path.join(upload_dir(), f"{pk}.part"))
+
+    # .part sin sesión abierta: usuario borrado en cascada, o subida que se
+    # completó o canceló y no llegó a borrar el archivo
+    if os.path.isdir(upload_dir()):
+        parts = {}
+        for entry in os.scandir(upload_dir()):
+            stem, extension = os.path.splitext(entry.name)
+            if extension == '.part' and entry.stat().st_mtime < limit.timestamp():
+                try:
+                    parts[uuid.UUID(stem)] = entry.path
+                except ValueError:
+                    continue
+        open_ids = set(UploadSession.objects.filter(pk__in=list(parts), status='open').values_list('pk', flat=True))
+        for pk, path in parts.items():
+            if pk not in open_ids:
+                files += remove_part(path)
+    return sessions, files
+
+
+def remove_part(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return 1
@@ -1,18 +1,40 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth.views import LogoutView
-from django.contrib.auth.views import LoginView
 
-from . import views
+from . import async_views, views
+
+# Vistas de lectura: versiones async bajo ASGI (accounts/async_views.py)
+read_views = async_views if settings.ASYNC_VIEWS else views
+# Login y registro async: hashean en el pool de procesos (accounts/hashers.py)
+login_view = async_views.login if settings.ASYNC_VIEWS else views.ThrottledLoginView.as_view()
+register_view = async_views.register if settings.ASYNC_VIEWS else views.register_view
 
 urlpatterns = [
-    path('login/', LoginView.as_view(template_name='accounts/login.html'), name='login'),
+    path('login/', login_view, name='login'),
+    path('login/metricas/', views.login_metricas, name='login_metricas'),
     path('logout/', LogoutView.as_view(), name='logout'),
-    path('register/', views.register_view, name='register'),
+    path('register/', register_view, name='register'),
     path('completar_perfil_dueño/', views.complete_owner_profile, name='complete_owner_profile'),
     path('completar_perfil_artista/', views.complete_artist_profile, name='complete_artist_profile'),
-    path('perfil/', views.ver_perfil, name='ver_perfil'),
+    path('perfil/', read_views.ver_perfil, name='ver_perfil'),
     path('perfil/editar/', views.editar_perfil, name='editar_perfil'),
     path('perfil/editar/eliminar_medio/<int:media_id>/', views.eliminar_medio, name='eliminar_medio'),
+    path('publico/<str:username>/', read_views.perfil_publico, name='perfil_publico'),
+    path('buscar/', read_views.buscar, name='buscar'),
+    path('consultas/', views.consultas_resumen, name='consultas_resumen'),
+    path('mensajes/', views.mensajes_bandeja, name='mensajes_bandeja'),
+    path('mensajes/eventos/', async_views.mensajes_eventos, name='mensajes_eventos'),
+    path('mensajes/nuevo/<str:username>/', views.mensajes_nuevo, name='mensajes_nuevo'),
+    path('mensajes/<int:conversation_id>/', views.mensajes_conversacion, name='mensajes_conversacion'),
+    path('contratos/', views.contratos, name='contratos'),
+    path('contratos/solicitar/<str:username>/', views.contrato_solicitar, name='contrato_solicitar'),
+    path('contratos/<int:contract_id>/estado/', views.contrato_estado, name='contrato_estado'),
+    path('resenas/<str:username>/', views.resenas, name='resenas'),
+    path('resenas/<str:username>/escribir/', views.resena_editar, name='resena_editar'),
+    path('subidas/', views.subida_crear, name='subida_crear'),
+    path('subidas/<uuid:upload_id>/', views.subida_detalle, name='subida_detalle'),
+    path('subidas/<uuid:upload_id>/completar/', views.subida_completar, name='subida_completar'),
 
 
   
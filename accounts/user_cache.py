@@ -0,0 +1,80 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+
+# -------------------------
+# Caché del usuario autenticado
+# -------------------------
+# Cada request autenticado resuelve request.user (backend.get_user). Acá se
+# guarda, por unos segundos y en memoria del proceso, el usuario junto con su
+# perfil de dueño o artista (select_related), así un request autenticado no
+# consulta la base para saber quién es.
+#
+# Se guarda el usuario serializado y se devuelve una copia nueva en cada
+# request: los views modifican request.user y no debe afectar a otros.
+#
+# Las señales (accounts/signals.py) borran la entrada al guardar el usuario o
+# su perfil, pero solo en este proceso: en los demás la entrada vence sola a
+# los AUTH_USER_CACHE_TIMEOUT segundos (un cambio de contraseña o una cuenta
+# desactivada tarda como mucho eso en cortar las sesiones de otros workers).
+# Por eso request.user es de solo lectura: lo que se guarda se carga de la
+# base con load_user() (ver views.editar_perfil).
+MAX_ENTRIES = 10_000
+PROFILE_RELATIONS = ('owner_profile', 'artist_profile')
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def timeout():
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 30)
+
+
+def load_user(user_id):
+    UserModel = get_user_model()
+    return (
+        UserModel._default_manager
+        .select_related(*PROFILE_RELATIONS)
+        .filter(pk=user_id)
+        .first()
+    )
+
+
+def get_user(user_id):
+    """El usuario con sus perfiles ya cargados, o None si no existe."""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(user_id)
+    if entry is not None and entry[0] > now:
+        return pickle.loads(entry[1])
+
+    user = load_user(user_id)
+    if user is not None and timeout() > 0:
+        data = pickle.dumps(user, pickle.HIGHEST_PROTOCOL)
+        with _lock:
+            _entries[user_id] = (now + timeout(), data)
+            _entries.move_to_end(user_id)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+    return user
+
+
+def forget(user_id):
+    """Borra la entrada ya y de nuevo al confirmar la transacción (otro request pudo leer la fila vieja)."""
+    def drop():
+        with _lock:
+            _entries.pop(user_id, None)
+
+    drop()
+    transaction.on_commit(drop)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
@@ -1,9 +1,17 @@
+import math
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.views import LoginView
+from django.contrib.messages import get_messages
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import require_http_methods
 
 # Forms
 from .forms import (
@@ -12,11 +20,21 @@ from .forms import (
     EstablishmentOwnerForm,
     ArtistEntrepreneurForm,
     CustomUserUpdateForm,
-    ProfileMediaForm
+    ProfileMediaForm,
+    SearchForm,
+    MessageForm,
+    ContractRequestForm,
+    ReviewForm
 )
 
 # Models
-from .models import CustomUser, EstablishmentOwner, ArtistEntrepreneur, ProfileMedia
+from .models import (
+    CustomUser, EstablishmentOwner, ArtistEntrepreneur, ProfileMedia, UploadSession, ConversationMember,
+    ContractRequest, Review
+)
+from .search import search_profiles, wants_distance
+from . import contracts, messaging, profile_cache, reviews, serving, throttling, uploads, user_cache
+from .middleware import stats_summary
 
 
 # -------------------------
@@ -51,6 +69,34 @@ class CustomLoginView(LoginView):
         return reverse_lazy('dashboard')
 
 
+LOGIN_THROTTLED = "Demasiados intentos de inicio de sesión. Probá de nuevo en unos minutos."
+
+
+class ThrottledLoginView(LoginView):
+    """
+    LoginView con límite de intentos: si la IP o el usuario se pasaron del
+    límite responde 429 sin validar el formulario (sin hashear nada).
+    """
+    template_name = 'accounts/login.html'
+
+    def post(self, request, *args, **kwargs):
+        username = request.POST.get('username', '')
+        allowed, retry_after = throttling.check_login(request, username)
+        if not allowed:
+            context = self.get_context_data(
+                form=self.form_class(request, initial={'username': username}),
+                throttle_error=LOGIN_THROTTLED,
+            )
+            response = self.render_to_response(context, status=429)
+            response['Retry-After'] = str(math.ceil(retry_after))
+            return response
+        return super().post(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        throttling.login_succeeded(self.request, form.cleaned_data.get('username'))
+        return super().form_valid(form)
+
+
 # -------------------------
 # Registro
 # -------------------------
@@ -75,11 +121,11 @@ def register_view(request):
 # -------------------------
 @login_required
 def complete_owner_profile(request):
-    if request.user.user_type != 'owner':
+    if not request.role_profile.is_owner:
         messages.error(request, 'No tienes permisos para acceder a esta página.')
         return redirect('dashboard')
 
-    if hasattr(request.user, 'owner_profile'):
+    if request.role_profile.complete:
         return redirect('dashboard')
 
     days_of_week = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
@@ -111,11 +157,11 @@ def complete_owner_profile(request):
 # -------------------------
 @login_required
 def complete_artist_profile(request):
-    if request.user.user_type != 'artist':
+    if not request.role_profile.is_artist:
         messages.error(request, 'No tienes permisos para acceder a esta página.')
         return redirect('dashboard')
 
-    if hasattr(request.user, 'artist_profile'):
+    if request.role_profile.complete:
         return redirect('dashboard')
 
     days_of_week = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
@@ -144,20 +190,26 @@ def complete_artist_profile(request):
 # -------------------------
 @login_required
 def ver_perfil(request):
+    context = ver_perfil_context(request)
+    context['medios'] = render_to_string('accounts/ver_perfil_medios.html', {
+        'media': request.user.media.prefetch_related('variants'),
+    }, request)
+    return render(request, 'accounts/ver_perfil.html', context)
+
+
+def ver_perfil_context(request):
+    """Contexto de ver_perfil sin la galería (también lo usa accounts/async_views.py)."""
     user = request.user
-    media = user.media.all()
     social_links = {}
     services = []
     schedule = {}
-    profile = None
+    profile = request.role_profile.profile
 
-    if user.user_type == 'owner' and hasattr(user, 'owner_profile'):
-        profile = user.owner_profile
+    if profile is not None and request.role_profile.is_owner:
         services = profile.additional_services or []
         schedule = {day: {'from': t.get('from', ''), 'to': t.get('to', '')} for day, t in (profile.schedule or {}).items()}
 
-    elif user.user_type == 'artist' and hasattr(user, 'artist_profile'):
-        profile = user.artist_profile
+    elif profile is not None:
         social_links = {
             'instagram': profile.instagram or '',
             'tiktok': profile.tiktok or '',
@@ -168,12 +220,11 @@ def ver_perfil(request):
     context = {
         'user': user,
         'profile': profile,
-        'media': media,
         'social_links': social_links,
         'services': services,
         'schedule': schedule
     }
-    return render(request, 'accounts/ver_perfil.html', context)
+    return context
 
 
 # -------------------------
@@ -183,14 +234,15 @@ def ver_perfil(request):
 @login_required
 def editar_perfil(request):
     user = request.user
+    if request.method == 'POST':
+        # Lo que se guarda sale de la base y no de la caché de usuarios
+        # (accounts/user_cache.py): la copia de este proceso puede tener una
+        # contraseña o un is_active que ya cambió otro proceso
+        user = user_cache.load_user(user.pk)
 
     # Seleccionar modelo de perfil según tipo de usuario
-    if user.user_type == 'owner':
-        perfil_model = EstablishmentOwner
-        perfil_instance = getattr(user, 'owner_profile', None)
-    else:
-        perfil_model = ArtistEntrepreneur
-        perfil_instance = getattr(user, 'artist_profile', None)
+    perfil_model = EstablishmentOwner if user.user_type == 'owner' else ArtistEntrepreneur
+    perfil_instance = user.role_profile
 
     # Si no existe perfil, crear uno vacío
     if perfil_instance is None:
@@ -198,7 +250,7 @@ def editar_perfil(request):
         perfil_instance.save()
 
     days_of_week = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
-    media = user.media.all()
+    media = user.media.prefetch_related('variants')
 
     if request.method == 'POST':
         user_form = CustomUserUpdateForm(request.POST, request.FILES, instance=user)
@@ -247,10 +299,12 @@ def editar_perfil(request):
 
             perfil.save()
 
-            # Subida de medios
+            # Subida de medios: las imágenes quedan "procesando" hasta que el
+            # worker genera sus variantes
             for idx, file in enumerate(media_files):
                 media_type = media_types[idx] if idx < len(media_types) else 'image'
-                ProfileMedia.objects.create(user=user, file=file, media_type=media_type)
+                status = 'processing' if media_type == 'image' else 'ready'
+                ProfileMedia.objects.create(user=user, file=file, media_type=media_type, status=status)
 
             messages.success(request, 'Perfil actualizado correctamente.')
             return redirect('ver_perfil')
@@ -298,30 +352,31 @@ def eliminar_medio(request, media_id):
 # -------------------------
 @login_required
 def dashboard(request):
-    user = request.user
-    perfil_completo = hasattr(user, 'owner_profile') if user.user_type == 'owner' else hasattr(user, 'artist_profile')
-    return render(request, 'accounts/dashboard.html', {
-        'user': user,
-        'perfil_completo': perfil_completo
+    return render(request, 'dashboard.html', {
+        'user': request.user,
+        'profile': request.role_profile.profile,
+        'perfil_completo': request.role_profile.complete,
     })
 
 
 # -------------------------
 # Perfil público
 # -------------------------
-def perfil_publico(request, username):
-    user = get_object_or_404(CustomUser, username=username)
-    media = user.media.all()
-    profile = None
+def perfil_publico_card(user, media=None):
+    """
+    HTML de la tarjeta del perfil (no depende de quién la mira). La vista
+    async pasa `media` ya cargado.
+    """
+    if media is None:
+        media = user.media.prefetch_related('variants')
     services = []
     schedule = {}
 
+    profile = user.role_profile
     if user.user_type == 'owner':
-        profile = getattr(user, 'owner_profile', None)
         services = profile.additional_services if profile and profile.additional_services else []
         schedule = profile.schedule if profile and profile.schedule else {}
     else:
-        profile = getattr(user, 'artist_profile', None)
         schedule = profile.availability if profile and profile.availability else {}
 
     formatted_schedule = {day: {'from': t.get('from', ''), 'to': t.get('to', '')} for day, t in schedule.items()}
@@ -331,20 +386,393 @@ def perfil_publico(request, username):
         'profile': profile,
         'media': media,
         'services': services,
-        'schedule': formatted_schedule
+        'schedule': formatted_schedule,
+        'reviews': reviews.recent_reviews(user) if profile and profile.rating_count else [],
     }
-    return render(request, 'accounts/perfil_publico.html', context)
+    return render_to_string('accounts/perfil_publico_card.html', context)
 
 
+def perfil_publico(request, username):
+    """
+    La tarjeta se cachea por usuario (accounts/profile_cache.py) y, para
+    visitantes anónimos, también la página completa: el menú solo cambia
+    para usuarios logueados o con mensajes pendientes.
+    """
+    anonymous = not request.user.is_authenticated and not get_messages(request)
+    user_id = profile_cache.cached_user_id(username)
+    # Antes de leer la base (ver accounts/profile_cache.py)
+    seen = profile_cache.version(user_id) if user_id else None
+    card = profile_cache.get_fragment(user_id, 'card', seen) if user_id else None
+    if card is not None and card['username'] != username:
+        # El usuario cambió de username: el nombre viejo ya no es válido
+        profile_cache.forget_user_id(username)
+        card = None
+
+    if card is not None and anonymous:
+        page = profile_cache.get_fragment(user_id, 'page', seen)
+        if page is not None:
+            return HttpResponse(page)
+
+    if card is None:
+        user = get_object_or_404(
+            CustomUser.objects.select_related('owner_profile', 'artist_profile'),
+            username=username
+        )
+        card = {'username': user.username, 'html': perfil_publico_card(user)}
+        if user.pk == user_id:
+            profile_cache.set_fragment(user_id, 'card', card, seen)
+        else:
+            # Sin el id no se pudo leer la versión antes: se cachea en el próximo request
+            profile_cache.remember_user_id(username, user.pk)
+            user_id, seen = user.pk, None
+
+    response = render(request, 'accounts/perfil_publico.html', {
+        'perfil_username': username,
+        'card': mark_safe(card['html']),
+    })
+    if anonymous and seen is not None:
+        profile_cache.set_fragment(user_id, 'page', response.content, seen)
+    return response
+
+
+# -------------------------
+# Buscador
+# -------------------------
+def buscar(request):
+    form = SearchForm(request.GET or None)
+    page = None
+    kind = 'artist'
+
+    if form.is_valid():
+        kind = form.cleaned_data['kind']
+        filters = buscar_origen(request, form.cleaned_data)
+        page = search_profiles(kind, filters, cursor=filters.get('cursor'))
+
+    context = {'form': form, 'kind': kind}
+    context['resultados'] = render_to_string(
+        'accounts/buscar_resultados.html', buscar_resultados_context(request, kind, page, form), request
+    )
+    return render(request, 'accounts/buscar.html', context)
+
+
+def buscar_origen(request, filters):
+    """Sin localidad en 'Cerca de', la distancia se mide desde el perfil propio."""
+    if filters['origin'] is None and wants_distance(filters) and request.user.is_authenticated:
+        profile = request.role_profile.profile
+        if profile is not None and profile.latitude is not None:
+            filters['origin'] = (profile.latitude, profile.longitude)
+    return filters
+
+
+def buscar_resultados_context(request, kind, page, form):
+    # Querystring sin el cursor, para armar el link a la página siguiente
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    filters = form.cleaned_data if form.is_valid() else {}
+    return {
+        'kind': kind,
+        'results': page.results if page else [],
+        'next_cursor': page.next_cursor if page else '',
+        'querystring': params.urlencode(),
+        'sin_origen': wants_distance(filters) and not filters.get('origin') and not filters.get('q'),
+    }
 
 
+# -------------------------
+# Mensajería interna
+# -------------------------
+@login_required
+def mensajes_bandeja(request):
+    page = messaging.inbox_page(request.user, request.GET.get('cursor'))
+    return render(request, 'accounts/mensajes_bandeja.html', {
+        'conversations': page.results,
+        'next_cursor': page.next_cursor,
+        'inbox': messaging.inbox_state(request.user.pk),
+    })
 
 
+@login_required
+def mensajes_conversacion(request, conversation_id):
+    member = get_object_or_404(
+        ConversationMember.objects.select_related('peer'),
+        conversation_id=conversation_id,
+        user=request.user
+    )
+    if request.method == 'POST':
+        form = MessageForm(request.POST)
+        if form.is_valid():
+            try:
+                messaging.send_message(request.user, member.peer, form.cleaned_data['body'])
+            except messaging.MessagingError as exc:
+                messages.error(request, str(exc))
+            return redirect('mensajes_conversacion', conversation_id=conversation_id)
+    else:
+        form = MessageForm()
+
+    # ?antes=<id> pide mensajes anteriores; solo la página más reciente marca como leído
+    before = request.GET.get('antes')
+    page = messaging.thread_page(conversation_id, before)
+    if not before:
+        messaging.mark_read(member)
+    return render(request, 'accounts/mensajes_conversacion.html', {
+        'member': member,
+        'peer': member.peer,
+        'thread': page.results,
+        'older_cursor': page.next_cursor,
+        'form': form,
+    })
 
 
+@login_required
+def mensajes_nuevo(request, username):
+    recipient = get_object_or_404(CustomUser, username=username, is_active=True)
+    if recipient.pk == request.user.pk:
+        messages.error(request, "No podés enviarte mensajes a vos mismo.")
+        return redirect('mensajes_bandeja')
+
+    conversation = messaging.find_conversation(request.user, recipient)
+    if conversation is not None and request.method != 'POST':
+        return redirect('mensajes_conversacion', conversation_id=conversation.pk)
+
+    form = MessageForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        try:
+            message = messaging.send_message(request.user, recipient, form.cleaned_data['body'])
+        except messaging.MessagingError as exc:
+            messages.error(request, str(exc))
+        else:
+            return redirect('mensajes_conversacion', conversation_id=message.conversation_id)
+    return render(request, 'accounts/mensajes_nuevo.html', {'recipient': recipient, 'form': form})
 
 
+# -------------------------
+# Solicitudes de contratación
+# -------------------------
+CONTRACT_STATUSES = dict(ContractRequest.STATUS_CHOICES)
 
 
+@login_required
+def contratos(request):
+    profile = request.role_profile.profile
+    if profile is None:
+        messages.info(request, "Completá tu perfil para pedir y recibir fechas.")
+        return redirect('dashboard')
+
+    status = request.GET.get('estado')
+    if status not in CONTRACT_STATUSES:
+        status = 'pending'
+    page = contracts.requests_for(profile, status, request.GET.get('cursor'))
+    rows = [(contract, contracts.allowed_transitions(contract, request.user)) for contract in page.results]
+    return render(request, 'accounts/contratos.html', {
+        'rows': rows,
+        'status': status,
+        'statuses': CONTRACT_STATUSES,
+        'next_cursor': page.next_cursor,
+    })
+
+
+@login_required
+def contrato_solicitar(request, username):
+    target = get_object_or_404(
+        CustomUser.objects.select_related('owner_profile', 'artist_profile'),
+        username=username,
+        is_active=True
+    )
+    role = request.role_profile
+    if role.is_owner and role.complete and target.user_type == 'artist' and target.role_profile:
+        venue, artist = role.profile, target.role_profile
+    elif role.is_artist and role.complete and target.user_type == 'owner' and target.role_profile:
+        venue, artist = target.role_profile, role.profile
+    else:
+        messages.error(request, "Las fechas se piden entre un espacio y un artista con el perfil completo.")
+        return redirect('perfil_publico', username=username)
+
+    form = ContractRequestForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        try:
+            contracts.create_request(
+                request.user, venue, artist,
+                form.cleaned_data['starts_at'], form.cleaned_data['ends_at'],
+                form.cleaned_data['service_type'], form.cleaned_data['message']
+            )
+        except contracts.ContractError as exc:
+            form.add_error(None, str(exc))
+        else:
+            messages.success(request, "Solicitud enviada.")
+            return redirect('contratos')
+    return render(request, 'accounts/contrato_solicitar.html', {
+        'form': form, 'target': target, 'venue': venue, 'artist': artist,
+    })
+
+
+@login_required
+@require_http_methods(['POST'])
+def contrato_estado(request, contract_id):
+    contract = get_object_or_404(ContractRequest.objects.select_related('venue', 'artist'), pk=contract_id)
+    if contracts.actor_role(contract, request.user) is None:
+        raise Http404("No existe esa solicitud.")
+    try:
+        version = int(request.POST.get('version', ''))
+    except ValueError:
+        version = None
+    try:
+        contracts.transition(contract, request.user, request.POST.get('status'), version)
+    except contracts.ContractError as exc:
+        messages.error(request, str(exc))
+    else:
+        messages.success(request, f"Solicitud {contract.get_status_display().lower()}.")
+    return redirect(f"{reverse('contratos')}?estado={contract.status}")
+
+
+# -------------------------
+# Reseñas
+# -------------------------
+def resenas(request, username):
+    subject = get_object_or_404(
+        CustomUser.objects.select_related('owner_profile', 'artist_profile'),
+        username=username
+    )
+    if subject.role_profile is None:
+        raise Http404("Ese perfil no tiene reseñas.")
+    page = reviews.reviews_page(subject, request.GET.get('cursor'))
+    return render(request, 'accounts/resenas.html', {
+        'subject': subject,
+        'profile': subject.role_profile,
+        'reviews': page.results,
+        'next_cursor': page.next_cursor,
+    })
+
+
+@login_required
+def resena_editar(request, username):
+    subject = get_object_or_404(
+        CustomUser.objects.select_related('owner_profile', 'artist_profile'),
+        username=username,
+        is_active=True
+    )
+    review = Review.objects.filter(author=request.user, subject=subject).first()
+
+    if request.method == 'POST' and 'eliminar' in request.POST:
+        if review is not None:
+            reviews.delete_review(review)
+            messages.success(request, "Reseña eliminada.")
+        return redirect('perfil_publico', username=username)
+
+    form = ReviewForm(request.POST or None, instance=review)
+    if request.method == 'POST' and form.is_valid():
+        try:
+            reviews.save_review(request.user, subject, form.cleaned_data['rating'], form.cleaned_data['comment'])
+        except reviews.ReviewError as exc:
+            form.add_error(None, str(exc))
+        else:
+            messages.success(request, "¡Gracias por tu reseña!")
+            return redirect('perfil_publico', username=username)
+    return render(request, 'accounts/resena_form.html', {'form': form, 'subject': subject, 'review': review})
+
+
+# -------------------------
+# Subidas por partes (API JSON)
+# -------------------------
+def subida_json(session, status=200):
+    return JsonResponse({
+        'id': str(session.pk),
+        'filename': session.filename,
+        'status': session.status,
+        'size': session.total_size,
+        'offset': session.received_bytes,
+        'chunk_size': uploads.max_chunk_size(),
+        'media_id': session.media_id,
+    }, status=status)
+
+
+def subida_error(error):
+    return JsonResponse({'error': str(error), **error.extra}, status=error.status)
+
+
+@login_required
+@require_http_methods(['POST'])
+def subida_crear(request):
+    media_type = request.POST.get('media_type', 'video')
+    if media_type not in dict(ProfileMedia.MEDIA_TYPE_CHOICES):
+        return JsonResponse({'error': "Tipo de medio inválido."}, status=400)
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': "Tamaño inválido."}, status=400)
+    try:
+        session = uploads.create_session(
+            request.user,
+            request.POST.get('filename', '') or 'archivo',
+            size,
+            request.POST.get('checksum'),
+            media_type,
+        )
+    except uploads.UploadError as error:
+        return subida_error(error)
+    return subida_json(session, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+def subida_detalle(request, upload_id):
+    """
+    GET: estado (para reanudar). PATCH: agrega una parte; el cuerpo son los
+    bytes crudos, con los headers Upload-Offset y opcionalmente
+    X-Chunk-Checksum (SHA-256 de la parte). DELETE: cancela la subida.
+    """
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+
+    if request.method == 'DELETE':
+        if session.status == 'open':
+            uploads.abort_session(session)
+        return subida_json(session)
+
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return JsonResponse({'error': "Faltan Upload-Offset o Content-Length."}, status=400)
+        try:
+            # Se lee del stream del request, nunca request.body
+            uploads.append_chunk(session, offset, request, length, request.headers.get('X-Chunk-Checksum'))
+        except uploads.UploadError as error:
+            return subida_error(error)
+
+    return subida_json(session)
+
+
+@login_required
+@require_http_methods(['POST'])
+def subida_completar(request, upload_id):
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    try:
+        uploads.complete_session(session)
+    except uploads.UploadError as error:
+        return subida_error(error)
+    return subida_json(session)
+
+
+# -------------------------
+# Servir medios
+# -------------------------
+@require_http_methods(['GET', 'HEAD'])
+def servir_medio(request, path):
+    if not serving.is_public(path, request.user) or not serving.media_storage.exists(path):
+        raise Http404("Archivo no encontrado")
+    return serving.serve_media(request, path)
+
+
+# -------------------------
+# Resumen de consultas SQL por vista
+# -------------------------
+@staff_member_required
+def consultas_resumen(request):
+    """Estadísticas de QueryBudgetMiddleware de este proceso, en JSON."""
+    return JsonResponse({'views': stats_summary()})
 
 
+@staff_member_required
+def login_metricas(request):
+    """Intentos de login y bloqueos de este proceso, en JSON."""
+    return JsonResponse({'login': throttling.metrics_summary()})
@@ -0,0 +1,10 @@
+import django
+
+
+# -------------------------
+# Procesos del pool de procesar_medios
+# -------------------------
+# Este módulo no importa modelos: es lo primero que carga cada proceso hijo
+# (creado con "spawn", igual en Linux y Windows) antes de configurar Django.
+def init_worker():
+    django.setup()
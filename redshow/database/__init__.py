@@ -0,0 +1,28 @@
+from django.conf import settings
+
+
+# -------------------------
+# SQLite para producción
+# -------------------------
+# Backend de base de datos (ENGINE = 'redshow.database', ver base.py): el de
+# Django más los PRAGMAs de settings.SQLITE_PRAGMAS al abrir cada conexión
+# (ahí está por qué cada valor) y transacciones IMMEDIATE.
+
+# No aplican a una base en memoria (la de los tests)
+FILE_ONLY_PRAGMAS = ('journal_mode', 'mmap_size')
+
+
+def sqlite_pragmas():
+    # Sin el setting, las conexiones quedan como las abre Django
+    return getattr(settings, 'SQLITE_PRAGMAS', {})
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        if name == 'journal_mode':
+            # Queda guardado en el archivo: cambiarlo reescribe el encabezado
+            # (y pasar a WAL pide acceso exclusivo). Solo si es otro modo.
+            current = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+            if current.lower() == str(value).lower():
+                continue
+        cursor.execute(f'PRAGMA {name} = {value}')
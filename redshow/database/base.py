@@ -0,0 +1,38 @@
+from django.db.backends.sqlite3 import base
+
+from . import FILE_ONLY_PRAGMAS, apply_pragmas, sqlite_pragmas
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite de Django con:
+
+    - PRAGMAs de settings.SQLITE_PRAGMAS en cada conexión nueva (con
+      CONN_MAX_AGE se aplican una vez por conexión, no por request).
+    - OPTIONS['transaction_mode'] ('IMMEDIATE'), como en Django 5.1: una
+      transacción DEFERRED que lee y después escribe (editar_perfil) no puede
+      esperar el lock de escritura y falla en el acto con "database is
+      locked"; con BEGIN IMMEDIATE toma el lock al empezar y, si está
+      ocupado, espera busy_timeout.
+    """
+
+    transaction_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = sqlite_pragmas()
+        if self.is_in_memory_db():
+            pragmas = {k: v for k, v in pragmas.items() if k not in FILE_ONLY_PRAGMAS}
+        apply_pragmas(conn, pragmas)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
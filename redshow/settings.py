@@ -1,4 +1,6 @@
+import importlib.util
 import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,10 +23,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Primero, para contar también las consultas de sesión y autenticación
+    'accounts.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.RoleProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -47,13 +52,43 @@ TEMPLATES = [
     },
 ]
 
+# Vistas de lectura async (accounts/async_views.py) para servir con ASGI
+# (redshow/asgi.py, p. ej. uvicorn redshow.asgi:application). Con WSGI
+# conviene dejarlas sync: Django correría cada vista async en su propio loop.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite de Django con PRAGMAs y BEGIN IMMEDIATE (redshow/database)
+        'ENGINE': 'redshow.database',
         'NAME': BASE_DIR / 'redshow.db',
+        # Conexiones persistentes: sin reabrir el archivo ni reaplicar los
+        # PRAGMAs en cada request. Antes de reusarla se verifica que siga viva.
+        # Con ASGI no: cada request abre su conexión en su propio contexto.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0 if ASYNC_VIEWS else 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,  # segundos esperando un lock (busy handler de sqlite3)
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# PRAGMAs que se aplican al abrir cada conexión (redshow/database).
+# - journal_mode=wal: los lectores no esperan a un escritor (con el journal
+#   por defecto un editar_perfil bloquea todas las lecturas hasta el COMMIT).
+# - synchronous=normal: con WAL no se pierde consistencia, solo los últimos
+#   commits si se corta la luz; evita un fsync por transacción.
+# - busy_timeout: esperar al lock en vez de fallar con "database is locked".
+SQLITE_PRAGMAS = {
+    'busy_timeout': 20_000,           # ms
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64_000,            # KiB por conexión
+    'mmap_size': 256 * 1024 * 1024,   # bytes
+    'temp_store': 'memory',
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -69,6 +104,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hashers (accounts/hashers.py). El primero es el que se usa para contraseñas
+# nuevas; los demás solo verifican hashes viejos, que se rehashean con el
+# primero en el próximo login. Argon2 requiere argon2-cffi; si no está
+# instalado se usa scrypt. PASSWORD_HASHER=argon2|scrypt|pbkdf2 lo fuerza.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER') or (
+    'argon2' if importlib.util.find_spec('argon2') else 'scrypt'
+)
+PREFERRED_HASHERS = {
+    'argon2': 'accounts.hashers.TunedArgon2PasswordHasher',
+    'scrypt': 'accounts.hashers.TunedScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [PREFERRED_HASHERS[PASSWORD_HASHER]] + [
+    hasher for hasher in [
+        'accounts.hashers.TunedArgon2PasswordHasher',
+        'accounts.hashers.TunedScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ]
+    if hasher != PREFERRED_HASHERS[PASSWORD_HASHER]
+]
+# Parámetros mínimos recomendados por OWASP para Argon2id (~20 ms) y los de
+# Django para scrypt (~70 ms por verificación contra ~300 ms de PBKDF2).
+PASSWORD_ARGON2 = {'time_cost': 2, 'memory_cost': 19 * 1024, 'parallelism': 1}
+PASSWORD_SCRYPT = {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1}
+PASSWORD_HASH_PROCESSES = None  # acheck_password: por defecto, un proceso por núcleo
+
 
 LANGUAGE_CODE = 'es-es'
 TIME_ZONE = 'America/Argentina/Buenos_Aires'
@@ -87,5 +150,97 @@ LOGOUT_REDIRECT_URL = '/'
 
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
+AUTHENTICATION_BACKENDS = ['accounts.backends.EmailOrUsernameBackend']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Límite de intentos de login (accounts/throttling.py): (fichas, segundos para
+# rellenar el balde). LocMemBucketStore es por proceso; con varios workers
+# usar accounts.throttling.DatabaseBucketStore.
+LOGIN_THROTTLE_STORE = os.environ.get('LOGIN_THROTTLE_STORE', 'accounts.throttling.LocMemBucketStore')
+LOGIN_THROTTLE_RATES = {
+    'ip': (30, 60),         # 30 intentos por minuto por IP
+    'ip_user': (5, 300),    # 5 intentos cada 5 minutos por IP y usuario
+    'user': (20, 60 * 60),  # 20 por hora por usuario, desde cualquier IP
+}
+LOGIN_THROTTLE_TRUSTED_PROXIES = 0  # proxies delante de Django que agregan X-Forwarded-For
+
+# Presupuesto de consultas por vista (accounts/middleware.py). En tests usar
+# override_settings(QUERY_BUDGET_STRICT=True) para que pasarse sea un error.
+QUERY_BUDGETS = {
+    'ver_perfil': 8,
+    'editar_perfil': 20,
+    'perfil_publico': 8,
+    'buscar': 6,
+}
+QUERY_BUDGET_STRICT = False
+QUERY_REPEAT_THRESHOLD = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Por defecto solo avisos (N+1, presupuestos excedidos); la línea por
+        # request de accounts.queries sale con ACCOUNTS_LOG_LEVEL=DEBUG
+        'accounts': {
+            'handlers': ['console'],
+            'level': os.environ.get('ACCOUNTS_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
+# Caché compartida entre procesos (runserver/gunicorn y procesar_medios).
+# Para pruebas alcanza con 'django.core.cache.backends.locmem.LocMemCache'.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'tmp' / 'cache')),
+    }
+}
+# `manage.py test`: caché en memoria del proceso, sin leer ni dejar entradas
+# en tmp/cache que pasen de una corrida (o de un entorno) a otra
+if sys.argv[1:2] == ['test']:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+PROFILE_CACHE_TIMEOUT = 24 * 60 * 60  # accounts/profile_cache.py
+
+# Sesiones: 'cached_db' lee la sesión de la caché y la guarda también en la
+# base (default); 'signed_cookies' la guarda firmada en la cookie, sin tocar
+# la base (el logout no invalida copias viejas de la cookie); 'db' es el de
+# Django. La sesión solo guarda el id del usuario: los mensajes van en su
+# propia cookie para no reescribir la sesión en cada redirect.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_BACKEND]
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Segundos que cada proceso guarda request.user con su perfil
+# (accounts/user_cache.py). 0 desactiva la caché.
+AUTH_USER_CACHE_TIMEOUT = 30
+
+# Subidas por partes (accounts/uploads.py). Los archivos a medio subir quedan
+# fuera de MEDIA_ROOT para que no se sirvan.
+# Servir medios (accounts/serving.py): None sirve el archivo desde Django;
+# 'x-accel-redirect' (nginx) o 'x-sendfile' delegan la transferencia al proxy.
+# En nginx, MEDIA_ACCEL_PREFIX debe ser una location `internal` con
+# `alias` a MEDIA_ROOT.
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'tmp' / 'uploads'
+CHUNKED_UPLOAD_MAX_SIZE = 1024 ** 3  # 1 GB
+CHUNKED_UPLOAD_CHUNK_SIZE = 8 * 1024 ** 2  # 8 MB por parte
+# purgar_sesiones borra las subidas abiertas sin partes nuevas en este tiempo
+CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60  # segundos
+
+# Mensajería (accounts/messaging.py): cada proceso busca mensajes guardados
+# por otros procesos cada MESSAGING_POLL_INTERVAL segundos (una consulta por
+# proceso, no por conexión) y corta cada stream de eventos a los
+# MESSAGING_STREAM_SECONDS; el navegador reconecta solo.
+MESSAGING_POLL_INTERVAL = 1.0
+MESSAGING_STREAM_SECONDS = 5 * 60
@@ -2,15 +2,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
 from django.conf import settings
-from django.conf.urls.static import static
+
+from accounts import views
+from accounts.urls import read_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('', TemplateView.as_view(template_name='home.html'), name='home'),
-    path('dashboard/', TemplateView.as_view(template_name='dashboard.html'), name='dashboard'),
+    path('dashboard/', read_views.dashboard, name='dashboard'),
+    # Medios con soporte de Range y caché condicional (también en producción)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", views.servir_medio, name='servir_medio'),
 ]
-
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)